@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Deals index-usage benchmark.
+
+Seeds a large synthetic tenant (server-side generate_series, idempotent) and records
+EXPLAIN (ANALYZE, BUFFERS) for every list_deals query shape:
+  tenant                / tenant + pipeline / tenant + stage / tenant + pipeline + stage
+each as page 1 and as a deep keyset page (cursor ~90% into the result).
+
+Run once before `alembic upgrade head` and once after, then compare:
+  python scripts/bench_deals_indexes.py --label before
+  (alembic upgrade head)
+  python scripts/bench_deals_indexes.py --label after
+  python scripts/bench_deals_indexes.py --compare bench_deals_before.json bench_deals_after.json
+
+Postgres is not published by docker compose; run it where psycopg and the DB are reachable, e.g.
+  docker exec -i nextcrm-runner python - --label before < scripts/bench_deals_indexes.py
+(plans are written to the current directory; use --out - to print JSON to stdout instead).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+
+import psycopg
+
+TENANT = "bench_idx"
+PAGE = 200  # list_deals default limit
+
+SEED_SQL = [
+    """
+    INSERT INTO tenants (tenant_id, name) VALUES (%(t)s, 'index benchmark')
+    ON CONFLICT (tenant_id) DO NOTHING
+    """,
+    """
+    INSERT INTO pipelines (pipeline_id, tenant_id, name)
+    SELECT %(t)s || '_pl' || p, %(t)s, 'Pipeline ' || p
+    FROM generate_series(1, %(pipelines)s) p
+    ON CONFLICT (pipeline_id) DO NOTHING
+    """,
+    """
+    INSERT INTO stages (stage_id, tenant_id, pipeline_id, name, sort_order, is_won, is_lost)
+    SELECT %(t)s || '_pl' || p || '_st' || s, %(t)s, %(t)s || '_pl' || p, 'Stage ' || s, s, false, false
+    FROM generate_series(1, %(pipelines)s) p, generate_series(1, %(stages)s) s
+    ON CONFLICT (stage_id) DO NOTHING
+    """,
+    # created_at разнесён во времени, чтобы порядок по (created_at, deal_id) был реалистичным
+    """
+    INSERT INTO deals (deal_id, tenant_id, title, amount, currency, pipeline_id, stage_id, created_at, updated_at)
+    SELECT
+        %(t)s || '_d' || g,
+        %(t)s,
+        'Deal ' || g,
+        (g %% 100000) / 10.0,
+        'USD',
+        %(t)s || '_pl' || (1 + g %% %(pipelines)s),
+        %(t)s || '_pl' || (1 + g %% %(pipelines)s) || '_st' || (1 + (g / %(pipelines)s) %% %(stages)s),
+        now() - (g || ' seconds')::interval,
+        now() - (g || ' seconds')::interval
+    FROM generate_series(1, %(deals)s) g
+    ON CONFLICT (deal_id) DO NOTHING
+    """,
+]
+
+
+def dsn() -> str:
+    return os.getenv(
+        "BENCH_DSN",
+        "host={} port={} dbname={} user={} password={}".format(
+            os.getenv("POSTGRES_HOST", "localhost"),
+            os.getenv("POSTGRES_PORT", "5432"),
+            os.getenv("POSTGRES_DB", "nextcrm"),
+            os.getenv("POSTGRES_USER", "nextcrm"),
+            os.getenv("POSTGRES_PASSWORD", "nextcrm"),
+        ),
+    )
+
+
+def seed(conn: psycopg.Connection, deals: int, pipelines: int, stages: int) -> None:
+    have = conn.execute("SELECT count(*) FROM deals WHERE tenant_id = %s", (TENANT,)).fetchone()[0]
+    if have >= deals:
+        print(f"seed: tenant {TENANT} already has {have} deals")
+        return
+    params = {"t": TENANT, "deals": deals, "pipelines": pipelines, "stages": stages}
+    with conn.transaction():
+        for sql in SEED_SQL:
+            conn.execute(sql, params)
+    conn.execute("ANALYZE deals")
+    print(f"seed: {deals} deals, {pipelines} pipelines x {stages} stages")
+
+
+def list_query(pipeline: bool, stage: bool, cursor: bool) -> str:
+    # тот же SQL, что строит list_deals (app/api/deals.py + app/api/pagination.py)
+    where = ["tenant_id = %(t)s"]
+    if pipeline:
+        where.append("pipeline_id = %(pipeline_id)s")
+    if stage:
+        where.append("stage_id = %(stage_id)s")
+    if cursor:
+        where.append("(created_at, deal_id) < (%(c_created)s, %(c_id)s)")
+    return (
+        "SELECT * FROM deals WHERE " + " AND ".join(where)
+        + " ORDER BY created_at DESC, deal_id DESC LIMIT %(limit)s"
+    )
+
+
+def deep_cursor(conn: psycopg.Connection, sql_filter: str, params: dict) -> tuple:
+    total = conn.execute(f"SELECT count(*) FROM deals WHERE {sql_filter}", params).fetchone()[0]
+    row = conn.execute(
+        f"SELECT created_at, deal_id FROM deals WHERE {sql_filter}"
+        " ORDER BY created_at DESC, deal_id DESC OFFSET %(off)s LIMIT 1",
+        {**params, "off": max(0, int(total * 0.9))},
+    ).fetchone()
+    return row
+
+
+def walk(plan: dict, out: list[str]) -> None:
+    node = plan["Node Type"]
+    if plan.get("Index Name"):
+        node += f" using {plan['Index Name']}"
+    out.append(node)
+    for child in plan.get("Plans", []):
+        walk(child, out)
+
+
+def explain(conn: psycopg.Connection, sql: str, params: dict) -> dict:
+    # прогреваем кэш, чтобы before/after сравнивали план, а не холодный диск
+    conn.execute(sql, params).fetchall()
+    (res,) = conn.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params).fetchone()
+    top = res[0]
+    plan = top["Plan"]
+    nodes: list[str] = []
+    walk(plan, nodes)
+    return {
+        "execution_ms": top["Execution Time"],
+        "planning_ms": top["Planning Time"],
+        "shared_hit": plan.get("Shared Hit Blocks", 0),
+        "shared_read": plan.get("Shared Read Blocks", 0),
+        "rows": plan.get("Actual Rows"),
+        "nodes": nodes,
+        "plan": top,
+    }
+
+
+def run(conn: psycopg.Connection) -> dict:
+    base = {"t": TENANT, "limit": PAGE, "pipeline_id": f"{TENANT}_pl1", "stage_id": f"{TENANT}_pl1_st2"}
+    results = {}
+    for pipeline, stage in ((False, False), (True, False), (False, True), (True, True)):
+        name = "tenant" + ("+pipeline" if pipeline else "") + ("+stage" if stage else "")
+        filt = " AND ".join(
+            ["tenant_id = %(t)s"]
+            + (["pipeline_id = %(pipeline_id)s"] if pipeline else [])
+            + (["stage_id = %(stage_id)s"] if stage else [])
+        )
+        results[f"{name} page1"] = explain(conn, list_query(pipeline, stage, False), base)
+
+        cur = deep_cursor(conn, filt, base)
+        if cur is not None:
+            params = {**base, "c_created": cur[0], "c_id": cur[1]}
+            results[f"{name} deep"] = explain(conn, list_query(pipeline, stage, True), params)
+    return results
+
+
+def print_table(results: dict, other: dict | None = None) -> None:
+    for name, r in results.items():
+        line = f"{name:<32} {r['execution_ms']:>9.2f} ms  buffers={r['shared_hit'] + r['shared_read']:<7}"
+        if other and name in other:
+            o = other[name]
+            line += f" -> {o['execution_ms']:>9.2f} ms  buffers={o['shared_hit'] + o['shared_read']:<7}"
+            nodes = o["nodes"]
+        else:
+            nodes = r["nodes"]
+        print(line + "  " + " > ".join(nodes))
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--label", default="run", help="e.g. before / after")
+    ap.add_argument("--deals", type=int, default=500_000)
+    ap.add_argument("--pipelines", type=int, default=5)
+    ap.add_argument("--stages", type=int, default=8)
+    ap.add_argument("--out", default=None, help="output file (default bench_deals_<label>.json, '-' = stdout)")
+    ap.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = ap.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            before = json.load(f)
+        with open(args.compare[1]) as f:
+            after = json.load(f)
+        print_table(before["results"], after["results"])
+        return 0
+
+    with psycopg.connect(dsn(), autocommit=True) as conn:
+        seed(conn, args.deals, args.pipelines, args.stages)
+        indexes = [r[0] for r in conn.execute(
+            "SELECT indexname FROM pg_indexes WHERE tablename = 'deals' ORDER BY indexname"
+        )]
+        results = run(conn)
+
+    report = {"label": args.label, "deals": args.deals, "indexes": indexes, "results": results}
+    print(f"== {args.label}: indexes on deals: {', '.join(indexes)}")
+    print_table(results)
+
+    out = args.out or f"bench_deals_{args.label}.json"
+    if out == "-":
+        json.dump(report, sys.stdout, default=str, indent=2)
+    else:
+        with open(out, "w") as f:
+            json.dump(report, f, default=str, indent=2)
+        print(f"saved {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
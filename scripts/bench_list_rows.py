@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+List hydration benchmark: allocations per 500-row deals page, ORM instances vs. column rows.
+
+  orm:  select(Deal) -> scalars().all()           (identity map + instance state per row)
+  rows: select(*columns) -> all()                 (SQLAlchemy Row: C-level tuple, no session state)
+
+Runs against in-memory SQLite (no Postgres needed) so only the SQLAlchemy side differs;
+memory is measured with tracemalloc (peak and retained while the page is alive), plus
+the response_model validation both results go through (must produce identical JSON).
+
+  cd services/core && python ../../scripts/bench_list_rows.py [--rows 500] [--iterations 50]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+sys.path.insert(0, os.getcwd())
+
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+from sqlalchemy import create_engine, insert, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.api.deals import DealOut  # noqa: E402
+from app.api.fast_json import out_columns  # noqa: E402
+from app.models import Deal  # noqa: E402
+
+# SQLite хранит Numeric как float - для бенчмарка это неважно
+warnings.filterwarnings("ignore", message=".*Dialect sqlite.*Decimal.*")
+
+
+def seed(engine, n: int) -> None:
+    Deal.__table__.create(engine)
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Deal),
+            [
+                {
+                    "deal_id": f"d_{i:032x}",
+                    "tenant_id": "bench",
+                    "title": f"Deal number {i}",
+                    "amount": Decimal(f"{i * 37 % 100000}.{i % 100:02d}"),
+                    "currency": "USD",
+                    "company_id": None,
+                    "contact_id": None,
+                    "pipeline_id": "pl_bench",
+                    "stage_id": f"st_{i % 5}",
+                    "created_at": base + timedelta(seconds=i),
+                    "updated_at": base + timedelta(seconds=i),
+                }
+                for i in range(n)
+            ],
+        )
+
+
+def load_orm(engine, n: int) -> list:
+    with Session(engine) as session:
+        rows = session.execute(select(Deal).order_by(Deal.created_at.desc()).limit(n)).scalars().all()
+        # живы, пока страница сериализуется; сессия как в handler'е - до конца запроса
+        return _measure_alive(rows)
+
+
+def load_rows(engine, n: int) -> list:
+    with Session(engine) as session:
+        rows = session.execute(select(*out_columns(Deal.__table__, DealOut)).order_by(Deal.created_at.desc()).limit(n)).all()
+        return _measure_alive(rows)
+
+
+_retained: list[int] = []
+
+
+def _measure_alive(rows: list) -> list:
+    gc.collect()
+    _retained.append(tracemalloc.get_traced_memory()[0])
+    return rows
+
+
+def measure(fn, engine, n: int) -> dict:
+    gc.collect()
+    _retained.clear()
+    tracemalloc.start()
+    base_current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    rows = fn(engine, n)
+    _current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(s.count for s in snapshot.statistics("filename"))
+    return {
+        "rows": rows,
+        "peak_kib": (peak - base_current) / 1024,
+        "retained_kib": (_retained[0] - base_current) / 1024,
+        "blocks": blocks,
+    }
+
+
+def cpu_ms(fn, engine, n: int, iterations: int) -> float:
+    fn(engine, n)
+    started = time.process_time()
+    for _ in range(iterations):
+        fn(engine, n)
+    return (time.process_time() - started) * 1000 / iterations
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=500)
+    ap.add_argument("--iterations", type=int, default=50)
+    args = ap.parse_args()
+
+    engine = create_engine("sqlite://")
+    seed(engine, args.rows)
+    field = create_model_field(name="Response_list_deals", type_=list[DealOut], mode="serialization")
+
+    results = {}
+    for name, fn in (("orm", load_orm), ("rows", load_rows)):
+        m = measure(fn, engine, args.rows)
+        m["json"] = asyncio.run(serialize_response(field=field, response_content=m.pop("rows")))
+        m["cpu_ms"] = cpu_ms(fn, engine, args.rows, args.iterations)
+        results[name] = m
+
+    if json.dumps(results["orm"].pop("json"), default=str) != json.dumps(results["rows"].pop("json"), default=str):
+        print("MISMATCH: row path serializes differently from ORM path", file=sys.stderr)
+        return 1
+
+    print(f"rows/page: {args.rows}")
+    print(f"{'':6} {'peak KiB':>10} {'alive KiB':>10} {'live blocks':>12} {'load ms CPU':>12}")
+    for name, m in results.items():
+        print(f"{name:6} {m['peak_kib']:10.1f} {m['retained_kib']:10.1f} {m['blocks']:12d} {m['cpu_ms']:12.3f}")
+    orm, rows = results["orm"], results["rows"]
+    print(f"alive memory: x{orm['retained_kib'] / rows['retained_kib']:.1f} less, load CPU: x{orm['cpu_ms'] / rows['cpu_ms']:.1f} less")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Login contention benchmark.
+
+Measures GET /api/deals latency (p50/p99) twice:
+  1) baseline: deals readers only
+  2) contention: same readers while login hammer threads call /api/auth/login
+
+With bcrypt on the event loop, p99 of /deals jumps by ~bcrypt cost under contention.
+With the bounded password pool it should stay flat (logins may get fast 503s instead).
+
+Usage:
+  BASE=http://localhost:8088 python scripts/bench_login_contention.py --seconds 15 --readers 4 --hammers 16
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import threading
+import time
+
+import requests
+
+BASE = os.environ.get("BASE", "http://localhost:8088")
+LOGIN = {"tenant": "demo", "email": "admin@demo.local", "password": "admin123"}
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+
+def login_token() -> str:
+    requests.post(f"{BASE}/api/bootstrap", timeout=10).raise_for_status()
+    r = requests.post(f"{BASE}/api/auth/login", json=LOGIN, timeout=10)
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+
+def reader(token: str, stop: threading.Event, out: list[float]) -> None:
+    s = requests.Session()
+    headers = {"Authorization": f"Bearer {token}"}
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        r = s.get(f"{BASE}/api/deals?limit=50", headers=headers, timeout=30)
+        dt = (time.perf_counter() - t0) * 1000
+        if r.status_code == 200:
+            out.append(dt)
+
+
+def hammer(stop: threading.Event, codes: dict[int, int], lock: threading.Lock) -> None:
+    s = requests.Session()
+    while not stop.is_set():
+        r = s.post(f"{BASE}/api/auth/login", json=LOGIN, timeout=30)
+        with lock:
+            codes[r.status_code] = codes.get(r.status_code, 0) + 1
+
+
+def run_phase(token: str, seconds: float, readers: int, hammers: int) -> tuple[list[float], dict[int, int]]:
+    stop = threading.Event()
+    lat: list[float] = []
+    codes: dict[int, int] = {}
+    lock = threading.Lock()
+
+    threads = [threading.Thread(target=reader, args=(token, stop, lat)) for _ in range(readers)]
+    threads += [threading.Thread(target=hammer, args=(stop, codes, lock)) for _ in range(hammers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return lat, codes
+
+
+def report(name: str, lat: list[float], codes: dict[int, int]) -> None:
+    print(f"== {name} ==")
+    print(f"  /deals requests: {len(lat)}")
+    if lat:
+        print(f"  p50={percentile(lat, 50):.1f}ms p99={percentile(lat, 99):.1f}ms max={max(lat):.1f}ms mean={statistics.mean(lat):.1f}ms")
+    if codes:
+        print(f"  /auth/login status codes: {dict(sorted(codes.items()))}")
+    print()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=15)
+    ap.add_argument("--readers", type=int, default=4)
+    ap.add_argument("--hammers", type=int, default=16)
+    args = ap.parse_args()
+
+    token = login_token()
+
+    base_lat, _ = run_phase(token, args.seconds, args.readers, 0)
+    report("baseline (readers only)", base_lat, {})
+
+    cont_lat, codes = run_phase(token, args.seconds, args.readers, args.hammers)
+    report(f"contention ({args.hammers} login threads)", cont_lat, codes)
+
+    if base_lat and cont_lat:
+        ratio = percentile(cont_lat, 99) / max(percentile(base_lat, 99), 0.001)
+        print(f"p99 ratio contention/baseline: {ratio:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""0005_sessions_partitioned
+
+Range-partition `sessions` by `expires_at` (daily partitions).
+Expired partitions are dropped whole by the runner instead of deleted row by row.
+
+Revision ID: 0005_sessions_partitioned
+Revises: db3b42464b7f
+"""
+
+from alembic import op
+
+revision = "0005_sessions_partitioned"
+down_revision = "db3b42464b7f"
+branch_labels = None
+depends_on = None
+
+# сколько дневных партиций создаём сразу; дальше их докатывает runner (sessions_partitions job)
+DAYS_AHEAD = 14
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE sessions RENAME TO sessions_legacy")
+    op.execute("ALTER TABLE sessions_legacy RENAME CONSTRAINT sessions_pkey TO sessions_legacy_pkey")
+    op.execute("ALTER INDEX ix_sessions_tenant_id RENAME TO ix_sessions_legacy_tenant_id")
+    op.execute("ALTER INDEX ix_sessions_user_id RENAME TO ix_sessions_legacy_user_id")
+
+    # PK партиционированной таблицы обязан включать ключ партиционирования
+    op.execute(
+        """
+        CREATE TABLE sessions (
+            token VARCHAR(128) NOT NULL,
+            tenant_id VARCHAR(64) NOT NULL REFERENCES tenants(tenant_id) ON DELETE CASCADE,
+            user_id VARCHAR(64) NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            expires_at TIMESTAMPTZ NOT NULL,
+            revoked_at TIMESTAMPTZ NULL,
+            ip VARCHAR(64) NOT NULL DEFAULT '',
+            user_agent TEXT NOT NULL DEFAULT '',
+            CONSTRAINT sessions_pkey PRIMARY KEY (token, expires_at)
+        ) PARTITION BY RANGE (expires_at)
+        """
+    )
+    op.execute("CREATE INDEX ix_sessions_tenant_id ON sessions (tenant_id)")
+    op.execute("CREATE INDEX ix_sessions_user_id ON sessions (user_id)")
+    op.execute("CREATE INDEX ix_sessions_revoked_at ON sessions (revoked_at) WHERE revoked_at IS NOT NULL")
+
+    # safety net for expires_at outside the pre-created range
+    op.execute("CREATE TABLE sessions_default PARTITION OF sessions DEFAULT")
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            today date := (now() AT TIME ZONE 'UTC')::date;
+            d date;
+        BEGIN
+            -- дни и границы в UTC, как у runner (sessions_reaper): current_date и литерал date
+            -- без offset'а зависели бы от TimeZone сервера и давали бы нахлёст/дыры между партициями
+            FOR d IN SELECT generate_series(today - 1, today + {DAYS_AHEAD}, interval '1 day')::date
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF sessions FOR VALUES FROM (%L) TO (%L)',
+                    'sessions_p' || to_char(d, 'YYYYMMDD'),
+                    to_char(d, 'YYYY-MM-DD') || ' 00:00:00+00',
+                    to_char(d + 1, 'YYYY-MM-DD') || ' 00:00:00+00'
+                );
+            END LOOP;
+        END $$
+        """
+    )
+
+    # живые сессии переносим, мусор остаётся в legacy и уходит вместе с ней
+    op.execute(
+        """
+        INSERT INTO sessions (token, tenant_id, user_id, created_at, expires_at, revoked_at, ip, user_agent)
+        SELECT token, tenant_id, user_id, created_at, expires_at, revoked_at, ip, user_agent
+        FROM sessions_legacy
+        WHERE expires_at > now() AND revoked_at IS NULL
+        """
+    )
+    op.execute("DROP TABLE sessions_legacy")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE sessions RENAME TO sessions_partitioned")
+    op.execute("ALTER TABLE sessions_partitioned RENAME CONSTRAINT sessions_pkey TO sessions_partitioned_pkey")
+    op.execute("DROP INDEX ix_sessions_tenant_id")
+    op.execute("DROP INDEX ix_sessions_user_id")
+    op.execute("DROP INDEX ix_sessions_revoked_at")
+
+    op.execute(
+        """
+        CREATE TABLE sessions (
+            token VARCHAR(128) NOT NULL PRIMARY KEY,
+            tenant_id VARCHAR(64) NOT NULL REFERENCES tenants(tenant_id) ON DELETE CASCADE,
+            user_id VARCHAR(64) NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            expires_at TIMESTAMPTZ NOT NULL,
+            revoked_at TIMESTAMPTZ NULL,
+            ip VARCHAR(64) NOT NULL DEFAULT '',
+            user_agent TEXT NOT NULL DEFAULT ''
+        )
+        """
+    )
+    op.execute("CREATE INDEX ix_sessions_tenant_id ON sessions (tenant_id)")
+    op.execute("CREATE INDEX ix_sessions_user_id ON sessions (user_id)")
+    op.execute(
+        """
+        INSERT INTO sessions (token, tenant_id, user_id, created_at, expires_at, revoked_at, ip, user_agent)
+        SELECT token, tenant_id, user_id, created_at, expires_at, revoked_at, ip, user_agent
+        FROM sessions_partitioned
+        WHERE expires_at > now()
+        ON CONFLICT (token) DO NOTHING
+        """
+    )
+    op.execute("DROP TABLE sessions_partitioned")
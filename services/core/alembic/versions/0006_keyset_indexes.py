@@ -0,0 +1,38 @@
+"""0006_keyset_indexes
+
+Indexes for keyset pagination by (created_at, id) on deals and pipelines.
+contacts/companies are served by the existing ix_*_tenant_created indexes.
+
+Built with CREATE INDEX CONCURRENTLY so deals/pipelines stay writable during the build.
+
+Revision ID: 0006_keyset_indexes
+Revises: 0005_sessions_partitioned
+"""
+
+from alembic import op
+
+revision = "0006_keyset_indexes"
+down_revision = "0005_sessions_partitioned"
+branch_labels = None
+depends_on = None
+
+
+INDEXES = {
+    "ix_deals_tenant_created": ("deals", ["tenant_id", "created_at", "deal_id"]),
+    "ix_pipelines_tenant_created": ("pipelines", ["tenant_id", "created_at", "pipeline_id"]),
+}
+
+
+def upgrade() -> None:
+    # CONCURRENTLY нельзя внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, (table, cols) in INDEXES.items():
+            # упавший CONCURRENTLY оставляет INVALID индекс - пересобираем с нуля
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+            op.create_index(name, table, cols, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, (table, _cols) in reversed(INDEXES.items()):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,39 @@
+"""0007_deals_composite_indexes
+
+Tenant-leading composite indexes for the list_deals filter/order combinations:
+  tenant                      -> ix_deals_tenant_created (0006)
+  tenant + pipeline           -> ix_deals_tenant_pipeline_created
+  tenant + stage [+ pipeline] -> ix_deals_tenant_stage_created (stage implies pipeline)
+
+Built with CREATE INDEX CONCURRENTLY so the deals table stays writable during the build.
+
+Revision ID: 0007_deals_composite_indexes
+Revises: 0006_keyset_indexes
+"""
+
+from alembic import op
+
+revision = "0007_deals_composite_indexes"
+down_revision = "0006_keyset_indexes"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "ix_deals_tenant_pipeline_created": "(tenant_id, pipeline_id, created_at, deal_id)",
+    "ix_deals_tenant_stage_created": "(tenant_id, stage_id, created_at, deal_id)",
+}
+
+
+def upgrade() -> None:
+    # CONCURRENTLY нельзя внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, cols in INDEXES.items():
+            # упавший CONCURRENTLY оставляет INVALID индекс - пересобираем с нуля
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            op.execute(f"CREATE INDEX CONCURRENTLY {name} ON deals {cols}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
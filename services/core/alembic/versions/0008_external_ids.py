@@ -0,0 +1,37 @@
+"""0008_external_ids
+
+contacts/companies.external_id: id of the record in an external system,
+upsert key of POST /contacts:batch and /companies:batch (unique per tenant, NULLs allowed).
+
+Revision ID: 0008_external_ids
+Revises: 0007_deals_composite_indexes
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008_external_ids"
+down_revision = "0007_deals_composite_indexes"
+branch_labels = None
+depends_on = None
+
+TABLES = ("contacts", "companies")
+
+
+def upgrade() -> None:
+    # nullable ADD COLUMN без default - только каталог, таблица не переписывается
+    for table in TABLES:
+        op.add_column(table, sa.Column("external_id", sa.String(length=128), nullable=True))
+
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ux_{table}_tenant_external")
+            op.execute(
+                f"CREATE UNIQUE INDEX CONCURRENTLY ux_{table}_tenant_external ON {table} (tenant_id, external_id)"
+            )
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_index(f"ux_{table}_tenant_external", table_name=table)
+        op.drop_column(table, "external_id")
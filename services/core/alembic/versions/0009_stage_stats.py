@@ -0,0 +1,42 @@
+"""0009_stage_stats
+
+Per-stage aggregates (deal count, amount sum by currency), maintained by deltas in the
+deals write paths and repaired by the runner (stage_stats_reconcile). Backfilled from deals.
+
+Revision ID: 0009_stage_stats
+Revises: 0008_external_ids
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009_stage_stats"
+down_revision = "0008_external_ids"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "stage_stats",
+        sa.Column("tenant_id", sa.String(length=64), nullable=False),
+        sa.Column("pipeline_id", sa.String(length=64), nullable=False),
+        sa.Column("stage_id", sa.String(length=64), nullable=False),
+        sa.Column("currency", sa.String(length=10), nullable=False),
+        sa.Column("deal_count", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("amount_sum", sa.Numeric(precision=18, scale=2), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.PrimaryKeyConstraint("tenant_id", "pipeline_id", "stage_id", "currency"),
+    )
+    op.execute(
+        """
+        INSERT INTO stage_stats (tenant_id, pipeline_id, stage_id, currency, deal_count, amount_sum)
+        SELECT tenant_id, pipeline_id, stage_id, currency, count(*), coalesce(sum(amount), 0)
+        FROM deals
+        GROUP BY tenant_id, pipeline_id, stage_id, currency
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("stage_stats")
@@ -0,0 +1,75 @@
+"""0010_stage_transitions_funnel
+
+deal_stage_transitions: append-only history of deal stage changes, written in the same
+transaction as the change. funnel_daily: per (tenant, pipeline, stage, UTC day) rollup built
+incrementally by the runner (funnel_rollup); funnel_rollup_state holds its xid watermark.
+
+Revision ID: 0010_stage_transitions_funnel
+Revises: 0009_stage_stats
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010_stage_transitions_funnel"
+down_revision = "0009_stage_stats"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # без FK на deals: история переживает удаление сделки.
+    # txid - xid пишущей транзакции: rollup берёт watermark = xmin своего снапшота,
+    # поэтому строки транзакций, закоммиченных "позже" по времени, не теряются
+    op.execute(
+        """
+        CREATE TABLE deal_stage_transitions (
+            transition_id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+            tenant_id VARCHAR(64) NOT NULL,
+            deal_id VARCHAR(64) NOT NULL,
+            pipeline_id VARCHAR(64) NOT NULL,
+            from_stage_id VARCHAR(64) NULL,
+            to_stage_id VARCHAR(64) NOT NULL,
+            transitioned_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            seconds_in_from_stage DOUBLE PRECISION NULL,
+            txid XID8 NOT NULL DEFAULT pg_current_xact_id()
+        )
+        """
+    )
+    op.execute("CREATE INDEX ix_dst_tenant_deal ON deal_stage_transitions (tenant_id, deal_id, transitioned_at)")
+    op.execute(
+        "CREATE INDEX ix_dst_tenant_pipeline_at ON deal_stage_transitions (tenant_id, pipeline_id, transitioned_at)"
+    )
+    op.execute("CREATE INDEX ix_dst_txid ON deal_stage_transitions (txid)")
+
+    op.create_table(
+        "funnel_daily",
+        sa.Column("tenant_id", sa.String(length=64), nullable=False),
+        sa.Column("pipeline_id", sa.String(length=64), nullable=False),
+        sa.Column("stage_id", sa.String(length=64), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("entered", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("exited", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("won", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("lost", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("median_seconds_in_stage", sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint("tenant_id", "pipeline_id", "day", "stage_id"),
+    )
+
+    op.execute("CREATE TABLE funnel_rollup_state (id SMALLINT PRIMARY KEY CHECK (id = 1), last_xid XID8 NOT NULL)")
+    op.execute("INSERT INTO funnel_rollup_state (id, last_xid) VALUES (1, '0')")
+
+    # существующие сделки: "вход" в текущую стадию в момент создания
+    op.execute(
+        """
+        INSERT INTO deal_stage_transitions (tenant_id, deal_id, pipeline_id, from_stage_id, to_stage_id, transitioned_at)
+        SELECT tenant_id, deal_id, pipeline_id, NULL, stage_id, created_at
+        FROM deals
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("funnel_rollup_state")
+    op.drop_table("funnel_daily")
+    op.drop_table("deal_stage_transitions")
@@ -0,0 +1,44 @@
+"""0011_search_trgm
+
+Trigram search for GET /search: pg_trgm + btree_gin, one GIN index per table on
+(tenant_id, normalized search text), so the tenant filter and the infix match are a single index scan.
+The expressions must stay byte-identical to app/api/search.py.
+
+Revision ID: 0011_search_trgm
+Revises: 0010_stage_transitions_funnel
+"""
+
+from alembic import op
+
+revision = "0011_search_trgm"
+down_revision = "0010_stage_transitions_funnel"
+branch_labels = None
+depends_on = None
+
+CONTACTS_EXPR = (
+    "lower(name || ' ' || coalesce(email, '') || ' ' || coalesce(phone, '') || ' ' "
+    "|| regexp_replace(coalesce(phone, ''), '[^0-9]', '', 'g'))"
+)
+COMPANIES_EXPR = "lower(name || ' ' || coalesce(domain, ''))"
+
+INDEXES = {
+    "ix_contacts_search_trgm": ("contacts", CONTACTS_EXPR),
+    "ix_companies_search_trgm": ("companies", COMPANIES_EXPR),
+}
+
+
+def upgrade() -> None:
+    # trusted extensions (PG13+): владелец БД может создать их сам
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+
+    with op.get_context().autocommit_block():
+        for name, (table, expr) in INDEXES.items():
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            op.execute(f"CREATE INDEX CONCURRENTLY {name} ON {table} USING gin (tenant_id, ({expr}) gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,46 @@
+"""0012_duplicate_candidates
+
+Duplicate clusters found by the runner (dedup_scan) by blocking key:
+contact email (case/space-insensitive), contact phone (digits only), company domain (normalized).
+One row per (tenant, entity, key type, key); resolved via POST /duplicates/{id}/merge or /dismiss.
+
+Revision ID: 0012_duplicate_candidates
+Revises: 0011_search_trgm
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0012_duplicate_candidates"
+down_revision = "0011_search_trgm"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "duplicate_candidates",
+        sa.Column("candidate_id", sa.BigInteger(), sa.Identity(always=True), primary_key=True),
+        sa.Column("tenant_id", sa.String(length=64), nullable=False),
+        sa.Column("entity", sa.String(length=16), nullable=False),
+        sa.Column("key_type", sa.String(length=16), nullable=False),
+        sa.Column("block_key", sa.Text(), nullable=False),
+        sa.Column("record_ids", postgresql.ARRAY(sa.String(length=64)), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        # open | merged | dismissed | gone (кластер исчез сам)
+        sa.Column("status", sa.String(length=16), nullable=False, server_default="open"),
+        sa.Column("detected_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.Column("resolved_at", sa.DateTime(timezone=True), nullable=True),
+        sa.UniqueConstraint("tenant_id", "entity", "key_type", "block_key", name="ux_duplicate_candidates_key"),
+    )
+    op.create_index(
+        "ix_duplicate_candidates_tenant_status",
+        "duplicate_candidates",
+        ["tenant_id", "status", "entity", "candidate_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_duplicate_candidates_tenant_status", table_name="duplicate_candidates")
+    op.drop_table("duplicate_candidates")
@@ -0,0 +1,47 @@
+"""0013_access_profiles
+
+Field-level access profiles (Roadmap Block 3): per-entity field allowlists,
+assigned to users via users.access_profile_id (NULL = all fields).
+
+Revision ID: 0013_access_profiles
+Revises: 0012_duplicate_candidates
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0013_access_profiles"
+down_revision = "0012_duplicate_candidates"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "access_profiles",
+        sa.Column("profile_id", sa.String(length=64), primary_key=True),
+        sa.Column("tenant_id", sa.String(length=64), sa.ForeignKey("tenants.tenant_id", ondelete="CASCADE"), nullable=False),
+        sa.Column("name", sa.String(length=128), nullable=False),
+        # {"deal": ["deal_id", "title", ...], "contact": [...]}; сущности нет в ключах - все поля
+        sa.Column("fields", postgresql.JSONB(), nullable=False, server_default=sa.text("'{}'::jsonb")),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.UniqueConstraint("tenant_id", "name", name="ux_access_profiles_tenant_name"),
+    )
+    op.add_column(
+        "users",
+        sa.Column(
+            "access_profile_id",
+            sa.String(length=64),
+            sa.ForeignKey("access_profiles.profile_id", ondelete="SET NULL"),
+            nullable=True,
+        ),
+    )
+    op.create_index("ix_users_access_profile", "users", ["access_profile_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_access_profile", table_name="users")
+    op.drop_column("users", "access_profile_id")
+    op.drop_table("access_profiles")
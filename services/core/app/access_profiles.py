@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional, Sequence
+
+from fastapi import HTTPException, Response, status
+from pydantic import TypeAdapter
+from sqlalchemy import Table, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing_extensions import TypedDict
+
+from app import pubsub
+from app.db import SessionLocal
+from app.models import AccessProfile, Company, Contact, Deal
+from app.security import AuthUser
+
+log = logging.getLogger(__name__)
+
+# Field-level access profiles (Roadmap Block 3).
+# Профиль = allowlist полей по сущностям. Компилируется один раз на профиль в Projection:
+# колонки для SELECT (читаем только разрешённое) + готовый pydantic-сериализатор ровно этих полей.
+# Пользователь без профиля идёт обычным путём (response_model), без накладных расходов.
+#
+# Изменение профиля -> ACCESS_PROFILES_CHANNEL -> все воркеры выкидывают скомпилированное.
+
+ACCESS_PROFILES_CHANNEL = "nextcrm:access_profiles:invalidate"
+
+MAX_PROFILES = 1000
+
+# сущность -> (модель, id-поле); поля сущности = колонки таблицы (= поля *Out-моделей)
+ENTITIES: dict[str, tuple[Any, str]] = {
+    "deal": (Deal, "deal_id"),
+    "contact": (Contact, "contact_id"),
+    "company": (Company, "company_id"),
+}
+
+# всегда читаются (keyset-курсор списков, ETag сущности), но клиенту отдаются только если разрешены
+_HIDDEN_FIELDS = ("created_at", "updated_at")
+
+
+def entity_fields(entity: str) -> list[str]:
+    model, _id = ENTITIES[entity]
+    return [c.name for c in model.__table__.c]
+
+
+def validate_fields(fields: dict[str, list[str]]) -> dict[str, list[str]]:
+    """Normalize a profile's allowlist: known entities/fields only, id field always included, table order."""
+    out: dict[str, list[str]] = {}
+    for entity, allowed in fields.items():
+        if entity not in ENTITIES:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Unknown entity: {entity}")
+        known = entity_fields(entity)
+        unknown = sorted(set(allowed) - set(known))
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Unknown fields for {entity}: {', '.join(unknown)}",
+            )
+        keep = set(allowed) | {ENTITIES[entity][1]}
+        out[entity] = [f for f in known if f in keep]
+    return out
+
+
+@dataclass(frozen=True)
+class Projection:
+    entity: str
+    # поля, которые видит клиент (порядок таблицы)
+    fields: tuple[str, ...]
+    # SELECT-список: fields + служебные колонки в хвосте (zip по fields их отбрасывает)
+    columns: tuple[Any, ...]
+    adapter: TypeAdapter
+
+    def dump(self, rows: Iterable[Any]) -> bytes:
+        fields = self.fields
+        return self.adapter.dump_json([dict(zip(fields, row)) for row in rows])
+
+    def response(self, rows: Iterable[Any], headers: dict[str, str] | None = None) -> Response:
+        return Response(content=self.dump(rows), media_type="application/json", headers=headers)
+
+    def response_one(self, row: Any, headers: dict[str, str] | None = None) -> Response:
+        return Response(content=self.dump([row])[1:-1], media_type="application/json", headers=headers)
+
+    def strip(self, item: dict[str, Any]) -> dict[str, Any]:
+        """For small nested payloads that are already dicts (e.g. board cards)."""
+        return {k: item[k] for k in self.fields}
+
+
+def compile_projection(entity: str, name: str, table: Table, fields: Sequence[str]) -> Projection:
+    """Column list + serializer for exactly `fields` of `table` (also used for sparse fieldsets, app/api/fieldsets.py)."""
+    fields = tuple(fields)
+    hidden = [f for f in _HIDDEN_FIELDS if f not in fields and f in table.c]
+    # типы из колонок: сериализация как у DealOut/ContactOut (Decimal -> "7.00", datetime -> ISO)
+    row_type = TypedDict(  # type: ignore[misc]
+        name,
+        {
+            f: (Optional[table.c[f].type.python_type] if table.c[f].nullable else table.c[f].type.python_type)
+            for f in fields
+        },
+    )
+    return Projection(
+        entity=entity,
+        fields=fields,
+        columns=tuple(table.c[f] for f in (*fields, *hidden)),
+        adapter=TypeAdapter(list[row_type]),
+    )
+
+
+def _compile(profile_id: str, entity: str, allowed: list[str]) -> Projection:
+    model, _id = ENTITIES[entity]
+    return compile_projection(entity, f"{entity}_{profile_id}", model.__table__, allowed)
+
+
+@dataclass(frozen=True)
+class CompiledProfile:
+    profile_id: str
+    tenant_id: str
+    # updated_at профиля (мкс, hex): входит в ETag - правка профиля меняет форму ответов
+    version: str
+    # нет сущности в dict - все поля
+    projections: dict[str, Projection]
+
+
+class AccessProfileCache:
+    def __init__(self, max_profiles: int) -> None:
+        self.max_profiles = max_profiles
+        self._entries: OrderedDict[str, CompiledProfile] = OrderedDict()
+        # счётчик инвалидаций: загрузка, начатая до инвалидации, в кэш не попадает
+        self._epoch: dict[str, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, db: AsyncSession, tenant_id: str, profile_id: str) -> CompiledProfile:
+        compiled = self._entries.get(profile_id)
+        if compiled is not None:
+            self._entries.move_to_end(profile_id)
+            self.hits += 1
+        else:
+            self.misses += 1
+            compiled = await self._load(db, profile_id)
+        if compiled is None or compiled.tenant_id != tenant_id:
+            # профиль удалён между выдачей токена и запросом: закрыто, а не "все поля"
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access profile not found")
+        return compiled
+
+    async def _load(self, db: AsyncSession, profile_id: str) -> CompiledProfile | None:
+        epoch = self._epoch.get(profile_id, 0)
+        q = select(AccessProfile.tenant_id, AccessProfile.fields, AccessProfile.updated_at).where(AccessProfile.profile_id == profile_id)
+        if db.info.get("replica"):
+            # как pipeline_cache: инвалидация приходит по commit на primary, реплика может отставать
+            async with SessionLocal() as primary:
+                row = (await primary.execute(q)).first()
+        else:
+            row = (await db.execute(q)).first()
+        if row is None:
+            return None
+
+        compiled = CompiledProfile(
+            profile_id=profile_id,
+            tenant_id=row.tenant_id,
+            version=format(int(row.updated_at.timestamp() * 1_000_000), "x"),
+            projections={
+                entity: _compile(profile_id, entity, allowed)
+                for entity, allowed in validate_fields(row.fields or {}).items()
+            },
+        )
+        if epoch == self._epoch.get(profile_id, 0):
+            self._entries[profile_id] = compiled
+            while len(self._entries) > self.max_profiles:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def invalidate(self, profile_id: str) -> None:
+        self._epoch[profile_id] = self._epoch.get(profile_id, 0) + 1
+        if self._entries.pop(profile_id, None) is not None:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "profiles": len(self._entries),
+            "max_profiles": self.max_profiles,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+access_profile_cache = AccessProfileCache(MAX_PROFILES)
+
+
+async def projection_for(db: AsyncSession, user: AuthUser, entity: str) -> Projection | None:
+    """None = no restriction for this user/entity: use the regular response_model path."""
+    if not user.access_profile_id:
+        return None
+    compiled = await access_profile_cache.get(db, user.tenant_id, user.access_profile_id)
+    return compiled.projections.get(entity)
+
+
+async def publish_profile_changed(profile_id: str) -> None:
+    """Call AFTER commit of any write to the profile."""
+    await pubsub.publish(ACCESS_PROFILES_CHANNEL, {"profile_id": profile_id})
+
+
+def _on_invalidate(message: dict[str, Any]) -> None:
+    access_profile_cache.invalidate(message["profile_id"])
+
+
+pubsub.subscribe(ACCESS_PROFILES_CHANNEL, _on_invalidate, reset=access_profile_cache.clear)
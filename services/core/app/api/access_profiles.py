@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from datetime import datetime
+from uuid import uuid4
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from pydantic import BaseModel, ConfigDict, Field
+from sqlalchemy import exists, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.access_profiles import publish_profile_changed, validate_fields
+from app.db import get_db
+from app.models import AccessProfile, User
+from app.security import invalidate_user_sessions, require_admin, require_bearer_user
+
+router = APIRouter(tags=["access-profiles"])
+
+
+class AccessProfileIn(BaseModel):
+    name: str = Field(..., min_length=1, max_length=128)
+    # {"deal": ["title", "stage_id"], ...}; id-поле добавляется всегда; сущности нет - все поля
+    fields: dict[str, list[str]] = Field(default_factory=dict)
+
+
+class AccessProfileOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    profile_id: str
+    tenant_id: str
+    name: str
+    fields: dict[str, list[str]]
+    created_at: datetime
+    updated_at: datetime
+
+
+class UserAccessProfileIn(BaseModel):
+    access_profile_id: str | None
+
+
+async def _get_profile(db: AsyncSession, tenant_id: str, profile_id: str) -> AccessProfile:
+    q = select(AccessProfile).where(AccessProfile.tenant_id == tenant_id, AccessProfile.profile_id == profile_id)
+    profile = (await db.execute(q)).scalar_one_or_none()
+    if not profile:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Access profile not found")
+    return profile
+
+
+async def _commit_unique_name(db: AsyncSession) -> None:
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Access profile name already exists")
+
+
+@router.get("/access-profiles", response_model=list[AccessProfileOut])
+async def list_access_profiles(request: Request, db: AsyncSession = Depends(get_db)):
+    tenant_id, user = await require_bearer_user(db, request)
+    require_admin(user)
+
+    q = select(AccessProfile).where(AccessProfile.tenant_id == tenant_id).order_by(AccessProfile.name)
+    return list((await db.execute(q)).scalars().all())
+
+
+@router.post("/access-profiles", response_model=AccessProfileOut, status_code=status.HTTP_201_CREATED)
+async def create_access_profile(payload: AccessProfileIn, request: Request, db: AsyncSession = Depends(get_db)):
+    tenant_id, user = await require_bearer_user(db, request)
+    require_admin(user)
+
+    profile = AccessProfile(
+        profile_id=f"ap_{uuid4().hex}",
+        tenant_id=tenant_id,
+        name=payload.name.strip(),
+        fields=validate_fields(payload.fields),
+    )
+    db.add(profile)
+    await _commit_unique_name(db)
+    await db.refresh(profile)
+    return profile
+
+
+@router.put("/access-profiles/{profile_id}", response_model=AccessProfileOut)
+async def replace_access_profile(
+    profile_id: str, payload: AccessProfileIn, request: Request, db: AsyncSession = Depends(get_db)
+):
+    tenant_id, user = await require_bearer_user(db, request)
+    require_admin(user)
+
+    profile = await _get_profile(db, tenant_id, profile_id)
+    profile.name = payload.name.strip()
+    profile.fields = validate_fields(payload.fields)
+    await _commit_unique_name(db)
+    # скомпилированные проекции профиля во всех воркерах - под замену
+    await publish_profile_changed(profile_id)
+    await db.refresh(profile)
+    return profile
+
+
+@router.delete("/access-profiles/{profile_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_access_profile(profile_id: str, request: Request, db: AsyncSession = Depends(get_db)):
+    tenant_id, user = await require_bearer_user(db, request)
+    require_admin(user)
+
+    profile = await _get_profile(db, tenant_id, profile_id)
+    # FK ON DELETE SET NULL молча дал бы пользователям все поля - сначала переназначьте их
+    in_use = (await db.execute(select(exists().where(User.access_profile_id == profile_id)))).scalar()
+    if in_use:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Access profile is assigned to users")
+    await db.delete(profile)
+    await db.commit()
+    await publish_profile_changed(profile_id)
+    return None
+
+
+@router.put("/users/{user_id}/access-profile", response_model=UserAccessProfileIn)
+async def set_user_access_profile(
+    user_id: str, payload: UserAccessProfileIn, request: Request, db: AsyncSession = Depends(get_db)
+):
+    """
+    Assign (or clear) a user's profile.
+    JWTs of the user are revoked (denylist cutoff): the client re-logs in and gets the new `apid` claim.
+    Opaque sessions stay valid: their session-cache entries are evicted, so the next request re-reads
+    the user from the database and picks up the new profile.
+    """
+    tenant_id, user = await require_bearer_user(db, request)
+    require_admin(user)
+
+    if payload.access_profile_id is not None:
+        await _get_profile(db, tenant_id, payload.access_profile_id)
+    result = await db.execute(
+        update(User)
+        .where(User.tenant_id == tenant_id, User.user_id == user_id)
+        .values(access_profile_id=payload.access_profile_id)
+    )
+    if result.rowcount == 0:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    await db.commit()
+    # JWT: отзыв по denylist (профиль зашит в claim); сессии: выкидываем из session cache
+    await invalidate_user_sessions(user_id)
+    return payload
@@ -10,7 +10,16 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_db
 from app.models import User
-from app.security import create_session, verify_password
+from app.security import (
+    SESSION_TTL_HOURS,
+    create_jwt,
+    create_session,
+    hash_password_async,
+    password_needs_rehash,
+    password_pool,
+    verify_password_async,
+)
+from app.settings import settings
 
 router = APIRouter()
 
@@ -30,14 +39,31 @@ async def login(payload: LoginRequest, request: Request, db: AsyncSession = Depe
         User.is_active == True,  # noqa: E712
     )
     user = (await db.execute(q)).scalar_one_or_none()
-    if not user or not verify_password(payload.password, user.password_hash):
+    # bcrypt уходит в отдельный пул, event loop не блокируется
+    if not user or not await verify_password_async(payload.password, user.password_hash):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
-    token = await create_session(db, payload.tenant, user, request)
+    # хэш с устаревшим cost перехэшируем прозрачно, пока у нас есть пароль в открытом виде
+    if password_needs_rehash(user.password_hash):
+        try:
+            user.password_hash = await hash_password_async(payload.password)
+            await db.commit()
+            password_pool.rehashed += 1
+        except HTTPException:
+            pass  # пул занят - перехэшируем на одном из следующих логинов
+
+    if settings.auth_mode == "jwt":
+        # stateless: токен проверяется локально, строки в sessions нет
+        token = create_jwt(payload.tenant, user)
+        expires_in = settings.jwt_ttl_seconds
+    else:
+        token = await create_session(db, payload.tenant, user, request)
+        expires_in = SESSION_TTL_HOURS * 3600
 
     return {
         "access_token": token,
         "token_type": "bearer",
+        "expires_in": expires_in,
         "tenant_id": payload.tenant,
         "user_id": user.user_id,
         "trace_id": uuid.uuid4().hex,
@@ -61,6 +87,7 @@ async def whoami(
         "user_id": user.user_id,
         "email": user.email,
         "role": user.role,
+        "access_profile_id": user.access_profile_id,
         "trace_id": uuid.uuid4().hex,
     }
 
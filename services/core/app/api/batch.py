@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from typing import Any, List, Literal, Optional
+
+from pydantic import BaseModel
+from sqlalchemy import func, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Shared plumbing for POST /contacts:batch and /companies:batch.
+# Весь батч - одна транзакция: одна проверка ссылок, multi-row INSERT ... ON CONFLICT
+# чанками по INSERT_CHUNK строк, один COMMIT.
+
+BATCH_MAX_ITEMS = 5000
+# asyncpg: не больше 32767 bind-параметров на statement
+INSERT_CHUNK = 1000
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: Literal["created", "updated", "error"]
+    id: Optional[str] = None
+    external_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchResult(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    items: List[BatchItemResult]
+
+
+def item_error(index: int, external_id: str | None, error: str) -> BatchItemResult:
+    return BatchItemResult(index=index, status="error", external_id=external_id, error=error)
+
+
+def column_error(model: Any, item: BaseModel) -> str | None:
+    """
+    Per-item check against the table's String(n) limits (and a non-empty external_id).
+    Не через Field(max_length=...): pydantic отклонил бы 422 весь батч из-за одной строки.
+    """
+    if item.external_id == "":
+        return "external_id must not be empty"
+    table = model.__table__
+    for field, value in item:
+        column = table.c.get(field)
+        limit = getattr(column.type, "length", None) if column is not None else None
+        if isinstance(value, str) and limit and len(value) > limit:
+            return f"{field} must be at most {limit} characters"
+    return None
+
+
+def reject_duplicate_external_ids(
+    external_ids: list[str | None], results: dict[int, BatchItemResult]
+) -> None:
+    """
+    Один external_id дважды в одном INSERT ... ON CONFLICT DO UPDATE - ошибка Postgres
+    ("cannot affect row a second time"), поэтому первый побеждает, повторы - per-item error.
+    """
+    seen: set[str] = set()
+    for i, ext in enumerate(external_ids):
+        if ext is None or i in results:
+            continue
+        if ext in seen:
+            results[i] = item_error(i, ext, "duplicate external_id in batch")
+        else:
+            seen.add(ext)
+
+
+async def upsert_rows(
+    db: AsyncSession,
+    model: Any,
+    id_column: str,
+    rows: list[tuple[int, dict[str, Any]]],
+    replace: tuple[str, ...],
+    keep_if_null: tuple[str, ...],
+    results: dict[int, BatchItemResult],
+) -> None:
+    """
+    rows: (item index, column values incl. generated id and external_id); all dicts share the same keys.
+    On (tenant_id, external_id) conflict `replace` columns are overwritten, `keep_if_null` only when
+    the incoming value is not null. Rows without external_id never conflict and are plain inserts.
+    """
+    table = model.__table__
+    id_col = table.c[id_column]
+
+    for start in range(0, len(rows), INSERT_CHUNK):
+        chunk = rows[start : start + INSERT_CHUNK]
+
+        stmt = pg_insert(model).values([values for _, values in chunk])
+        set_ = {c: stmt.excluded[c] for c in replace}
+        set_.update({c: func.coalesce(stmt.excluded[c], table.c[c]) for c in keep_if_null})
+        set_["updated_at"] = func.now()
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.tenant_id, table.c.external_id], set_=set_
+        ).returning(id_col, table.c.external_id, literal_column("xmax = 0").label("inserted"))
+
+        # порядок RETURNING не гарантирован - сопоставляем по external_id, иначе по нашему id
+        by_key: dict[str, int] = {}
+        for index, values in chunk:
+            by_key[values["external_id"] or values[id_column]] = index
+
+        for row in (await db.execute(stmt)).all():
+            obj_id, ext, inserted = row
+            index = by_key[ext or obj_id]
+            results[index] = BatchItemResult(
+                index=index,
+                status="created" if inserted else "updated",
+                id=obj_id,
+                external_id=ext,
+            )
+
+
+def summarize(results: dict[int, BatchItemResult], total: int) -> BatchResult:
+    items = [results[i] for i in range(total)]
+    return BatchResult(
+        created=sum(1 for r in items if r.status == "created"),
+        updated=sum(1 for r in items if r.status == "updated"),
+        failed=sum(1 for r in items if r.status == "error"),
+        items=items,
+    )
@@ -8,7 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_db
 from app.models import Tenant, User
-from app.security import hash_password
+from app.security import hash_password_async
 
 router = APIRouter()
 
@@ -19,6 +19,9 @@ async def bootstrap(db: AsyncSession = Depends(get_db)):
     admin_email = "admin@demo.local"
     admin_password = "admin123"
     admin_user_id = "u_admin_dev"
+    member_email = "user@demo.local"
+    member_password = "user123"
+    member_user_id = "u_member_dev"
 
     t = (await db.execute(select(Tenant).where(Tenant.tenant_id == tenant_id))).scalar_one_or_none()
     if not t:
@@ -37,16 +40,33 @@ async def bootstrap(db: AsyncSession = Depends(get_db)):
             user_id=admin_user_id,
             tenant_id=tenant_id,
             email=admin_email,
-            password_hash=hash_password(admin_password),
+            password_hash=await hash_password_async(admin_password),
             role="admin",
             is_active=True,
         )
         db.add(u)
         await db.commit()
 
+    # обычный (не admin) пользователь демо-тенанта: права, профили доступа, деактивация
+    member = (await db.execute(select(User).where(User.user_id == member_user_id))).scalar_one_or_none()
+    if not member:
+        db.add(
+            User(
+                user_id=member_user_id,
+                tenant_id=tenant_id,
+                email=member_email,
+                password_hash=await hash_password_async(member_password),
+                role="user",
+                is_active=True,
+            )
+        )
+        await db.commit()
+
     return {
         "tenant_id": tenant_id,
         "admin_user_id": admin_user_id,
         "admin_email": admin_email,
+        "member_user_id": member_user_id,
+        "member_email": member_email,
         "trace_id": uuid4().hex,
     }
\ No newline at end of file
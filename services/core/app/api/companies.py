@@ -1,16 +1,33 @@
 from __future__ import annotations
 
+import uuid
 from datetime import datetime
 from typing import Optional, List
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from pydantic import BaseModel, ConfigDict
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from pydantic import BaseModel, ConfigDict, Field
+from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_db
-from app.models import Company
+from app.api.batch import (
+    BATCH_MAX_ITEMS,
+    BatchItemResult,
+    BatchResult,
+    column_error,
+    item_error,
+    reject_duplicate_external_ids,
+    summarize,
+    upsert_rows,
+)
+from app.access_profiles import projection_for
+from app.api.fast_json import RowsJSONResponse, out_columns
+from app.api.fieldsets import FIELDS_QUERY, sparse_projection
+from app.api.pagination import keyset, page, response_headers
+from app.db import get_db, get_read_db
+from app.etags import bump_collections, check_if_match, entity_etag, etag_variant, list_etag, not_modified
+from app.models import Company, Contact, Deal
 from app.security import require_bearer_user
+from app.settings import settings
 
 router = APIRouter()
 
@@ -25,11 +42,23 @@ class CompanyUpdate(BaseModel):
     domain: Optional[str] = None
 
 
+class CompanyBatchItem(BaseModel):
+    # лимиты длины проверяются per-item (column_error): одна слишком длинная строка не должна валить весь батч
+    external_id: Optional[str] = None
+    name: str
+    domain: Optional[str] = None
+
+
+class CompanyBatchIn(BaseModel):
+    items: List[CompanyBatchItem] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+
 class CompanyOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
     company_id: str
     tenant_id: str
+    external_id: Optional[str] = None
     name: str
     domain: Optional[str]
     created_at: datetime
@@ -43,38 +72,135 @@ async def create_company(payload: CompanyCreate, request: Request, db: AsyncSess
     obj = Company(tenant_id=tenant_id, name=payload.name, domain=payload.domain)
     db.add(obj)
     await db.commit()
+    await bump_collections(tenant_id, "companies")
     await db.refresh(obj)
     return obj
 
 
-@router.get("/companies", response_model=List[CompanyOut])
-async def list_companies(request: Request, db: AsyncSession = Depends(get_db), limit: int = 100):
+@router.post("/companies:batch", response_model=BatchResult)
+async def batch_upsert_companies(payload: CompanyBatchIn, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Create or update up to BATCH_MAX_ITEMS companies in one transaction.
+    Items with external_id are upserted on (tenant_id, external_id); a null domain on update keeps
+    the stored value. Invalid items are reported per index, the rest are written.
+    """
     tenant_id, _user = await require_bearer_user(db, request)
+    items = payload.items
+    results: dict[int, BatchItemResult] = {}
+
+    for i, it in enumerate(items):
+        if error := column_error(Company, it):
+            results[i] = item_error(i, it.external_id, error)
+        elif not it.name.strip():
+            results[i] = item_error(i, it.external_id, "name must not be empty")
+    reject_duplicate_external_ids([it.external_id for it in items], results)
+
+    rows = [
+        (
+            i,
+            {
+                "company_id": f"co_{uuid.uuid4().hex}",
+                "tenant_id": tenant_id,
+                "external_id": it.external_id,
+                "name": it.name.strip(),
+                "domain": it.domain,
+            },
+        )
+        for i, it in enumerate(items)
+        if i not in results
+    ]
+    await upsert_rows(
+        db,
+        Company,
+        "company_id",
+        rows,
+        replace=("name",),
+        keep_if_null=("domain",),
+        results=results,
+    )
+    await db.commit()
+    await bump_collections(tenant_id, "companies")
+    return summarize(results, len(items))
 
-    q = select(Company).where(Company.tenant_id == tenant_id).order_by(Company.created_at.desc()).limit(limit)
-    rows = (await db.execute(q)).scalars().all()
-    return list(rows)
 
+# read-only списки: явные колонки -> Row, без ORM-объектов
+_LIST_COLUMNS = out_columns(Company.__table__, CompanyOut)
+_LIST_FIELDS = tuple(CompanyOut.model_fields)
 
-@router.get("/companies/{company_id}", response_model=CompanyOut)
-async def get_company(company_id: str, request: Request, db: AsyncSession = Depends(get_db)):
-    tenant_id, _user = await require_bearer_user(db, request)
 
-    q = select(Company).where(Company.tenant_id == tenant_id, Company.company_id == company_id)
+@router.get("/companies", response_model=List[CompanyOut])
+async def list_companies(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = FIELDS_QUERY,
+):
+    tenant_id, user = await require_bearer_user(db, request)
+    proj = sparse_projection("company", Company, CompanyOut, "company_id", fields, await projection_for(db, user, "company"))
+    variant = await etag_variant(db, user, fields)
+    # If-None-Match: 304 по счётчику коллекции, без запроса в БД
+    etag = await list_etag(request, db, user, "companies", variant)
+    if unchanged := not_modified(request, etag):
+        return unchanged
+    if etag:
+        response.headers["ETag"] = etag
+
+    q = select(*(proj.columns if proj else _LIST_COLUMNS))
+    q = keyset(q.where(Company.tenant_id == tenant_id), Company.created_at, Company.company_id, cursor, limit)
+    rows = page((await db.execute(q)).all(), limit, response, "company_id")
+    if proj:
+        return proj.response(rows, response_headers(response))
+    if settings.fast_json_lists:
+        return RowsJSONResponse(rows, _LIST_FIELDS, response_headers(response))
+    return rows
+
+
+@router.get("/companies/{company_id}", response_model=CompanyOut)
+async def get_company(
+    company_id: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    fields: Optional[str] = FIELDS_QUERY,
+):
+    tenant_id, user = await require_bearer_user(db, request)
+    proj = sparse_projection("company", Company, CompanyOut, "company_id", fields, await projection_for(db, user, "company"))
+    variant = await etag_variant(db, user, fields)
+    if request.headers.get("If-None-Match"):
+        # ревалидация: только updated_at по PK, строку целиком не читаем
+        q = select(Company.updated_at).where(Company.tenant_id == tenant_id, Company.company_id == company_id)
+        updated_at = (await db.execute(q)).scalar_one_or_none()
+        if updated_at is not None and (unchanged := not_modified(request, entity_etag(updated_at, variant))):
+            return unchanged
+
+    q = select(*proj.columns) if proj else select(Company)
+    q = q.where(Company.tenant_id == tenant_id, Company.company_id == company_id)
+    if proj:
+        row = (await db.execute(q)).first()
+        if not row:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Company not found")
+        return proj.response_one(row, {"ETag": entity_etag(row.updated_at, variant)})
     obj = (await db.execute(q)).scalar_one_or_none()
     if not obj:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Company not found")
+    response.headers["ETag"] = entity_etag(obj.updated_at, variant)
     return obj
 
 
 @router.patch("/companies/{company_id}", response_model=CompanyOut)
-async def update_company(company_id: str, payload: CompanyUpdate, request: Request, db: AsyncSession = Depends(get_db)):
-    tenant_id, _user = await require_bearer_user(db, request)
+async def update_company(
+    company_id: str, payload: CompanyUpdate, request: Request, response: Response, db: AsyncSession = Depends(get_db)
+):
+    tenant_id, user = await require_bearer_user(db, request)
 
-    q = select(Company).where(Company.tenant_id == tenant_id, Company.company_id == company_id)
+    # FOR UPDATE: If-Match сверяется с версией, которую до commit никто не поменяет
+    q = select(Company).where(Company.tenant_id == tenant_id, Company.company_id == company_id).with_for_update()
     obj = (await db.execute(q)).scalar_one_or_none()
     if not obj:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Company not found")
+    check_if_match(request, obj.updated_at)
 
     if payload.name is not None:
         obj.name = payload.name
@@ -82,7 +208,9 @@ async def update_company(company_id: str, payload: CompanyUpdate, request: Reque
         obj.domain = payload.domain
 
     await db.commit()
+    await bump_collections(tenant_id, "companies")
     await db.refresh(obj)
+    response.headers["ETag"] = entity_etag(obj.updated_at, await etag_variant(db, user))
     return obj
 
 
@@ -95,6 +223,14 @@ async def delete_company(company_id: str, request: Request, db: AsyncSession = D
     if not obj:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Company not found")
 
+    # FK ON DELETE SET NULL не трогает updated_at: отвязываем сами, чтобы сменился ETag ссылающихся строк
+    for ref in (Contact, Deal):
+        await db.execute(
+            update(ref)
+            .where(ref.tenant_id == tenant_id, ref.company_id == company_id)
+            .values(company_id=None, updated_at=func.now())
+        )
     await db.delete(obj)
     await db.commit()
+    await bump_collections(tenant_id, "companies", "contacts", "deals")
     return {"ok": True, "company_id": company_id}
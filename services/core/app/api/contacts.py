@@ -1,16 +1,33 @@
 from __future__ import annotations
 
+import uuid
 from datetime import datetime
 from typing import Optional, List
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from pydantic import BaseModel, ConfigDict
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from pydantic import BaseModel, ConfigDict, Field
+from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_db
-from app.models import Contact, Company
+from app.api.batch import (
+    BATCH_MAX_ITEMS,
+    BatchItemResult,
+    BatchResult,
+    column_error,
+    item_error,
+    reject_duplicate_external_ids,
+    summarize,
+    upsert_rows,
+)
+from app.access_profiles import projection_for
+from app.api.fast_json import RowsJSONResponse, out_columns
+from app.api.fieldsets import FIELDS_QUERY, sparse_projection
+from app.api.pagination import keyset, page, response_headers
+from app.db import get_db, get_read_db
+from app.etags import bump_collections, check_if_match, entity_etag, etag_variant, list_etag, not_modified
+from app.models import Company, Contact, Deal
 from app.security import require_bearer_user
+from app.settings import settings
 
 router = APIRouter()
 
@@ -29,11 +46,25 @@ class ContactUpdate(BaseModel):
     company_id: Optional[str] = None
 
 
+class ContactBatchItem(BaseModel):
+    # лимиты длины проверяются per-item (column_error): одна слишком длинная строка не должна валить весь батч
+    external_id: Optional[str] = None
+    name: str
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    company_id: Optional[str] = None
+
+
+class ContactBatchIn(BaseModel):
+    items: List[ContactBatchItem] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+
 class ContactOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
     contact_id: str
     tenant_id: str
+    external_id: Optional[str] = None
     name: str
     email: Optional[str]
     phone: Optional[str]
@@ -65,43 +96,148 @@ async def create_contact(payload: ContactCreate, request: Request, db: AsyncSess
     )
     db.add(obj)
     await db.commit()
+    await bump_collections(tenant_id, "contacts")
     await db.refresh(obj)
     return obj
 
 
-@router.get("/contacts", response_model=List[ContactOut])
-async def list_contacts(request: Request, db: AsyncSession = Depends(get_db), limit: int = 100):
+@router.post("/contacts:batch", response_model=BatchResult)
+async def batch_upsert_contacts(payload: ContactBatchIn, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Create or update up to BATCH_MAX_ITEMS contacts in one transaction.
+    Items with external_id are upserted on (tenant_id, external_id); null email/phone/company_id
+    on update keep the stored value. Invalid items are reported per index, the rest are written.
+    """
     tenant_id, _user = await require_bearer_user(db, request)
-
-    q = (
-        select(Contact)
-        .where(Contact.tenant_id == tenant_id)
-        .order_by(Contact.created_at.desc())
-        .limit(limit)
+    items = payload.items
+    results: dict[int, BatchItemResult] = {}
+
+    # все company_id батча - одним запросом
+    company_ids = {it.company_id for it in items if it.company_id}
+    valid_companies: set[str] = set()
+    if company_ids:
+        q = select(Company.company_id).where(
+            Company.tenant_id == tenant_id, Company.company_id.in_(company_ids)
+        )
+        valid_companies = set((await db.execute(q)).scalars().all())
+
+    for i, it in enumerate(items):
+        if error := column_error(Contact, it):
+            results[i] = item_error(i, it.external_id, error)
+        elif not it.name.strip():
+            results[i] = item_error(i, it.external_id, "name must not be empty")
+        elif it.company_id and it.company_id not in valid_companies:
+            results[i] = item_error(i, it.external_id, "Invalid company_id")
+    reject_duplicate_external_ids([it.external_id for it in items], results)
+
+    rows = [
+        (
+            i,
+            {
+                "contact_id": f"c_{uuid.uuid4().hex}",
+                "tenant_id": tenant_id,
+                "external_id": it.external_id,
+                "name": it.name.strip(),
+                "email": it.email,
+                "phone": it.phone,
+                "company_id": it.company_id,
+            },
+        )
+        for i, it in enumerate(items)
+        if i not in results
+    ]
+    await upsert_rows(
+        db,
+        Contact,
+        "contact_id",
+        rows,
+        replace=("name",),
+        keep_if_null=("email", "phone", "company_id"),
+        results=results,
     )
-    rows = (await db.execute(q)).scalars().all()
-    return list(rows)
+    await db.commit()
+    await bump_collections(tenant_id, "contacts")
+    return summarize(results, len(items))
 
 
-@router.get("/contacts/{contact_id}", response_model=ContactOut)
-async def get_contact(contact_id: str, request: Request, db: AsyncSession = Depends(get_db)):
-    tenant_id, _user = await require_bearer_user(db, request)
+# read-only списки: явные колонки -> Row, без ORM-объектов
+_LIST_COLUMNS = out_columns(Contact.__table__, ContactOut)
+_LIST_FIELDS = tuple(ContactOut.model_fields)
 
-    q = select(Contact).where(Contact.tenant_id == tenant_id, Contact.contact_id == contact_id)
+
+@router.get("/contacts", response_model=List[ContactOut])
+async def list_contacts(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = FIELDS_QUERY,
+):
+    tenant_id, user = await require_bearer_user(db, request)
+    proj = sparse_projection("contact", Contact, ContactOut, "contact_id", fields, await projection_for(db, user, "contact"))
+    variant = await etag_variant(db, user, fields)
+    # If-None-Match: 304 по счётчику коллекции, без запроса в БД
+    etag = await list_etag(request, db, user, "contacts", variant)
+    if unchanged := not_modified(request, etag):
+        return unchanged
+    if etag:
+        response.headers["ETag"] = etag
+
+    q = select(*(proj.columns if proj else _LIST_COLUMNS))
+    q = keyset(q.where(Contact.tenant_id == tenant_id), Contact.created_at, Contact.contact_id, cursor, limit)
+    rows = page((await db.execute(q)).all(), limit, response, "contact_id")
+    if proj:
+        return proj.response(rows, response_headers(response))
+    if settings.fast_json_lists:
+        return RowsJSONResponse(rows, _LIST_FIELDS, response_headers(response))
+    return rows
+
+
+@router.get("/contacts/{contact_id}", response_model=ContactOut)
+async def get_contact(
+    contact_id: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    fields: Optional[str] = FIELDS_QUERY,
+):
+    tenant_id, user = await require_bearer_user(db, request)
+    proj = sparse_projection("contact", Contact, ContactOut, "contact_id", fields, await projection_for(db, user, "contact"))
+    variant = await etag_variant(db, user, fields)
+    if request.headers.get("If-None-Match"):
+        # ревалидация: только updated_at по PK, строку целиком не читаем
+        q = select(Contact.updated_at).where(Contact.tenant_id == tenant_id, Contact.contact_id == contact_id)
+        updated_at = (await db.execute(q)).scalar_one_or_none()
+        if updated_at is not None and (unchanged := not_modified(request, entity_etag(updated_at, variant))):
+            return unchanged
+
+    q = select(*proj.columns) if proj else select(Contact)
+    q = q.where(Contact.tenant_id == tenant_id, Contact.contact_id == contact_id)
+    if proj:
+        row = (await db.execute(q)).first()
+        if not row:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+        return proj.response_one(row, {"ETag": entity_etag(row.updated_at, variant)})
     obj = (await db.execute(q)).scalar_one_or_none()
     if not obj:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+    response.headers["ETag"] = entity_etag(obj.updated_at, variant)
     return obj
 
 
 @router.patch("/contacts/{contact_id}", response_model=ContactOut)
-async def update_contact(contact_id: str, payload: ContactUpdate, request: Request, db: AsyncSession = Depends(get_db)):
-    tenant_id, _user = await require_bearer_user(db, request)
+async def update_contact(
+    contact_id: str, payload: ContactUpdate, request: Request, response: Response, db: AsyncSession = Depends(get_db)
+):
+    tenant_id, user = await require_bearer_user(db, request)
 
-    q = select(Contact).where(Contact.tenant_id == tenant_id, Contact.contact_id == contact_id)
+    # FOR UPDATE: If-Match сверяется с версией, которую до commit никто не поменяет
+    q = select(Contact).where(Contact.tenant_id == tenant_id, Contact.contact_id == contact_id).with_for_update()
     obj = (await db.execute(q)).scalar_one_or_none()
     if not obj:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+    check_if_match(request, obj.updated_at)
 
     if payload.company_id is not None and payload.company_id != "":
         await _validate_company(db, tenant_id, payload.company_id)
@@ -117,7 +253,9 @@ async def update_contact(contact_id: str, payload: ContactUpdate, request: Reque
         obj.phone = payload.phone
 
     await db.commit()
+    await bump_collections(tenant_id, "contacts")
     await db.refresh(obj)
+    response.headers["ETag"] = entity_etag(obj.updated_at, await etag_variant(db, user))
     return obj
 
 
@@ -130,6 +268,13 @@ async def delete_contact(contact_id: str, request: Request, db: AsyncSession = D
     if not obj:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
 
+    # FK ON DELETE SET NULL не трогает updated_at: отвязываем сами, чтобы сменился ETag ссылающихся строк
+    await db.execute(
+        update(Deal)
+        .where(Deal.tenant_id == tenant_id, Deal.contact_id == contact_id)
+        .values(contact_id=None, updated_at=func.now())
+    )
     await db.delete(obj)
     await db.commit()
+    await bump_collections(tenant_id, "contacts", "deals")
     return {"ok": True, "contact_id": contact_id}
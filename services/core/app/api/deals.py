@@ -2,14 +2,25 @@ from __future__ import annotations
 
 from datetime import datetime, timezone
 from decimal import Decimal
+from typing import Literal
 from uuid import uuid4
 
-from app.db import get_db
-from app.models import Company, Contact, Deal, Pipeline, Stage
+from app.access_profiles import projection_for
+from app.api.fast_json import RowsJSONResponse, out_columns
+from app.api.fieldsets import FIELDS_QUERY, sparse_projection
+from app.api.pagination import keyset, page, response_headers
+from app.db import get_db, get_read_db
+from app.etags import bump_collections, check_if_match, entity_etag, etag_variant, list_etag, not_modified
+from app.models import Company, Contact, Deal
+from app.pipeline_cache import pipeline_cache
 from app.security import require_bearer_user
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
-from pydantic import BaseModel, ConfigDict
-from sqlalchemy import select
+from app.settings import settings
+from app.stage_stats import StageStatDeltas, apply_deltas
+from app.stage_transitions import Transition, record_transitions
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from pydantic import BaseModel, ConfigDict, Field
+from sqlalchemy import String, any_, bindparam, exists, insert, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter(tags=["deals"])
@@ -66,58 +77,64 @@ class DealOut(BaseModel):
     updated_at: datetime
 
 
-# -------------------------
-# Helpers
-# -------------------------
-async def _require_pipeline(db: AsyncSession, tenant_id: str, pipeline_id: str) -> None:
-    q = select(Pipeline).where(
-        Pipeline.tenant_id == tenant_id, Pipeline.pipeline_id == pipeline_id
-    )
-    if (await db.execute(q)).scalar_one_or_none() is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Pipeline not found"
-        )
+MOVE_STAGE_MAX_DEALS = 5000
 
 
-async def _require_stage_in_pipeline(
-    db: AsyncSession, tenant_id: str, pipeline_id: str, stage_id: str
-) -> None:
-    q = select(Stage).where(
-        Stage.tenant_id == tenant_id,
-        Stage.pipeline_id == pipeline_id,
-        Stage.stage_id == stage_id,
-    )
-    if (await db.execute(q)).scalar_one_or_none() is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Stage not found (or not in pipeline)",
-        )
+class DealsMoveStage(BaseModel):
+    deal_ids: list[str] = Field(..., min_length=1, max_length=MOVE_STAGE_MAX_DEALS)
+    stage_id: str
+
+
+class MoveStageItem(BaseModel):
+    deal_id: str
+    status: Literal["moved", "unchanged", "error"]
+    error: str | None = None
+
+
+class MoveStageOut(BaseModel):
+    stage_id: str
+    pipeline_id: str
+    moved: int
+    unchanged: int
+    failed: int
+    items: list[MoveStageItem]
 
 
+# -------------------------
+# Helpers
+# -------------------------
 async def _optional_fk_checks(
     db: AsyncSession, tenant_id: str, company_id: str | None, contact_id: str | None
 ) -> None:
+    """
+    Company/contact tenancy in ONE round trip (EXISTS per reference); no query if neither is set.
+    Pipeline/stage are validated against pipeline_cache.
+    """
+    checks = []
     if company_id:
-        q = select(Company).where(
-            Company.tenant_id == tenant_id, Company.company_id == company_id
-        )
-        if (await db.execute(q)).scalar_one_or_none() is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Company not found"
-            )
-
+        checks.append((
+            "Company not found",
+            exists().where(Company.tenant_id == tenant_id, Company.company_id == company_id),
+        ))
     if contact_id:
-        q = select(Contact).where(
-            Contact.tenant_id == tenant_id, Contact.contact_id == contact_id
-        )
-        if (await db.execute(q)).scalar_one_or_none() is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found"
-            )
+        checks.append((
+            "Contact not found",
+            exists().where(Contact.tenant_id == tenant_id, Contact.contact_id == contact_id),
+        ))
+    if not checks:
+        return
 
+    row = (await db.execute(select(*(e.label(f"c{i}") for i, (_, e) in enumerate(checks))))).one()
+    for (detail, _), ok in zip(checks, row):
+        if not ok:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=detail)
 
-async def _get_deal(db: AsyncSession, tenant_id: str, deal_id: str) -> Deal:
+
+async def _get_deal(db: AsyncSession, tenant_id: str, deal_id: str, *, for_update: bool = False) -> Deal:
     q = select(Deal).where(Deal.tenant_id == tenant_id, Deal.deal_id == deal_id)
+    if for_update:
+        # write-пути: дельты stage_stats считаются от старых значений, параллельный PATCH не должен их видеть
+        q = q.with_for_update()
     deal = (await db.execute(q)).scalar_one_or_none()
     if not deal:
         raise HTTPException(
@@ -153,62 +170,205 @@ async def create_deal(
 
     currency = _norm_currency(payload.currency) or "USD"
 
-    # валидируем pipeline + stage
-    await _require_pipeline(db, tenant_id, payload.pipeline_id)
-    await _require_stage_in_pipeline(
-        db, tenant_id, payload.pipeline_id, payload.stage_id
-    )
-
-    # валидируем company/contact если переданы
+    # pipeline + stage: из кэша определений (0 запросов); company/contact: один запрос
+    await pipeline_cache.require_pipeline(db, tenant_id, payload.pipeline_id)
+    await pipeline_cache.require_stage_in_pipeline(db, tenant_id, payload.pipeline_id, payload.stage_id)
     await _optional_fk_checks(db, tenant_id, payload.company_id, payload.contact_id)
 
-    deal = Deal(
-        deal_id=f"d_{uuid4().hex}",
-        tenant_id=tenant_id,
-        title=title,
-        amount=payload.amount,
-        currency=currency,
-        company_id=payload.company_id,
-        contact_id=payload.contact_id,
-        pipeline_id=payload.pipeline_id,
-        stage_id=payload.stage_id,
-        created_at=now_utc(),
-        updated_at=now_utc(),
+    # INSERT ... RETURNING вместо commit + refresh
+    now = now_utc()
+    q = (
+        insert(Deal)
+        .values(
+            deal_id=f"d_{uuid4().hex}",
+            tenant_id=tenant_id,
+            title=title,
+            amount=payload.amount,
+            currency=currency,
+            company_id=payload.company_id,
+            contact_id=payload.contact_id,
+            pipeline_id=payload.pipeline_id,
+            stage_id=payload.stage_id,
+            created_at=now,
+            updated_at=now,
+        )
+        .returning(*Deal.__table__.c)
+    )
+    row = (await db.execute(q)).one()
+
+    deltas = StageStatDeltas()
+    deltas.add(row.pipeline_id, row.stage_id, row.currency, row.amount)
+    await apply_deltas(db, tenant_id, deltas)
+    await record_transitions(
+        db, tenant_id, [Transition(row.deal_id, row.pipeline_id, None, row.stage_id, row.created_at)]
     )
 
-    db.add(deal)
     await db.commit()
-    await db.refresh(deal)
-    return deal
+    await bump_collections(tenant_id, "deals")
+    return row._asdict()
+
+
+@router.post("/deals:move-stage", response_model=MoveStageOut)
+async def move_deals_stage(
+    payload: DealsMoveStage, request: Request, db: AsyncSession = Depends(get_db)
+):
+    """
+    Move many deals to one stage in a single round trip.
+    Deals outside the stage's pipeline, unknown ids and deals already in the stage are
+    reported per id; the rest are moved.
+    """
+    tenant_id, _user = await require_bearer_user(db, request)
+    stage = await pipeline_cache.require_stage(db, tenant_id, payload.stage_id)
+    deal_ids = list(dict.fromkeys(payload.deal_ids))
+
+    # target: все запрошенные сделки тенанта (под FOR UPDATE), moved: UPDATE только тех,
+    # что в pipeline стадии и ещё не в ней; итоговый SELECT классифицирует каждый id.
+    # ORDER BY deal_id: LockRows стоит над Sort, строки блокируются в едином порядке -
+    # два пересекающихся batch-переноса не берут блокировки крест-накрест (deadlock)
+    target = (
+        select(Deal.deal_id, Deal.pipeline_id, Deal.stage_id, Deal.currency, Deal.amount, Deal.created_at)
+        .where(
+            Deal.tenant_id == tenant_id,
+            Deal.deal_id == any_(bindparam("deal_ids", deal_ids, type_=ARRAY(String))),
+        )
+        .order_by(Deal.deal_id)
+        .with_for_update()
+        .cte("target")
+    )
+    moved = (
+        update(Deal)
+        .where(
+            Deal.deal_id == target.c.deal_id,
+            target.c.pipeline_id == stage.pipeline_id,
+            target.c.stage_id != stage.stage_id,
+        )
+        .values(stage_id=stage.stage_id, updated_at=now_utc())
+        .returning(Deal.deal_id)
+        .cte("moved")
+    )
+    q = select(
+        target.c.deal_id,
+        target.c.pipeline_id,
+        target.c.stage_id,
+        target.c.currency,
+        target.c.amount,
+        target.c.created_at,
+        moved.c.deal_id.is_not(None).label("moved"),
+    ).select_from(target.outerjoin(moved, moved.c.deal_id == target.c.deal_id))
+    found = {row.deal_id: row for row in (await db.execute(q)).all()}
+
+    deltas = StageStatDeltas()
+    transitions: list[Transition] = []
+    for row in found.values():
+        if row.moved:
+            deltas.move(
+                (row.pipeline_id, row.stage_id, row.currency, row.amount),
+                (row.pipeline_id, stage.stage_id, row.currency, row.amount),
+            )
+            transitions.append(Transition(row.deal_id, row.pipeline_id, row.stage_id, stage.stage_id, row.created_at))
+    await apply_deltas(db, tenant_id, deltas)
+    await record_transitions(db, tenant_id, transitions)
+    await db.commit()
+    if transitions:
+        await bump_collections(tenant_id, "deals")
+
+    items: list[MoveStageItem] = []
+    for deal_id in deal_ids:
+        row = found.get(deal_id)
+        if row is None:
+            items.append(MoveStageItem(deal_id=deal_id, status="error", error="Deal not found"))
+        elif row.moved:
+            items.append(MoveStageItem(deal_id=deal_id, status="moved"))
+        elif row.pipeline_id != stage.pipeline_id:
+            items.append(MoveStageItem(deal_id=deal_id, status="error", error="Stage not in deal pipeline"))
+        else:
+            items.append(MoveStageItem(deal_id=deal_id, status="unchanged"))
+
+    return MoveStageOut(
+        stage_id=stage.stage_id,
+        pipeline_id=stage.pipeline_id,
+        moved=sum(1 for it in items if it.status == "moved"),
+        unchanged=sum(1 for it in items if it.status == "unchanged"),
+        failed=sum(1 for it in items if it.status == "error"),
+        items=items,
+    )
+
+
+# read-only списки: явные колонки -> Row (C-tuple), без ORM-объектов, identity map и instrumentation
+_LIST_COLUMNS = out_columns(Deal.__table__, DealOut)
+_LIST_FIELDS = tuple(DealOut.model_fields)
 
 
 @router.get("/deals", response_model=list[DealOut])
 async def list_deals(
     request: Request,
-    db: AsyncSession = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
     pipeline_id: str | None = Query(default=None),
     stage_id: str | None = Query(default=None),
     limit: int = Query(default=200, ge=1, le=500),
-    offset: int = Query(default=0, ge=0),
+    cursor: str | None = Query(default=None),
+    # старые клиенты; глубокий offset дорогой - используйте cursor (X-Next-Cursor)
+    offset: int = Query(default=0, ge=0, deprecated=True),
+    fields: str | None = FIELDS_QUERY,
 ):
-    tenant_id, _user = await require_bearer_user(db, request)
+    tenant_id, user = await require_bearer_user(db, request)
+    if cursor and offset:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="cursor and offset cannot be combined"
+        )
+    proj = sparse_projection("deal", Deal, DealOut, "deal_id", fields, await projection_for(db, user, "deal"))
+    variant = await etag_variant(db, user, fields)
+    # If-None-Match: 304 по счётчику коллекции, без запроса в БД
+    etag = await list_etag(request, db, user, "deals", variant)
+    if unchanged := not_modified(request, etag):
+        return unchanged
+    if etag:
+        response.headers["ETag"] = etag
 
-    q = select(Deal).where(Deal.tenant_id == tenant_id)
+    q = select(*(proj.columns if proj else _LIST_COLUMNS)).where(Deal.tenant_id == tenant_id)
 
     if pipeline_id:
         q = q.where(Deal.pipeline_id == pipeline_id)
     if stage_id:
         q = q.where(Deal.stage_id == stage_id)
 
-    q = q.order_by(Deal.created_at.desc()).limit(limit).offset(offset)
-    rows = (await db.execute(q)).scalars().all()
-    return list(rows)
+    q = keyset(q, Deal.created_at, Deal.deal_id, cursor, limit).offset(offset)
+    rows = page((await db.execute(q)).all(), limit, response, "deal_id")
+    if proj:
+        # профиль доступа: только разрешённые колонки, сериализатор профиля
+        return proj.response(rows, response_headers(response))
+    if settings.fast_json_lists:
+        return RowsJSONResponse(rows, _LIST_FIELDS, response_headers(response))
+    return rows
 
 
 @router.get("/deals/{deal_id}", response_model=DealOut)
-async def get_deal(deal_id: str, request: Request, db: AsyncSession = Depends(get_db)):
-    tenant_id, _user = await require_bearer_user(db, request)
-    return await _get_deal(db, tenant_id, deal_id)
+async def get_deal(
+    deal_id: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    fields: str | None = FIELDS_QUERY,
+):
+    tenant_id, user = await require_bearer_user(db, request)
+    proj = sparse_projection("deal", Deal, DealOut, "deal_id", fields, await projection_for(db, user, "deal"))
+    variant = await etag_variant(db, user, fields)
+    if request.headers.get("If-None-Match"):
+        # ревалидация: только updated_at по PK, строку целиком не читаем
+        q = select(Deal.updated_at).where(Deal.tenant_id == tenant_id, Deal.deal_id == deal_id)
+        updated_at = (await db.execute(q)).scalar_one_or_none()
+        if updated_at is not None and (unchanged := not_modified(request, entity_etag(updated_at, variant))):
+            return unchanged
+    if proj:
+        q = select(*proj.columns).where(Deal.tenant_id == tenant_id, Deal.deal_id == deal_id)
+        row = (await db.execute(q)).first()
+        if not row:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Deal not found")
+        return proj.response_one(row, {"ETag": entity_etag(row.updated_at, variant)})
+    deal = await _get_deal(db, tenant_id, deal_id)
+    response.headers["ETag"] = entity_etag(deal.updated_at, variant)
+    return deal
 
 
 @router.patch("/deals/{deal_id}", response_model=DealOut)
@@ -216,10 +376,14 @@ async def patch_deal(
     deal_id: str,
     payload: DealPatch,
     request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
 ):
-    tenant_id, _user = await require_bearer_user(db, request)
-    deal = await _get_deal(db, tenant_id, deal_id)
+    tenant_id, user = await require_bearer_user(db, request)
+    deal = await _get_deal(db, tenant_id, deal_id, for_update=True)
+    # If-Match: сверка под FOR UPDATE - между проверкой и записью версию никто не поменяет
+    check_if_match(request, deal.updated_at)
+    before = (deal.pipeline_id, deal.stage_id, deal.currency, deal.amount)
 
     data = payload.model_dump(exclude_unset=True)
 
@@ -234,10 +398,15 @@ async def patch_deal(
     # stage_id: разрешаем менять только в рамках pipeline сделки
     if "stage_id" in data:
         new_stage_id = data["stage_id"]
-        if new_stage_id is not None:
-            await _require_stage_in_pipeline(
-                db, tenant_id, deal.pipeline_id, new_stage_id
+        # stage_id NOT NULL: явный null - ошибка клиента, а не 500 на commit
+        if new_stage_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="stage_id must not be null",
             )
+        await pipeline_cache.require_stage_in_pipeline(
+            db, tenant_id, deal.pipeline_id, new_stage_id
+        )
         deal.stage_id = new_stage_id
 
     if "title" in data:
@@ -268,8 +437,18 @@ async def patch_deal(
 
     deal.updated_at = now_utc()
 
+    deltas = StageStatDeltas()
+    deltas.move(before, (deal.pipeline_id, deal.stage_id, deal.currency, deal.amount))
+    await apply_deltas(db, tenant_id, deltas)
+    if deal.stage_id != before[1]:
+        await record_transitions(
+            db, tenant_id, [Transition(deal.deal_id, deal.pipeline_id, before[1], deal.stage_id, deal.created_at)]
+        )
+
     await db.commit()
+    await bump_collections(tenant_id, "deals")
     await db.refresh(deal)
+    response.headers["ETag"] = entity_etag(deal.updated_at, await etag_variant(db, user))
     return deal
 
 
@@ -278,8 +457,12 @@ async def delete_deal(
     deal_id: str, request: Request, db: AsyncSession = Depends(get_db)
 ):
     tenant_id, _user = await require_bearer_user(db, request)
-    deal = await _get_deal(db, tenant_id, deal_id)
+    deal = await _get_deal(db, tenant_id, deal_id, for_update=True)
 
+    deltas = StageStatDeltas()
+    deltas.add(deal.pipeline_id, deal.stage_id, deal.currency, deal.amount, sign=-1)
     await db.delete(deal)
+    await apply_deltas(db, tenant_id, deltas)
     await db.commit()
+    await bump_collections(tenant_id, "deals")
     return None
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import String, any_, bindparam, delete, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import get_db, get_read_db
+from app.etags import bump_collections
+from app.models import Company, Contact, Deal, DuplicateCandidate
+from app.security import require_bearer_user
+
+router = APIRouter(tags=["duplicates"])
+
+# Кандидаты в дубли находит runner (dedup_scan); здесь - просмотр и слияние.
+# Слияние - несколько bulk UPDATE/DELETE по ANY(:ids) в одной транзакции, без загрузки ORM-объектов.
+
+
+class DuplicateCandidateOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    candidate_id: int
+    entity: str
+    key_type: str
+    block_key: str
+    record_ids: List[str]
+    size: int
+    status: str
+    detected_at: datetime
+    resolved_at: Optional[datetime]
+
+
+class DuplicateMerge(BaseModel):
+    survivor_id: str
+    # подмножество кластера; по умолчанию - все остальные записи кластера
+    merge_ids: Optional[List[str]] = None
+
+
+class DuplicateMergeOut(BaseModel):
+    candidate_id: int
+    survivor_id: str
+    merged_ids: List[str]
+    deals_repointed: int
+    contacts_repointed: int
+
+
+def _ids(name: str, values: list[str]):
+    return any_(bindparam(name, values, type_=ARRAY(String)))
+
+
+async def _get_open_candidate(db: AsyncSession, tenant_id: str, candidate_id: int) -> DuplicateCandidate:
+    q = (
+        select(DuplicateCandidate)
+        .where(DuplicateCandidate.tenant_id == tenant_id, DuplicateCandidate.candidate_id == candidate_id)
+        .with_for_update()
+    )
+    cand = (await db.execute(q)).scalar_one_or_none()
+    if not cand:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Duplicate candidate not found")
+    if cand.status != "open":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Duplicate candidate is {cand.status}")
+    return cand
+
+
+@router.get("/duplicates", response_model=List[DuplicateCandidateOut])
+async def list_duplicates(
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    entity: Optional[Literal["contact", "company"]] = None,
+    status_: Literal["open", "merged", "dismissed", "gone"] = Query("open", alias="status"),
+    limit: int = Query(100, ge=1, le=500),
+    after_id: Optional[int] = Query(None, description="keyset: candidate_id of the last row of the previous page"),
+):
+    tenant_id, _user = await require_bearer_user(db, request)
+
+    q = select(DuplicateCandidate).where(
+        DuplicateCandidate.tenant_id == tenant_id, DuplicateCandidate.status == status_
+    )
+    if entity:
+        q = q.where(DuplicateCandidate.entity == entity)
+    if after_id is not None:
+        q = q.where(DuplicateCandidate.candidate_id > after_id)
+    q = q.order_by(DuplicateCandidate.candidate_id).limit(limit)
+    rows = (await db.execute(q)).scalars().all()
+    return list(rows)
+
+
+@router.post("/duplicates/{candidate_id}/merge", response_model=DuplicateMergeOut)
+async def merge_duplicates(
+    candidate_id: int, payload: DuplicateMerge, request: Request, db: AsyncSession = Depends(get_db)
+):
+    """
+    Merge cluster members into survivor_id: deals (and, for companies, contacts) are repointed
+    to the survivor in bulk, merged records are deleted, the candidate becomes `merged`.
+    """
+    tenant_id, _user = await require_bearer_user(db, request)
+    cand = await _get_open_candidate(db, tenant_id, candidate_id)
+
+    members = set(cand.record_ids)
+    if payload.survivor_id not in members:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="survivor_id is not in the cluster")
+    losers = [i for i in (payload.merge_ids or cand.record_ids) if i != payload.survivor_id]
+    if not losers or not set(losers) <= members:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="merge_ids must be other members of the cluster")
+    losers = list(dict.fromkeys(losers))
+
+    model, id_col = (Contact, Contact.contact_id) if cand.entity == "contact" else (Company, Company.company_id)
+    # survivor должен существовать в тенанте (кластер мог устареть с прошлого скана)
+    exists_q = select(id_col).where(model.tenant_id == tenant_id, id_col == payload.survivor_id)
+    if (await db.execute(exists_q)).first() is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="survivor no longer exists")
+
+    now = datetime.now(timezone.utc)
+    contacts_repointed = 0
+    if cand.entity == "contact":
+        deals_q = (
+            update(Deal)
+            .where(Deal.tenant_id == tenant_id, Deal.contact_id == _ids("losers", losers))
+            .values(contact_id=payload.survivor_id, updated_at=now)
+        )
+    else:
+        deals_q = (
+            update(Deal)
+            .where(Deal.tenant_id == tenant_id, Deal.company_id == _ids("losers", losers))
+            .values(company_id=payload.survivor_id, updated_at=now)
+        )
+        contacts_q = (
+            update(Contact)
+            .where(Contact.tenant_id == tenant_id, Contact.company_id == _ids("losers", losers))
+            .values(company_id=payload.survivor_id, updated_at=now)
+        )
+        contacts_repointed = (await db.execute(contacts_q)).rowcount
+
+    deals_repointed = (await db.execute(deals_q)).rowcount
+    deleted = (
+        await db.execute(
+            delete(model).where(model.tenant_id == tenant_id, id_col == _ids("losers", losers)).returning(id_col)
+        )
+    ).scalars().all()
+
+    cand.status = "merged"
+    cand.resolved_at = now
+    await db.commit()
+    if cand.entity == "contact":
+        await bump_collections(tenant_id, "contacts", "deals")
+    else:
+        await bump_collections(tenant_id, "companies", "contacts", "deals")
+
+    return DuplicateMergeOut(
+        candidate_id=candidate_id,
+        survivor_id=payload.survivor_id,
+        merged_ids=sorted(deleted),
+        deals_repointed=deals_repointed,
+        contacts_repointed=contacts_repointed,
+    )
+
+
+@router.post("/duplicates/{candidate_id}/dismiss", response_model=DuplicateCandidateOut)
+async def dismiss_duplicates(candidate_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """Not duplicates: stays dismissed until the cluster membership changes."""
+    tenant_id, _user = await require_bearer_user(db, request)
+    cand = await _get_open_candidate(db, tenant_id, candidate_id)
+    cand.status = "dismissed"
+    cand.resolved_at = datetime.now(timezone.utc)
+    await db.commit()
+    await db.refresh(cand)
+    return cand
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from collections.abc import AsyncIterator
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Literal
+
+import anyio
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.access_profiles import projection_for
+from app.db import get_read_db, read_session_factory
+from app.models import Company, Contact, Deal
+from app.security import AuthUser, require_bearer_user
+
+router = APIRouter(tags=["exports"])
+
+# Полная выгрузка тенанта потоком (NDJSON / CSV) через server-side cursor.
+# Память на запрос постоянная: в руках одна пачка EXPORT_CHUNK_ROWS строк.
+# Backpressure бесплатный: следующую пачку из курсора читаем только после того,
+# как предыдущая ушла в сокет (send медленного клиента блокирует генератор).
+
+EXPORT_CHUNK_ROWS = 1000
+
+ExportFormat = Literal["ndjson", "csv"]
+
+_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"not JSON serializable: {type(value).__name__}")
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _encode_chunk(fmt: ExportFormat, columns: list[str], rows: list[Any]) -> str:
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps(dict(zip(columns, row)), default=_json_default, separators=(",", ":")) + "\n"
+            for row in rows
+        )
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerows([_csv_value(v) for v in row] for row in rows)
+    return buf.getvalue()
+
+
+async def _stream_rows(request: Request, q: Select, fmt: ExportFormat) -> AsyncIterator[str]:
+    columns = [c.name for c in q.selected_columns]
+    if fmt == "csv":
+        buf = io.StringIO()
+        csv.writer(buf).writerow(columns)
+        yield buf.getvalue()
+
+    # своя сессия: dependency-сессия закрывается до того, как StreamingResponse начнёт отдавать тело
+    async with read_session_factory(request)() as session:
+        result = await session.stream(q.execution_options(yield_per=EXPORT_CHUNK_ROWS))
+        try:
+            async for rows in result.partitions(EXPORT_CHUNK_ROWS):
+                if await request.is_disconnected():
+                    break
+                yield _encode_chunk(fmt, columns, rows)
+        finally:
+            # клиент ушёл (break / отмена стрима Starlette) - закрываем cursor, не дочитывая
+            with anyio.CancelScope(shield=True):
+                await result.close()
+
+
+async def _export_columns(db: AsyncSession, user: AuthUser, entity: str, model: Any) -> list[Any]:
+    # профиль доступа режет колонки прямо в SELECT: CSV-заголовок/NDJSON-ключи - только разрешённые
+    proj = await projection_for(db, user, entity)
+    return list(proj.columns[: len(proj.fields)]) if proj else list(model.__table__.c)
+
+
+def _export_response(request: Request, q: Select, fmt: ExportFormat, name: str) -> StreamingResponse:
+    return StreamingResponse(
+        _stream_rows(request, q, fmt),
+        media_type=_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+
+@router.get("/deals:export")
+async def export_deals(
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    format: ExportFormat = Query(default="ndjson"),
+    pipeline_id: str | None = Query(default=None),
+    stage_id: str | None = Query(default=None),
+):
+    tenant_id, user = await require_bearer_user(db, request)
+    columns = await _export_columns(db, user, "deal", Deal)
+
+    q = select(*columns).where(Deal.tenant_id == tenant_id)
+    if pipeline_id:
+        q = q.where(Deal.pipeline_id == pipeline_id)
+    if stage_id:
+        q = q.where(Deal.stage_id == stage_id)
+    q = q.order_by(Deal.created_at, Deal.deal_id)
+    return _export_response(request, q, format, "deals")
+
+
+@router.get("/contacts:export")
+async def export_contacts(
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    format: ExportFormat = Query(default="ndjson"),
+):
+    tenant_id, user = await require_bearer_user(db, request)
+    columns = await _export_columns(db, user, "contact", Contact)
+
+    q = (
+        select(*columns)
+        .where(Contact.tenant_id == tenant_id)
+        .order_by(Contact.created_at, Contact.contact_id)
+    )
+    return _export_response(request, q, format, "contacts")
+
+
+@router.get("/companies:export")
+async def export_companies(
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    format: ExportFormat = Query(default="ndjson"),
+):
+    tenant_id, user = await require_bearer_user(db, request)
+    columns = await _export_columns(db, user, "company", Company)
+
+    q = (
+        select(*columns)
+        .where(Company.tenant_id == tenant_id)
+        .order_by(Company.created_at, Company.company_id)
+    )
+    return _export_response(request, q, format, "companies")
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Any, Iterable, Sequence
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+from sqlalchemy import Table
+
+# Быстрый путь для списков (FAST_JSON_LISTS=1): строки SELECT'а -> orjson, без DealOut.model_validate
+# на строку и без повторной валидации response_model. Маршруты сохраняют response_model,
+# поэтому OpenAPI не меняется; формат тела совпадает с pydantic:
+#   Decimal  -> строка как str(Decimal) ("7.00")
+#   datetime -> ISO 8601, UTC с суффиксом "Z" (OPT_UTC_Z), микросекунды как есть
+# datetime/str/None orjson кодирует сам в C; Python-колбэк вызывается только для Decimal.
+
+_OPTIONS = orjson.OPT_UTC_Z
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"not JSON serializable: {type(value).__name__}")
+
+
+def out_columns(table: Table, out: type[BaseModel]) -> tuple[Any, ...]:
+    """SELECT list for a fast-path list: exactly the fields of the response model, in its order."""
+    return tuple(table.c[name] for name in out.model_fields)
+
+
+class RowsJSONResponse(Response):
+    media_type = "application/json"
+
+    def __init__(self, rows: Iterable[Sequence[Any]], fields: Sequence[str], headers: dict[str, str] | None = None):
+        body = orjson.dumps([dict(zip(fields, row)) for row in rows], default=_default, option=_OPTIONS)
+        super().__init__(content=body, headers=headers)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any
+
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel
+
+from app.access_profiles import Projection, compile_projection
+
+# Sparse fieldsets: ?fields=deal_id,title,amount сужает и SELECT, и тело ответа.
+# Проекция (колонки + сериализатор) компилируется один раз на форму
+# (сущность, набор полей, поля профиля доступа) и живёт в LRU; порядок полей в запросе неважен.
+# С профилем доступа - пересечение: запрошенное, но скрытое профилем молча не отдаётся.
+
+FIELDSET_CACHE_SIZE = 256
+FIELDSET_MAX_FIELDS = 50
+
+FIELDS_QUERY = Query(
+    None,
+    max_length=1000,
+    description="Comma-separated response fields (sparse fieldset), e.g. `deal_id,title,amount`. "
+    "The id field is always returned.",
+)
+
+_Key = tuple[str, frozenset[str], tuple[str, ...] | None]
+
+
+class FieldsetCache:
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[_Key, Projection] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: _Key, build: Any) -> Projection:
+        proj = self._entries.get(key)
+        if proj is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return proj
+        self.misses += 1
+        proj = build()
+        self._entries[key] = proj
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return proj
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+fieldset_cache = FieldsetCache(FIELDSET_CACHE_SIZE)
+
+
+def sparse_projection(
+    entity: str,
+    model: Any,
+    out: type[BaseModel],
+    id_field: str,
+    fields: str | None,
+    allowed: Projection | None = None,
+) -> Projection | None:
+    """
+    Projection for `?fields=`, intersected with the access-profile projection `allowed`.
+    None (no `fields`, no profile) = regular response_model path.
+    """
+    if not fields:
+        return allowed
+
+    requested = frozenset(f.strip() for f in fields.split(",") if f.strip())
+    if len(requested) > FIELDSET_MAX_FIELDS:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Too many fields")
+    # валидация по схеме ответа: поля, которых нет в *Out, не существуют для клиента
+    unknown = requested - out.model_fields.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown fields for {entity}: {', '.join(sorted(unknown))}",
+        )
+
+    profile_fields = allowed.fields if allowed else None
+    key: _Key = (entity, requested, profile_fields)
+
+    def build() -> Projection:
+        keep = requested | {id_field}
+        if profile_fields is not None:
+            keep &= set(profile_fields)
+        ordered = [f for f in out.model_fields if f in keep]
+        return compile_projection(entity, f"{entity}_fieldset", model.__table__, ordered)
+
+    return fieldset_cache.get(key, build)
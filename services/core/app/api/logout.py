@@ -8,7 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_db
 from app.models import Session
-from app.security import require_bearer_user
+from app.security import bearer_token, invalidate_session, is_jwt, require_bearer_user, revoke_jwt
 
 router = APIRouter()
 
@@ -20,11 +20,18 @@ async def logout(request: Request, db: AsyncSession = Depends(get_db)):
     # валидируем токен и получаем user
     tenant_id, user = await require_bearer_user(db, request)
 
-    token = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    token = bearer_token(request)
+    if is_jwt(token):
+        await revoke_jwt(token)
+        return {"ok": True, "tenant_id": tenant_id, "user_id": user.user_id}
+
     q = select(Session).where(Session.token == token)
     sess = (await db.execute(q)).scalar_one()
 
     sess.revoked_at = now_utc()
     await db.commit()
 
+    # сбрасываем кэш сессии во всех воркерах
+    await invalidate_session(token)
+
     return {"ok": True, "tenant_id": tenant_id, "user_id": user.user_id}
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from uuid import uuid4
+
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.access_profiles import access_profile_cache
+from app.api.fieldsets import fieldset_cache
+from app.db import engine, get_db, pool_status, primary_pool_stats, replica_engine, replica_pool_stats
+from app.pipeline_cache import pipeline_cache
+from app.query_dsl import query_plan_cache
+from app.security import bcrypt_calibration, password_pool, require_admin, require_bearer_user
+from app.session_cache import session_cache
+from app.settings import settings
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics/auth")
+async def auth_metrics(request: Request, db: AsyncSession = Depends(get_db)):
+    _tenant_id, user = await require_bearer_user(db, request)
+    require_admin(user)
+
+    return {
+        "session_cache": session_cache.stats(),
+        "password_pool": password_pool.stats(),
+        "bcrypt": bcrypt_calibration,
+        "trace_id": uuid4().hex,
+    }
+
+
+@router.get("/metrics/db")
+async def db_metrics(request: Request, db: AsyncSession = Depends(get_db)):
+    _tenant_id, user = await require_bearer_user(db, request)
+    require_admin(user)
+
+    return {
+        "primary": pool_status(engine, primary_pool_stats),
+        "replica": pool_status(replica_engine, replica_pool_stats) if replica_engine is not None else None,
+        # на один uvicorn worker; max_connections Postgres >= workers * это число
+        "max_connections_per_worker": settings.db_pool_size + settings.db_max_overflow,
+        "trace_id": uuid4().hex,
+    }
+
+
+@router.get("/metrics/caches")
+async def cache_metrics(request: Request, db: AsyncSession = Depends(get_db)):
+    _tenant_id, user = await require_bearer_user(db, request)
+    require_admin(user)
+
+    return {
+        "pipeline_defs": pipeline_cache.stats(),
+        "query_plans": query_plan_cache.stats(),
+        "access_profiles": access_profile_cache.stats(),
+        "fieldsets": fieldset_cache.stats(),
+        "trace_id": uuid4().hex,
+    }
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Sequence
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import Select, tuple_
+
+# Keyset pagination по (created_at, id).
+# Курсор непрозрачный для клиента: base64url(JSON [created_at ISO, id]).
+# Следующая страница - "строго меньше последней строки", поэтому страница N стоит как страница 1
+# (индекс (tenant_id, created_at[, id]) читается с позиции курсора, без OFFSET).
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        ts = datetime.fromisoformat(created_at)
+        if ts.tzinfo is None or not isinstance(row_id, str):
+            raise ValueError
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return ts, row_id
+
+
+def keyset(q: Select, created_col: Any, id_col: Any, cursor: str | None, limit: int) -> Select:
+    """Newest first; fetches limit + 1 rows so page() can tell whether there is a next page."""
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        q = q.where(tuple_(created_col, id_col) < tuple_(created_at, row_id))
+    return q.order_by(created_col.desc(), id_col.desc()).limit(limit + 1)
+
+
+def page(rows: Sequence[Any], limit: int, response: Response, id_attr: str) -> list[Any]:
+    """Trim the lookahead row and expose the cursor of the last returned row in X-Next-Cursor."""
+    items = list(rows[:limit])
+    if len(rows) > limit:
+        last = items[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, getattr(last, id_attr))
+    return items
+
+
+# выставленные на инжектированном Response заголовки, которые нужно перенести в собственный Response
+_PASSTHROUGH_HEADERS = (NEXT_CURSOR_HEADER, "ETag")
+
+
+def response_headers(response: Response) -> dict[str, str]:
+    """X-Next-Cursor (page()) and ETag set on the injected Response, for handlers that return their own Response."""
+    return {h: response.headers[h] for h in _PASSTHROUGH_HEADERS if h in response.headers}
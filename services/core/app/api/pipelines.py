@@ -1,14 +1,22 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
 from uuid import uuid4
 
-from app.db import get_db
-from app.models import Pipeline
+from app.access_profiles import projection_for
+from app.api.deals import DealOut
+from app.api.fieldsets import FIELDS_QUERY, sparse_projection
+from app.api.pagination import encode_cursor, keyset, page, response_headers
+from app.db import get_db, get_read_db
+from app.models import Deal, FunnelDaily, Pipeline, StageStat
+from app.pipeline_cache import bump_generation, pipeline_cache
 from app.security import require_bearer_user
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import select
+from sqlalchemy import Integer, String, bindparam, column, func, select, true
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter(tags=["pipelines"])
@@ -29,6 +37,69 @@ class PipelineOut(BaseModel):
     updated_at: datetime
 
 
+class BoardCurrencyTotal(BaseModel):
+    currency: str
+    count: int
+    amount: Decimal
+
+
+class BoardStage(BaseModel):
+    stage_id: str
+    name: str
+    sort_order: int
+    is_won: bool
+    is_lost: bool
+
+    count: int
+    totals: list[BoardCurrencyTotal]
+    deals: list[DealOut]
+    # следующая страница стадии: GET /deals?stage_id=...&cursor=...
+    next_cursor: str | None = None
+
+
+class BoardOut(BaseModel):
+    pipeline_id: str
+    stages: list[BoardStage]
+
+
+class FunnelStage(BaseModel):
+    stage_id: str
+    name: str
+    sort_order: int
+    is_won: bool
+    is_lost: bool
+
+    entered: int
+    exited: int
+    # exit-weighted median of the daily medians (exact for a single day)
+    median_seconds_in_stage: float | None
+
+
+class FunnelOut(BaseModel):
+    pipeline_id: str
+    date_from: date
+    date_to: date
+    won: int
+    lost: int
+    stages: list[FunnelStage]
+
+
+FUNNEL_MAX_DAYS = 366
+
+
+def _weighted_median(pairs: list[tuple[float, int]]) -> float | None:
+    pairs = sorted((m, w) for m, w in pairs if m is not None and w > 0)
+    total = sum(w for _, w in pairs)
+    if not total:
+        return None
+    acc = 0
+    for median, weight in pairs:
+        acc += weight
+        if acc * 2 >= total:
+            return median
+    return pairs[-1][0]
+
+
 @router.post(
     "/pipelines", response_model=PipelineOut, status_code=status.HTTP_201_CREATED
 )
@@ -51,41 +122,214 @@ async def create_pipeline(
     db.add(obj)
     await db.commit()
     await db.refresh(obj)
+    await bump_generation(tenant_id)
     return obj
 
 
 @router.get("/pipelines", response_model=list[PipelineOut])
 async def list_pipelines(
     request: Request,
-    db: AsyncSession = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
     limit: int = Query(50, ge=1, le=200),
-    offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None),
+    offset: int = Query(0, ge=0, deprecated=True),
+    fields: str | None = FIELDS_QUERY,
 ):
     tenant_id, _user = await require_bearer_user(db, request)
+    proj = sparse_projection("pipeline", Pipeline, PipelineOut, "pipeline_id", fields)
 
-    q = (
-        select(Pipeline)
-        .where(Pipeline.tenant_id == tenant_id)
-        .order_by(Pipeline.created_at.desc())
-        .limit(limit)
-        .offset(offset)
-    )
+    q = keyset(
+        (select(*proj.columns) if proj else select(Pipeline)).where(Pipeline.tenant_id == tenant_id),
+        Pipeline.created_at,
+        Pipeline.pipeline_id,
+        cursor,
+        limit,
+    ).offset(offset)
+    if proj:
+        rows = page((await db.execute(q)).all(), limit, response, "pipeline_id")
+        return proj.response(rows, response_headers(response))
     rows = (await db.execute(q)).scalars().all()
-    return list(rows)
+    return page(rows, limit, response, "pipeline_id")
 
 
 @router.get("/pipelines/{pipeline_id}", response_model=PipelineOut)
 async def get_pipeline(
-    pipeline_id: str, request: Request, db: AsyncSession = Depends(get_db)
+    pipeline_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    fields: str | None = FIELDS_QUERY,
 ):
     tenant_id, _user = await require_bearer_user(db, request)
+    proj = sparse_projection("pipeline", Pipeline, PipelineOut, "pipeline_id", fields)
 
-    q = select(Pipeline).where(
+    q = (select(*proj.columns) if proj else select(Pipeline)).where(
         Pipeline.tenant_id == tenant_id, Pipeline.pipeline_id == pipeline_id
     )
-    obj = (await db.execute(q)).scalar_one_or_none()
+    obj = (await db.execute(q)).first() if proj else (await db.execute(q)).scalar_one_or_none()
     if not obj:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Pipeline not found"
         )
-    return obj
+    return proj.response_one(obj) if proj else obj
+
+
+@router.get("/pipelines/{pipeline_id}/board", response_model=BoardOut)
+async def get_pipeline_board(
+    pipeline_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    per_stage: int = Query(20, ge=1, le=100),
+):
+    """
+    Kanban board in one round trip: stages (from pipeline_cache) with the newest `per_stage`
+    deals each, total count and amount sums per currency (from stage_stats).
+    """
+    tenant_id, user = await require_bearer_user(db, request)
+    defs = await pipeline_cache.require_pipeline(db, tenant_id, pipeline_id)
+    proj = await projection_for(db, user, "deal")
+    stage_defs = defs.stages_of(pipeline_id)
+    if not stage_defs:
+        return BoardOut(pipeline_id=pipeline_id, stages=[])
+
+    # s: стадии пайплайна; t: count/суммы стадии из stage_stats (O(валют), не O(сделок));
+    # d: первые per_stage + 1 сделок стадии - LATERAL + LIMIT по ix_deals_tenant_stage_created,
+    # т.е. O(stages * per_stage) строк индекса вместо сортировки всех сделок пайплайна
+    s = (
+        func.unnest(bindparam("stage_ids", [st.stage_id for st in stage_defs], type_=ARRAY(String)))
+        .table_valued(column("stage_id", String))
+        .render_derived(name="s")
+    )
+    t = (
+        select(
+            func.coalesce(func.sum(StageStat.deal_count), 0).cast(Integer).label("total_count"),
+            func.array_agg(aggregate_order_by(StageStat.currency, StageStat.currency)).label("currencies"),
+            func.array_agg(aggregate_order_by(StageStat.deal_count, StageStat.currency)).label("counts"),
+            func.array_agg(aggregate_order_by(StageStat.amount_sum, StageStat.currency)).label("amounts"),
+        )
+        .where(
+            StageStat.tenant_id == tenant_id,
+            StageStat.pipeline_id == pipeline_id,
+            StageStat.stage_id == s.c.stage_id,
+            StageStat.deal_count != 0,
+        )
+        .lateral("t")
+    )
+    d = (
+        select(*Deal.__table__.c)
+        .where(Deal.tenant_id == tenant_id, Deal.stage_id == s.c.stage_id)
+        .order_by(Deal.created_at.desc(), Deal.deal_id.desc())
+        .limit(per_stage + 1)
+        .lateral("d")
+    )
+    q = (
+        select(s.c.stage_id.label("board_stage_id"), t, d)
+        .select_from(s.join(t, true()).outerjoin(d, true()))
+    )
+
+    totals: dict[str, dict] = {}
+    deals: dict[str, list] = {st.stage_id: [] for st in stage_defs}
+    for row in (await db.execute(q)).mappings():
+        stage_id = row["board_stage_id"]
+        totals.setdefault(stage_id, row)
+        if row["deal_id"] is not None:
+            deals[stage_id].append(row)
+
+    stages: list[BoardStage] = []
+    for st in stage_defs:
+        agg = totals[st.stage_id]
+        rows = deals[st.stage_id]
+        next_cursor = None
+        if len(rows) > per_stage:
+            rows = rows[:per_stage]
+            next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["deal_id"])
+        stages.append(
+            BoardStage(
+                stage_id=st.stage_id,
+                name=st.name,
+                sort_order=st.sort_order,
+                is_won=st.is_won,
+                is_lost=st.is_lost,
+                count=agg["total_count"],
+                totals=[
+                    BoardCurrencyTotal(currency=c, count=n, amount=a)
+                    for c, n, a in zip(agg["currencies"] or (), agg["counts"] or (), agg["amounts"] or ())
+                ],
+                deals=[DealOut.model_validate({k: r[k] for k in DealOut.model_fields}) for r in rows],
+                next_cursor=next_cursor,
+            )
+        )
+    out = BoardOut(pipeline_id=pipeline_id, stages=stages)
+    if proj:
+        # карточек максимум stages * per_stage - режем готовые dict, без отдельного SELECT-пути
+        body = out.model_dump(mode="json")
+        for stage in body["stages"]:
+            stage["deals"] = [proj.strip(d) for d in stage["deals"]]
+        return JSONResponse(body)
+    return out
+
+
+@router.get("/pipelines/{pipeline_id}/funnel", response_model=FunnelOut)
+async def get_pipeline_funnel(
+    pipeline_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    date_from: date | None = Query(None, description="UTC day, default: 30 days ago"),
+    date_to: date | None = Query(None, description="UTC day, inclusive, default: today"),
+):
+    """Funnel for a UTC date range, read from funnel_daily only (rolled up by the runner)."""
+    tenant_id, _user = await require_bearer_user(db, request)
+    defs = await pipeline_cache.require_pipeline(db, tenant_id, pipeline_id)
+
+    date_to = date_to or datetime.now(timezone.utc).date()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to or (date_to - date_from).days >= FUNNEL_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"date range must be 1..{FUNNEL_MAX_DAYS} days",
+        )
+
+    q = select(
+        FunnelDaily.stage_id,
+        FunnelDaily.entered,
+        FunnelDaily.exited,
+        FunnelDaily.won,
+        FunnelDaily.lost,
+        FunnelDaily.median_seconds_in_stage,
+    ).where(
+        FunnelDaily.tenant_id == tenant_id,
+        FunnelDaily.pipeline_id == pipeline_id,
+        FunnelDaily.day >= date_from,
+        FunnelDaily.day <= date_to,
+    )
+    entered: dict[str, int] = {}
+    exited: dict[str, int] = {}
+    medians: dict[str, list[tuple[float, int]]] = {}
+    won = lost = 0
+    for row in (await db.execute(q)).all():
+        entered[row.stage_id] = entered.get(row.stage_id, 0) + row.entered
+        exited[row.stage_id] = exited.get(row.stage_id, 0) + row.exited
+        medians.setdefault(row.stage_id, []).append((row.median_seconds_in_stage, row.exited))
+        won += row.won
+        lost += row.lost
+
+    return FunnelOut(
+        pipeline_id=pipeline_id,
+        date_from=date_from,
+        date_to=date_to,
+        won=won,
+        lost=lost,
+        stages=[
+            FunnelStage(
+                stage_id=st.stage_id,
+                name=st.name,
+                sort_order=st.sort_order,
+                is_won=st.is_won,
+                is_lost=st.is_lost,
+                entered=entered.get(st.stage_id, 0),
+                exited=exited.get(st.stage_id, 0),
+                median_seconds_in_stage=_weighted_median(medians.get(st.stage_id, [])),
+            )
+            for st in defs.stages_of(pipeline_id)
+        ],
+    )
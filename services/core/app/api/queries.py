@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.access_profiles import projection_for
+from app.api.companies import CompanyOut
+from app.api.contacts import ContactOut
+from app.api.deals import DealOut
+from app.api.fast_json import RowsJSONResponse
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.db import get_read_db
+from app.query_dsl import QueryIn, next_cursor, prepare
+from app.security import require_bearer_user
+from app.settings import settings
+
+router = APIRouter(tags=["query"])
+
+# POST /<entity>:query - списки с фильтрами/сортировкой по Query DSL (app/query_dsl.py).
+# Пагинация как у GET-списков: следующая страница - тот же body с cursor из X-Next-Cursor.
+
+
+async def _run(entity: str, query: QueryIn, request: Request, response: Response, db: AsyncSession):
+    tenant_id, user = await require_bearer_user(db, request)
+    proj = await projection_for(db, user, entity)
+    plan, params = prepare(entity, tenant_id, query, proj.fields if proj else None)
+    rows = (await db.execute(plan.statement, params)).all()
+    cursor = next_cursor(plan, rows, query.limit)
+    if proj:
+        return proj.response(rows[: query.limit], {NEXT_CURSOR_HEADER: cursor} if cursor else None)
+    if settings.fast_json_lists:
+        fields = tuple(c.name for c in plan.statement.selected_columns)
+        return RowsJSONResponse(rows[: query.limit], fields, {NEXT_CURSOR_HEADER: cursor} if cursor else None)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return [row._asdict() for row in rows[: query.limit]]
+
+
+@router.post("/deals:query", response_model=list[DealOut])
+async def query_deals(query: QueryIn, request: Request, response: Response, db: AsyncSession = Depends(get_read_db)):
+    return await _run("deal", query, request, response, db)
+
+
+@router.post("/contacts:query", response_model=list[ContactOut])
+async def query_contacts(query: QueryIn, request: Request, response: Response, db: AsyncSession = Depends(get_read_db)):
+    return await _run("contact", query, request, response, db)
+
+
+@router.post("/companies:query", response_model=list[CompanyOut])
+async def query_companies(query: QueryIn, request: Request, response: Response, db: AsyncSession = Depends(get_read_db)):
+    return await _run("company", query, request, response, db)
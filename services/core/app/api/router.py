@@ -1,14 +1,21 @@
 from __future__ import annotations
 
 from app.api import (
+    access_profiles,
     auth,
     bootstrap,
     companies,
     contacts,
     deals,
+    duplicates,
+    exports,
     health,
     logout,
+    metrics,
     pipelines, stages,
+    queries,
+    search,
+    users,
     version,
 )
 from fastapi import APIRouter
@@ -28,5 +35,13 @@ api_router.include_router(contacts.router)
 api_router.include_router(pipelines.router)
 api_router.include_router(stages.router)
 api_router.include_router(deals.router)
+api_router.include_router(exports.router)
+api_router.include_router(queries.router)
+api_router.include_router(search.router)
+api_router.include_router(duplicates.router)
+
+api_router.include_router(access_profiles.router)
+api_router.include_router(users.router)
+api_router.include_router(metrics.router)
 
 router = api_router
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import logging
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query, Request
+from pydantic import BaseModel
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import get_read_db
+from app.security import require_bearer_user
+from app.settings import settings
+
+log = logging.getLogger(__name__)
+
+router = APIRouter(tags=["search"])
+
+# Trigram search (pg_trgm + btree_gin, миграция 0011).
+# Выражения ДОЛЖНЫ совпадать с индексными из 0011, литералы - прямо в SQL (не bind-параметры),
+# иначе planner не сопоставит выражение с индексом.
+_CONTACTS_EXPR = (
+    "lower(name || ' ' || coalesce(email, '') || ' ' || coalesce(phone, '') || ' ' "
+    "|| regexp_replace(coalesce(phone, ''), '[^0-9]', '', 'g'))"
+)
+_COMPANIES_EXPR = "lower(name || ' ' || coalesce(domain, ''))"
+
+# сколько совпадений на тип ранжируем; дальше - обрезаем (type-ahead, не полнотекстовый отчёт)
+SEARCH_CANDIDATES = 1000
+
+SearchType = Literal["contact", "company"]
+
+_BRANCHES: dict[str, str] = {
+    "contact": f"""
+        (SELECT 'contact' AS type, id, title, subtitle,
+                (lower(title) LIKE :prefix)::int + word_similarity(:q, doc) AS score
+         FROM (SELECT contact_id AS id, name AS title, coalesce(email, phone) AS subtitle, {_CONTACTS_EXPR} AS doc
+               FROM contacts
+               WHERE tenant_id = :tenant_id AND {_CONTACTS_EXPR} LIKE :pattern
+               LIMIT :candidates) c
+         ORDER BY score DESC, title
+         LIMIT :limit)
+    """,
+    "company": f"""
+        (SELECT 'company' AS type, id, title, subtitle,
+                (lower(title) LIKE :prefix)::int + word_similarity(:q, doc) AS score
+         FROM (SELECT company_id AS id, name AS title, domain AS subtitle, {_COMPANIES_EXPR} AS doc
+               FROM companies
+               WHERE tenant_id = :tenant_id AND {_COMPANIES_EXPR} LIKE :pattern
+               LIMIT :candidates) c
+         ORDER BY score DESC, title
+         LIMIT :limit)
+    """,
+}
+
+
+class SearchHit(BaseModel):
+    type: SearchType
+    id: str
+    title: str
+    subtitle: str | None
+    score: float
+
+
+class SearchOut(BaseModel):
+    q: str
+    results: list[SearchHit]
+    # бюджет SEARCH_BUDGET_MS исчерпан: results пустой, клиенту стоит уточнить запрос
+    timed_out: bool = False
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+@router.get("/search", response_model=SearchOut)
+async def search(
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    q: str = Query(..., min_length=3, max_length=100),
+    types: list[SearchType] = Query(default=["contact", "company"]),
+    limit: int = Query(20, ge=1, le=50),
+):
+    tenant_id, _user = await require_bearer_user(db, request)
+
+    needle = " ".join(q.lower().split())
+    sql = " UNION ALL ".join(_BRANCHES[t] for t in dict.fromkeys(types)) + " ORDER BY score DESC LIMIT :limit"
+    params = {
+        "tenant_id": tenant_id,
+        "q": needle,
+        "pattern": f"%{_like_escape(needle)}%",
+        "prefix": f"{_like_escape(needle)}%",
+        "candidates": SEARCH_CANDIDATES,
+        "limit": limit,
+    }
+
+    # SET LOCAL живёт до конца транзакции сессии - на другие запросы не протекает
+    await db.execute(text("SELECT set_config('statement_timeout', :ms, true)"), {"ms": str(settings.search_budget_ms)})
+    try:
+        rows = (await db.execute(text(sql), params)).mappings().all()
+    except DBAPIError as e:
+        if getattr(e.orig, "sqlstate", None) != "57014":  # query_canceled
+            raise
+        await db.rollback()
+        log.warning("search over budget (%sms) tenant=%s len=%s", settings.search_budget_ms, tenant_id, len(needle))
+        return SearchOut(q=q, results=[], timed_out=True)
+
+    return SearchOut(q=q, results=[SearchHit(**r) for r in rows])
@@ -3,8 +3,10 @@ from __future__ import annotations
 from datetime import datetime
 from uuid import uuid4
 
-from app.db import get_db
-from app.models import Pipeline, Stage
+from app.api.fieldsets import FIELDS_QUERY, sparse_projection
+from app.db import get_db, get_read_db
+from app.models import Stage
+from app.pipeline_cache import bump_generation, pipeline_cache
 from app.security import require_bearer_user
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from pydantic import BaseModel, ConfigDict
@@ -44,14 +46,7 @@ async def create_stage(
     tenant_id, _user = await require_bearer_user(db, request)
 
     # pipeline must exist and belong to tenant
-    pq = select(Pipeline).where(
-        Pipeline.tenant_id == tenant_id, Pipeline.pipeline_id == payload.pipeline_id
-    )
-    pipeline = (await db.execute(pq)).scalar_one_or_none()
-    if not pipeline:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Pipeline not found"
-        )
+    await pipeline_cache.require_pipeline(db, tenant_id, payload.pipeline_id)
 
     if payload.is_won and payload.is_lost:
         raise HTTPException(
@@ -77,22 +72,27 @@ async def create_stage(
     db.add(obj)
     await db.commit()
     await db.refresh(obj)
+    await bump_generation(tenant_id)
     return obj
 
 
 @router.get("/stages", response_model=list[StageOut])
 async def list_stages(
     request: Request,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     pipeline_id: str | None = None,
     limit: int = Query(200, ge=1, le=500),
+    fields: str | None = FIELDS_QUERY,
 ):
     tenant_id, _user = await require_bearer_user(db, request)
+    proj = sparse_projection("stage", Stage, StageOut, "stage_id", fields)
 
-    q = select(Stage).where(Stage.tenant_id == tenant_id)
+    q = (select(*proj.columns) if proj else select(Stage)).where(Stage.tenant_id == tenant_id)
     if pipeline_id:
         q = q.where(Stage.pipeline_id == pipeline_id)
 
     q = q.order_by(Stage.pipeline_id.asc(), Stage.sort_order.asc()).limit(limit)
+    if proj:
+        return proj.response((await db.execute(q)).all())
     rows = (await db.execute(q)).scalars().all()
     return list(rows)
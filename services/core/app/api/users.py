@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from pydantic import BaseModel
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import get_db
+from app.models import User
+from app.security import deactivate_user, require_admin, require_bearer_user
+
+router = APIRouter(tags=["users"])
+
+
+class UserActiveIn(BaseModel):
+    is_active: bool
+
+
+@router.put("/users/{user_id}/active", response_model=UserActiveIn)
+async def set_user_active(user_id: str, payload: UserActiveIn, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Disable or re-enable a user. Disabling takes effect immediately: cached sessions of the user
+    are dropped in every worker and their JWTs are revoked.
+    """
+    tenant_id, user = await require_bearer_user(db, request)
+    require_admin(user)
+    if user_id == user.user_id and not payload.is_active:
+        # последний админ не должен запереть тенант сам себе
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Cannot deactivate yourself")
+
+    if not payload.is_active:
+        found = await deactivate_user(db, tenant_id, user_id)
+    else:
+        result = await db.execute(
+            update(User).where(User.tenant_id == tenant_id, User.user_id == user_id).values(is_active=True)
+        )
+        found = result.rowcount > 0
+        await db.commit()
+    if not found:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return payload
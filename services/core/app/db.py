@@ -1,15 +1,180 @@
 from __future__ import annotations
 
+import time
 from collections.abc import AsyncGenerator
+from typing import Any
 
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from app import pubsub
+from app.session_cache import token_key
 from app.settings import settings
 
-engine: AsyncEngine = create_async_engine(settings.database_url, pool_pre_ping=True)
+READ_YOUR_WRITES_CHANNEL = "nextcrm:db:ryw"
+
+
+class PoolStats:
+    # счётчики живут вне инстанса пула: engine.dispose() пересоздаёт пул
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        # новые соединения (TCP + auth + init диалекта) - отдельно от ожидания свободного слота
+        self.connects = 0
+        self.connect_seconds_total = 0.0
+        self.connect_seconds_max = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "checkouts": self.checkouts,
+            "checkout_timeouts": self.timeouts,
+            "wait_ms_avg": round(self.wait_seconds_total * 1000 / self.checkouts, 3) if self.checkouts else None,
+            "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+            "connects": self.connects,
+            "connect_ms_avg": round(self.connect_seconds_total * 1000 / self.connects, 3) if self.connects else None,
+            "connect_ms_max": round(self.connect_seconds_max * 1000, 3),
+        }
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long callers wait for a free connection (saturation)
+    and, separately, how long opening a new one takes (slow connects).
+    """
+
+    stats: PoolStats
+
+    def _create_connection(self):
+        started = time.perf_counter()
+        record = super()._create_connection()
+        elapsed = time.perf_counter() - started
+        self.stats.connects += 1
+        self.stats.connect_seconds_total += elapsed
+        self.stats.connect_seconds_max = max(self.stats.connect_seconds_max, elapsed)
+        # _do_get вычитает его из ожидания; на записи - т.к. чекауты конкурентны (greenlet'ы)
+        record._connect_seconds = elapsed
+        return record
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.timeouts += 1
+            raise
+        waited = time.perf_counter() - started - conn.__dict__.pop("_connect_seconds", 0.0)
+        self.stats.checkouts += 1
+        self.stats.wait_seconds_total += waited
+        self.stats.wait_seconds_max = max(self.stats.wait_seconds_max, waited)
+        return conn
+
+
+def _make_engine(url: str, stats: PoolStats) -> AsyncEngine:
+    pool_class = type("InstrumentedPool", (InstrumentedPool,), {"stats": stats})
+    return create_async_engine(
+        url,
+        poolclass=pool_class,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_ping == "pre_ping",
+    )
+
+
+def pool_status(engine: AsyncEngine, stats: PoolStats) -> dict[str, Any]:
+    pool = engine.pool
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": settings.db_max_overflow,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        # overflow() < 0 пока пул не заполнен до pool_size
+        "overflow": max(0, pool.overflow()),
+        "ping": settings.db_pool_ping,
+        "recycle_seconds": settings.db_pool_recycle,
+        "timeout_seconds": settings.db_pool_timeout,
+        **stats.as_dict(),
+    }
+
+
+primary_pool_stats = PoolStats()
+engine: AsyncEngine = _make_engine(settings.database_url, primary_pool_stats)
 SessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
+replica_pool_stats = PoolStats()
+replica_engine: AsyncEngine | None = (
+    _make_engine(settings.replica_database_url, replica_pool_stats) if settings.replica_database_url else None
+)
+ReadSessionLocal = (
+    async_sessionmaker(replica_engine, expire_on_commit=False, class_=AsyncSession, info={"replica": True})
+    if replica_engine is not None
+    else SessionLocal
+)
+
+
+# -------------------------
+# Read-your-writes
+# -------------------------
+# writer key (хэш bearer-токена) -> unix time, до которого его чтения идут на primary.
+# Метка ставится на commit и рассылается всем воркерам через pub/sub.
+_recent_writers: dict[str, float] = {}
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+
+def _on_recent_write(message: dict[str, Any]) -> None:
+    now = time.time()
+    _recent_writers[message["key"]] = float(message["until"])
+    if len(_recent_writers) > 10000:
+        for key in [k for k, until in _recent_writers.items() if until <= now]:
+            del _recent_writers[key]
+
+
+def _writer_key(request: Request) -> str | None:
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    return token_key(token) if token else None
+
+
+def _sticks_to_primary(request: Request) -> bool:
+    key = _writer_key(request)
+    if key is None:
+        return False
+    until = _recent_writers.get(key)
+    return until is not None and until > time.time()
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _mark_recent_write(session: OrmSession) -> None:
+    key = session.info.get("writer_key")
+    if key is None or replica_engine is None or settings.read_your_writes_seconds <= 0:
+        return
+    until = time.time() + settings.read_your_writes_seconds
+    pubsub.publish_nowait(READ_YOUR_WRITES_CHANNEL, {"key": key, "until": until})
+
+
+pubsub.subscribe(READ_YOUR_WRITES_CHANNEL, _on_recent_write)
+
+
+def read_session_factory(request: Request) -> async_sessionmaker[AsyncSession]:
+    """Replica or primary for this request (see get_read_db); for handlers that manage their own session."""
+    return SessionLocal if _sticks_to_primary(request) else ReadSessionLocal
+
+
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
     async with SessionLocal() as session:
+        session.info["writer_key"] = _writer_key(request)
+        yield session
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Session for read-only handlers: replica when configured, unless this token
+    wrote something in the last READ_YOUR_WRITES_SECONDS (then primary).
+    """
+    async with read_session_factory(request)() as session:
         yield session
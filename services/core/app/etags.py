@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import time
+from datetime import datetime
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import pubsub
+from app.access_profiles import access_profile_cache
+from app.security import AuthUser
+from app.settings import settings
+
+log = logging.getLogger(__name__)
+
+# Conditional GET / PATCH.
+#
+# Сущность: ETag = "<updated_at в мкс, hex>-<вариант>"; вариант = профиль доступа (id + версия) + ?fields=
+# (разные представления одного ресурса - разные strong ETag; правка профиля меняет все его ETag).
+# If-Match на PATCH сравнивает только версию (updated_at) - клиент мог получить ETag из любого представления.
+#
+# Список: per-tenant счётчик коллекции в Redis (HINCRBY после commit любой записи в коллекцию)
+# + хэш query string и варианта. If-None-Match проверяется до запроса в БД: 304 без чтения строк.
+# Чтение с реплики вскоре после записи (< READ_YOUR_WRITES_SECONDS, столько мы допускаем lag)
+# ETag не получает: иначе устаревшее тело ушло бы под новым счётчиком.
+
+_COLLECTIONS_KEY = "nextcrm:etag:{tenant_id}"
+
+
+async def etag_variant(db: AsyncSession, user: AuthUser, fields: str | None = None) -> str:
+    """Representation variant of a response: access profile with its version + normalized `?fields=`."""
+    profile = ""
+    if user.access_profile_id:
+        # после projection_for() - попадание в кэш, без запроса
+        compiled = await access_profile_cache.get(db, user.tenant_id, user.access_profile_id)
+        profile = f"{compiled.profile_id}@{compiled.version}"
+    normalized = ",".join(sorted({f.strip() for f in (fields or "").split(",") if f.strip()}))
+    return f"{profile}|{normalized}"
+
+
+def _short_hash(*parts: str) -> str:
+    return hashlib.blake2b("\x1f".join(parts).encode(), digest_size=8).hexdigest()
+
+
+def _version(updated_at: datetime) -> str:
+    return format(int(updated_at.timestamp() * 1_000_000), "x")
+
+
+def entity_etag(updated_at: datetime, variant: str) -> str:
+    return f'"{_version(updated_at)}-{_short_hash(variant)}"'
+
+
+def _tags(header: str) -> list[str]:
+    return [t.strip().removeprefix("W/") for t in header.split(",") if t.strip()]
+
+
+def not_modified(request: Request, etag: str | None) -> Response | None:
+    """304 for a matching If-None-Match (weak comparison, RFC 9110 13.1.2)."""
+    header = request.headers.get("If-None-Match")
+    if etag is None or not header:
+        return None
+    tags = _tags(header)
+    if "*" in tags or etag in tags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return None
+
+
+def check_if_match(request: Request, updated_at: datetime) -> None:
+    """PATCH precondition: If-Match must name the current version of the entity, else 412."""
+    header = request.headers.get("If-Match")
+    if not header:
+        return
+    current = _version(updated_at)
+    for tag in (t.strip() for t in header.split(",")):
+        # If-Match - strong comparison: weak-теги (W/...) не совпадают никогда
+        if tag == "*" or (tag.startswith('"') and tag.strip('"').split("-", 1)[0] == current):
+            return
+    raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="ETag does not match (resource changed)")
+
+
+async def bump_collections(tenant_id: str, *collections: str) -> None:
+    """Call AFTER commit of any write to these collections of the tenant."""
+    now = str(time.time())
+    try:
+        pipe = pubsub.get_redis().pipeline(transaction=True)
+        key = _COLLECTIONS_KEY.format(tenant_id=tenant_id)
+        for collection in collections:
+            pipe.hincrby(key, collection, 1)
+            pipe.hset(key, f"{collection}:at", now)
+        await pipe.execute()
+    except Exception:
+        log.warning("etag: redis unavailable, list ETags of %s/%s not bumped", tenant_id, collections)
+
+
+async def list_etag(request: Request, db: AsyncSession, user: AuthUser, collection: str, variant: str) -> str | None:
+    """Strong ETag for a list response; None = don't cache (Redis down or replica may lag)."""
+    try:
+        counter, bumped_at = await pubsub.get_redis().hmget(
+            _COLLECTIONS_KEY.format(tenant_id=user.tenant_id), [collection, f"{collection}:at"]
+        )
+    except Exception:
+        return None
+    if db.info.get("replica") and bumped_at and time.time() - float(bumped_at) < settings.read_your_writes_seconds:
+        return None
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items() if k != "fields"))
+    return f'"{_short_hash(user.tenant_id, collection, counter or "0", query, variant)}"'
@@ -1,11 +1,28 @@
 from __future__ import annotations
 
 import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
+from app import pubsub
 from app.api.router import router as api_router
+from app.security import calibrate_password_hashing
 
 APP_VERSION = os.getenv("APP_VERSION", "0.1.0-dev")
 
-app = FastAPI(title="NextCRM Core", version=APP_VERSION)
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # bcrypt cost под текущее железо (или BCRYPT_ROUNDS)
+    await calibrate_password_hashing()
+    # cross-worker cache invalidation listener (Redis pub/sub)
+    await pubsub.start()
+    try:
+        yield
+    finally:
+        await pubsub.stop()
+
+
+app = FastAPI(title="NextCRM Core", version=APP_VERSION, lifespan=lifespan)
 app.include_router(api_router)
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
 
 from sqlalchemy import Boolean, DateTime, ForeignKey, String, Text, func
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
@@ -31,6 +32,10 @@ class User(Base):
     password_hash: Mapped[str] = mapped_column(Text, nullable=False)
     role: Mapped[str] = mapped_column(String(64), default="admin", nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+    # NULL = все поля; иначе ответы режутся по access_profiles.fields
+    access_profile_id: Mapped[str | None] = mapped_column(
+        String(64), ForeignKey("access_profiles.profile_id", ondelete="SET NULL"), index=True, nullable=True
+    )
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
@@ -50,8 +55,9 @@ class Session(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
+    # sessions партиционирована по expires_at (0005), поэтому он входит в PK
     expires_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), nullable=False
+        DateTime(timezone=True), primary_key=True, nullable=False
     )
     revoked_at: Mapped[datetime | None] = mapped_column(
         DateTime(timezone=True), nullable=True
@@ -75,12 +81,15 @@ class Contact(Base):
     __table_args__ = (
         sa.Index("ix_contacts_tenant_company", "tenant_id", "company_id"),
         sa.Index("ix_contacts_tenant_created", "tenant_id", "created_at"),
+        sa.Index("ux_contacts_tenant_external", "tenant_id", "external_id", unique=True),
     )
 
     contact_id = sa.Column(
         sa.String(64), primary_key=True, default=lambda: f"c_{uuid.uuid4().hex}"
     )
     tenant_id = sa.Column(sa.String(64), nullable=False, index=True)
+    # id записи во внешней системе (импорт/интеграции); ключ upsert в /contacts:batch
+    external_id = sa.Column(sa.String(128), nullable=True)
 
     name = sa.Column(sa.String(200), nullable=False)
     email = sa.Column(sa.String(320), nullable=True)
@@ -114,12 +123,15 @@ class Company(Base):
     __tablename__ = "companies"
     __table_args__ = (
         sa.Index("ix_companies_tenant_created", "tenant_id", "created_at"),
+        sa.Index("ux_companies_tenant_external", "tenant_id", "external_id", unique=True),
     )
 
     company_id = sa.Column(
         sa.String(64), primary_key=True, default=lambda: f"co_{uuid.uuid4().hex}"
     )
     tenant_id = sa.Column(sa.String(64), nullable=False, index=True)
+    # ключ upsert в /companies:batch
+    external_id = sa.Column(sa.String(128), nullable=True)
 
     name = sa.Column(sa.String(200), nullable=False)
     domain = sa.Column(sa.String(200), nullable=True)
@@ -147,6 +159,9 @@ from sqlalchemy import Integer, Numeric
 
 class Pipeline(Base):
     __tablename__ = "pipelines"
+    __table_args__ = (
+        sa.Index("ix_pipelines_tenant_created", "tenant_id", "created_at", "pipeline_id"),
+    )
 
     pipeline_id: Mapped[str] = mapped_column(String(64), primary_key=True)
     tenant_id: Mapped[str] = mapped_column(String(64), index=True, nullable=False)
@@ -184,6 +199,11 @@ class Stage(Base):
 
 class Deal(Base):
     __tablename__ = "deals"
+    __table_args__ = (
+        sa.Index("ix_deals_tenant_created", "tenant_id", "created_at", "deal_id"),
+        sa.Index("ix_deals_tenant_pipeline_created", "tenant_id", "pipeline_id", "created_at", "deal_id"),
+        sa.Index("ix_deals_tenant_stage_created", "tenant_id", "stage_id", "created_at", "deal_id"),
+    )
 
     deal_id: Mapped[str] = mapped_column(String(64), primary_key=True)
     tenant_id: Mapped[str] = mapped_column(String(64), index=True, nullable=False)
@@ -221,3 +241,83 @@ class Deal(Base):
 
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+class StageStat(Base):
+    """Per-stage deal count / amount sum by currency; maintained by deltas (app/stage_stats.py)."""
+
+    __tablename__ = "stage_stats"
+
+    tenant_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    pipeline_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    stage_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    currency: Mapped[str] = mapped_column(String(10), primary_key=True)
+
+    deal_count: Mapped[int] = mapped_column(sa.BigInteger, nullable=False, default=0)
+    amount_sum: Mapped[Decimal] = mapped_column(Numeric(18, 2), nullable=False, default=0)
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class DealStageTransition(Base):
+    """Append-only stage history; `txid` (xid8, server default) is left to the DB."""
+
+    __tablename__ = "deal_stage_transitions"
+
+    transition_id: Mapped[int] = mapped_column(sa.BigInteger, sa.Identity(always=True), primary_key=True)
+    tenant_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    deal_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    pipeline_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    from_stage_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    to_stage_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    transitioned_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    seconds_in_from_stage: Mapped[float | None] = mapped_column(sa.Float, nullable=True)
+
+
+class FunnelDaily(Base):
+    """Daily funnel rollup per stage; written only by the runner (funnel_rollup)."""
+
+    __tablename__ = "funnel_daily"
+
+    tenant_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    pipeline_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    day: Mapped[date] = mapped_column(sa.Date, primary_key=True)
+    stage_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+
+    entered: Mapped[int] = mapped_column(sa.BigInteger, nullable=False, default=0)
+    exited: Mapped[int] = mapped_column(sa.BigInteger, nullable=False, default=0)
+    won: Mapped[int] = mapped_column(sa.BigInteger, nullable=False, default=0)
+    lost: Mapped[int] = mapped_column(sa.BigInteger, nullable=False, default=0)
+    median_seconds_in_stage: Mapped[float | None] = mapped_column(sa.Float, nullable=True)
+
+
+class DuplicateCandidate(Base):
+    """Duplicate cluster by blocking key; written by the runner (dedup_scan)."""
+
+    __tablename__ = "duplicate_candidates"
+
+    candidate_id: Mapped[int] = mapped_column(sa.BigInteger, sa.Identity(always=True), primary_key=True)
+    tenant_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    entity: Mapped[str] = mapped_column(String(16), nullable=False)  # contact | company
+    key_type: Mapped[str] = mapped_column(String(16), nullable=False)  # email | phone | domain
+    block_key: Mapped[str] = mapped_column(Text, nullable=False)
+    record_ids: Mapped[list[str]] = mapped_column(sa.ARRAY(String(64)), nullable=False)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="open")
+    detected_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    resolved_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class AccessProfile(Base):
+    __tablename__ = "access_profiles"
+    __table_args__ = (sa.UniqueConstraint("tenant_id", "name", name="ux_access_profiles_tenant_name"),)
+
+    profile_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    tenant_id: Mapped[str] = mapped_column(
+        String(64), ForeignKey("tenants.tenant_id", ondelete="CASCADE"), nullable=False
+    )
+    name: Mapped[str] = mapped_column(String(128), nullable=False)
+    # entity -> список разрешённых полей
+    fields: Mapped[dict[str, list[str]]] = mapped_column(JSONB, nullable=False, default=dict)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import pubsub
+from app.db import SessionLocal
+from app.models import Pipeline, Stage
+
+log = logging.getLogger(__name__)
+
+# Per-tenant cache of pipeline -> stages definitions.
+# Версионируется per-tenant generation-счётчиком в Redis: любая запись в pipelines/stages
+# делает INCR и рассылает новую generation; воркеры выкидывают всё, что старше.
+
+PIPELINE_DEFS_CHANNEL = "nextcrm:pipelines:invalidate"
+_GEN_KEY = "nextcrm:pipelines:gen:{tenant_id}"
+
+MAX_TENANTS = 2000
+
+
+@dataclass(frozen=True)
+class StageDef:
+    stage_id: str
+    pipeline_id: str
+    name: str
+    sort_order: int
+    is_won: bool
+    is_lost: bool
+
+
+@dataclass(frozen=True)
+class PipelineDefs:
+    generation: int
+    pipeline_ids: frozenset[str]
+    stages: dict[str, StageDef] = field(default_factory=dict)
+
+    def stages_of(self, pipeline_id: str) -> list[StageDef]:
+        return sorted(
+            (s for s in self.stages.values() if s.pipeline_id == pipeline_id),
+            key=lambda s: (s.sort_order, s.stage_id),
+        )
+
+
+class PipelineDefCache:
+    def __init__(self, max_tenants: int) -> None:
+        self.max_tenants = max_tenants
+        self._entries: OrderedDict[str, PipelineDefs] = OrderedDict()
+        # самая свежая generation, о которой мы слышали (могла прийти раньше, чем закончилась загрузка)
+        self._seen_generation: dict[str, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.invalidations = 0
+
+    async def get(self, db: AsyncSession, tenant_id: str) -> PipelineDefs:
+        defs = self._entries.get(tenant_id)
+        if defs is not None:
+            self._entries.move_to_end(tenant_id)
+            self.hits += 1
+            return defs
+        self.misses += 1
+        return await self.load(db, tenant_id)
+
+    async def load(self, db: AsyncSession, tenant_id: str) -> PipelineDefs:
+        generation = await _current_generation(tenant_id)
+
+        q = (
+            select(
+                Pipeline.pipeline_id,
+                Stage.stage_id,
+                Stage.name,
+                Stage.sort_order,
+                Stage.is_won,
+                Stage.is_lost,
+            )
+            .outerjoin(Stage, and_(Stage.pipeline_id == Pipeline.pipeline_id, Stage.tenant_id == tenant_id))
+            .where(Pipeline.tenant_id == tenant_id)
+        )
+        if db.info.get("replica"):
+            # определения кэшируются под generation primary - читаем их с primary, не с отстающей реплики
+            async with SessionLocal() as primary:
+                rows = (await primary.execute(q)).all()
+        else:
+            rows = (await db.execute(q)).all()
+
+        pipeline_ids: set[str] = set()
+        stages: dict[str, StageDef] = {}
+        for row in rows:
+            pipeline_ids.add(row.pipeline_id)
+            if row.stage_id is not None:
+                stages[row.stage_id] = StageDef(
+                    stage_id=row.stage_id,
+                    pipeline_id=row.pipeline_id,
+                    name=row.name,
+                    sort_order=row.sort_order,
+                    is_won=row.is_won,
+                    is_lost=row.is_lost,
+                )
+
+        defs = PipelineDefs(generation=generation, pipeline_ids=frozenset(pipeline_ids), stages=stages)
+        if generation >= self._seen_generation.get(tenant_id, 0):
+            self._entries[tenant_id] = defs
+            self._entries.move_to_end(tenant_id)
+            while len(self._entries) > self.max_tenants:
+                self._entries.popitem(last=False)
+        return defs
+
+    def invalidate(self, tenant_id: str, generation: int) -> None:
+        if generation > self._seen_generation.get(tenant_id, 0):
+            self._seen_generation[tenant_id] = generation
+        defs = self._entries.get(tenant_id)
+        if defs is not None and defs.generation < generation:
+            del self._entries[tenant_id]
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def require_pipeline(self, db: AsyncSession, tenant_id: str, pipeline_id: str) -> PipelineDefs:
+        defs = await self.get(db, tenant_id)
+        if pipeline_id not in defs.pipeline_ids:
+            # негативу из кэша не верим: pipeline мог появиться в другом воркере до инвалидации
+            self.reloads += 1
+            defs = await self.load(db, tenant_id)
+            if pipeline_id not in defs.pipeline_ids:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pipeline not found")
+        return defs
+
+    async def require_stage_in_pipeline(
+        self, db: AsyncSession, tenant_id: str, pipeline_id: str, stage_id: str
+    ) -> StageDef:
+        defs = await self.get(db, tenant_id)
+        stage = defs.stages.get(stage_id)
+        if stage is None or stage.pipeline_id != pipeline_id:
+            self.reloads += 1
+            defs = await self.load(db, tenant_id)
+            stage = defs.stages.get(stage_id)
+            if stage is None or stage.pipeline_id != pipeline_id:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Stage not found (or not in pipeline)",
+                )
+        return stage
+
+    async def require_stage(self, db: AsyncSession, tenant_id: str, stage_id: str) -> StageDef:
+        defs = await self.get(db, tenant_id)
+        stage = defs.stages.get(stage_id)
+        if stage is None:
+            self.reloads += 1
+            stage = (await self.load(db, tenant_id)).stages.get(stage_id)
+            if stage is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Stage not found")
+        return stage
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "tenants": len(self._entries),
+            "max_tenants": self.max_tenants,
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "invalidations": self.invalidations,
+        }
+
+
+pipeline_cache = PipelineDefCache(MAX_TENANTS)
+
+
+async def _current_generation(tenant_id: str) -> int:
+    try:
+        value = await pubsub.get_redis().get(_GEN_KEY.format(tenant_id=tenant_id))
+    except Exception:
+        log.warning("pipeline cache: redis unavailable, using local generation")
+        return pipeline_cache._seen_generation.get(tenant_id, 0)
+    return int(value or 0)
+
+
+async def bump_generation(tenant_id: str) -> None:
+    """Call AFTER commit of any write to pipelines/stages of the tenant."""
+    try:
+        generation = int(await pubsub.get_redis().incr(_GEN_KEY.format(tenant_id=tenant_id)))
+    except Exception:
+        log.warning("pipeline cache: redis unavailable, bumping local generation only")
+        generation = pipeline_cache._seen_generation.get(tenant_id, 0) + 1
+    await pubsub.publish(PIPELINE_DEFS_CHANNEL, {"tenant_id": tenant_id, "generation": generation})
+
+
+def _on_invalidate(message: dict[str, Any]) -> None:
+    pipeline_cache.invalidate(message["tenant_id"], int(message["generation"]))
+
+
+pubsub.subscribe(PIPELINE_DEFS_CHANNEL, _on_invalidate, reset=pipeline_cache.clear)
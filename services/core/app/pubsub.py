@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections.abc import Callable
+from typing import Any
+from uuid import uuid4
+
+from redis import asyncio as aioredis
+
+from app.settings import settings
+
+log = logging.getLogger(__name__)
+
+# Cross-worker invalidation bus (Redis pub/sub).
+# Каждый uvicorn worker держит свои in-process кэши; сообщения на канале
+# говорят остальным воркерам, что именно выкинуть.
+
+Handler = Callable[[dict[str, Any]], None]
+ResetHook = Callable[[], None]
+
+_ORIGIN = uuid4().hex
+
+_handlers: dict[str, list[Handler]] = {}
+_reset_hooks: list[ResetHook] = []
+
+_redis: aioredis.Redis | None = None
+_listener: asyncio.Task | None = None
+_pending: set[asyncio.Task] = set()
+
+
+def get_redis() -> aioredis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = aioredis.Redis.from_url(settings.redis_url, decode_responses=True)
+    return _redis
+
+
+def subscribe(channel: str, handler: Handler, *, reset: ResetHook | None = None) -> None:
+    """
+    Register a handler for a channel. Must be called at import time (before start()).
+    `reset` is called whenever the listener (re)connects, because messages sent
+    while we were disconnected are lost and the local cache can no longer be trusted.
+    """
+    _handlers.setdefault(channel, []).append(handler)
+    if reset is not None:
+        _reset_hooks.append(reset)
+
+
+def _dispatch(channel: str, message: dict[str, Any]) -> None:
+    for handler in _handlers.get(channel, ()):
+        try:
+            handler(message)
+        except Exception:
+            log.exception("pubsub handler failed (channel=%s)", channel)
+
+
+async def publish(channel: str, message: dict[str, Any]) -> None:
+    # локально применяем сразу, не дожидаясь round trip через Redis
+    _dispatch(channel, message)
+    await _publish_remote(channel, message)
+
+
+def publish_nowait(channel: str, message: dict[str, Any]) -> None:
+    """publish() for sync callers inside the event loop (e.g. SQLAlchemy session events)."""
+    _dispatch(channel, message)
+    task = asyncio.get_running_loop().create_task(_publish_remote(channel, message))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+async def _publish_remote(channel: str, message: dict[str, Any]) -> None:
+    try:
+        await get_redis().publish(channel, json.dumps({**message, "_origin": _ORIGIN}))
+    except Exception:
+        log.warning("pubsub publish failed (channel=%s); other workers keep stale entries until TTL/reconnect", channel)
+
+
+async def _listen() -> None:
+    while True:
+        pubsub = get_redis().pubsub()
+        try:
+            await pubsub.subscribe(*_handlers)
+            for reset in _reset_hooks:
+                reset()
+            async for msg in pubsub.listen():
+                if msg.get("type") != "message":
+                    continue
+                data = json.loads(msg["data"])
+                if data.pop("_origin", None) == _ORIGIN:
+                    continue
+                _dispatch(msg["channel"], data)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.warning("pubsub listener disconnected; retrying in 1s")
+            await asyncio.sleep(1)
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+
+async def start() -> None:
+    global _listener
+    if _listener is None and _handlers:
+        _listener = asyncio.create_task(_listen())
+
+
+async def stop() -> None:
+    global _listener, _redis
+    if _listener is not None:
+        _listener.cancel()
+        try:
+            await _listener
+        except asyncio.CancelledError:
+            pass
+        _listener = None
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
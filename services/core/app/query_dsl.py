@@ -0,0 +1,382 @@
+from __future__ import annotations
+
+import base64
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Literal
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, Field
+from sqlalchemy import Select, and_, bindparam, or_, select, tuple_
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models import Company, Contact, Deal
+
+# Query DSL (Roadmap Block 4): фильтры/сортировка/keyset-курсор из JSON, без SQL от клиента.
+# Поля и операторы - только из allowlist сущности; значения - всегда bind-параметры.
+#
+# Скомпилированный Select кэшируется по "форме" запроса (сущность, (поле, оператор)..., сортировка,
+# есть ли курсор): повторная форма не валидируется и не строится заново, а одинаковый объект
+# statement даёт попадание и в compiled cache SQLAlchemy. IN-списки - expanding bindparam,
+# поэтому длина списка в форму не входит.
+#
+# tenant_id = :tenant_id - всегда первый предикат: композитные индексы (tenant_id, pipeline_id|stage_id,
+# created_at, id) работают для eq-фильтров и сортировки по created_at по умолчанию.
+
+QUERY_MAX_FILTERS = 10
+QUERY_MAX_SORT_KEYS = 3
+QUERY_MAX_IN_VALUES = 500
+QUERY_MAX_LIMIT = 500
+QUERY_PLAN_CACHE_SIZE = 512
+
+Op = Literal["eq", "in", "gt", "gte", "lt", "lte", "between", "is_null", "not_null"]
+
+_EQ = frozenset({"eq", "in"})
+_RANGE = frozenset({"gt", "gte", "lt", "lte", "between"})
+_NULL = frozenset({"is_null", "not_null"})
+
+
+class QueryFilter(BaseModel):
+    field: str
+    op: Op = "eq"
+    # eq/gt/...: скаляр; in: список; between: [from, to]; is_null/not_null: не передаётся
+    value: Any = None
+
+
+class QuerySort(BaseModel):
+    field: str
+    dir: Literal["asc", "desc"] = "desc"
+
+
+class QueryIn(BaseModel):
+    filters: list[QueryFilter] = Field(default_factory=list, max_length=QUERY_MAX_FILTERS)
+    sort: list[QuerySort] = Field(default_factory=list, max_length=QUERY_MAX_SORT_KEYS)
+    limit: int = Field(100, ge=1, le=QUERY_MAX_LIMIT)
+    cursor: str | None = None
+
+
+def _bad(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=detail)
+
+
+def _as_str(v: Any) -> str:
+    if not isinstance(v, str):
+        raise ValueError("expected string")
+    return v
+
+
+def _as_decimal(v: Any) -> Decimal:
+    if isinstance(v, bool) or not isinstance(v, (str, int, float)):
+        raise ValueError("expected number")
+    try:
+        d = Decimal(str(v))
+    except InvalidOperation:
+        raise ValueError("expected number")
+    if not d.is_finite():
+        raise ValueError("expected number")
+    return d
+
+
+def _as_datetime(v: Any) -> datetime:
+    if not isinstance(v, str):
+        raise ValueError("expected ISO 8601 datetime")
+    ts = datetime.fromisoformat(v)
+    # без зоны - считаем UTC (как и всё остальное API)
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    column: Any
+    coerce: Callable[[Any], Any]
+    ops: frozenset[str]
+    # сортировка только по NOT NULL колонкам: keyset-курсор сравнивает значения кортежем
+    sortable: bool = False
+
+
+@dataclass(frozen=True)
+class EntitySpec:
+    name: str
+    model: Any
+    id_field: str
+    fields: dict[str, FieldSpec]
+
+    @property
+    def id_column(self) -> Any:
+        return self.fields[self.id_field].column
+
+
+def _id(col: Any) -> FieldSpec:
+    return FieldSpec(col, _as_str, _EQ)
+
+
+def _ref(col: Any) -> FieldSpec:
+    return FieldSpec(col, _as_str, _EQ | _NULL)
+
+
+def _ts(col: Any) -> FieldSpec:
+    return FieldSpec(col, _as_datetime, _RANGE, sortable=True)
+
+
+ENTITIES: dict[str, EntitySpec] = {
+    "deal": EntitySpec(
+        "deal",
+        Deal,
+        "deal_id",
+        {
+            "deal_id": _id(Deal.deal_id),
+            "pipeline_id": _id(Deal.pipeline_id),
+            "stage_id": _id(Deal.stage_id),
+            "company_id": _ref(Deal.company_id),
+            "contact_id": _ref(Deal.contact_id),
+            "currency": FieldSpec(Deal.currency, lambda v: _as_str(v).strip().upper(), _EQ),
+            "amount": FieldSpec(Deal.amount, _as_decimal, _RANGE | _EQ | _NULL),
+            "title": FieldSpec(Deal.title, _as_str, frozenset({"eq"}), sortable=True),
+            "created_at": _ts(Deal.created_at),
+            "updated_at": _ts(Deal.updated_at),
+        },
+    ),
+    "contact": EntitySpec(
+        "contact",
+        Contact,
+        "contact_id",
+        {
+            "contact_id": _id(Contact.contact_id),
+            "external_id": _id(Contact.external_id),
+            "company_id": _ref(Contact.company_id),
+            "email": FieldSpec(Contact.email, _as_str, _EQ | _NULL),
+            "phone": FieldSpec(Contact.phone, _as_str, _EQ | _NULL),
+            "name": FieldSpec(Contact.name, _as_str, frozenset({"eq"}), sortable=True),
+            "created_at": _ts(Contact.created_at),
+            "updated_at": _ts(Contact.updated_at),
+        },
+    ),
+    "company": EntitySpec(
+        "company",
+        Company,
+        "company_id",
+        {
+            "company_id": _id(Company.company_id),
+            "external_id": _id(Company.external_id),
+            "domain": FieldSpec(Company.domain, _as_str, _EQ | _NULL),
+            "name": FieldSpec(Company.name, _as_str, frozenset({"eq"}), sortable=True),
+            "created_at": _ts(Company.created_at),
+            "updated_at": _ts(Company.updated_at),
+        },
+    ),
+}
+
+DEFAULT_SORT = (("created_at", "desc"),)
+
+# сущность, (поле, оператор)..., сортировка, есть ли курсор, SELECT-поля профиля доступа (None = все)
+ShapeKey = tuple[str, tuple[tuple[str, str], ...], tuple[tuple[str, str], ...], bool, tuple[str, ...] | None]
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    entity: EntitySpec
+    statement: Select
+    # (имя bind-параметра, FieldSpec, оператор) в порядке фильтров запроса
+    binds: tuple[tuple[str, FieldSpec, str], ...]
+    # сортировка + id последним ключом: курсор = значения этих полей у последней строки
+    sort: tuple[tuple[str, str], ...]
+
+
+def _predicate(col: Any, op: str, name: str) -> ColumnElement[bool]:
+    if op == "eq":
+        return col == bindparam(name)
+    if op == "in":
+        return col.in_(bindparam(name, expanding=True))
+    if op == "gt":
+        return col > bindparam(name)
+    if op == "gte":
+        return col >= bindparam(name)
+    if op == "lt":
+        return col < bindparam(name)
+    if op == "lte":
+        return col <= bindparam(name)
+    if op == "between":
+        return col.between(bindparam(f"{name}_lo"), bindparam(f"{name}_hi"))
+    if op == "is_null":
+        return col.is_(None)
+    return col.is_not(None)
+
+
+def _after_cursor(columns: list[Any], dirs: list[str]) -> ColumnElement[bool]:
+    """Rows strictly after the cursor row in (sort..., id) order."""
+    params = [bindparam(f"cur{i}") for i in range(len(columns))]
+    if len(set(dirs)) == 1:
+        # одно направление: row comparison, индекс (tenant_id, created_at, id) читается с позиции курсора
+        lhs, rhs = tuple_(*columns), tuple_(*params)
+        return lhs < rhs if dirs[0] == "desc" else lhs > rhs
+    # смешанные направления: (a < :a) OR (a = :a AND b > :b) OR ...
+    terms = []
+    for i, (col, d) in enumerate(zip(columns, dirs)):
+        prefix = [c == p for c, p in zip(columns[:i], params[:i])]
+        terms.append(and_(*prefix, col < params[i] if d == "desc" else col > params[i]))
+    return or_(*terms)
+
+
+def _compile(entity: EntitySpec, shape: ShapeKey) -> QueryPlan:
+    _name, filters, sort, with_cursor, fields = shape
+
+    binds: list[tuple[str, FieldSpec, str]] = []
+    where: list[ColumnElement[bool]] = [entity.model.tenant_id == bindparam("tenant_id")]
+    for i, (field, op) in enumerate(filters):
+        spec = entity.fields.get(field)
+        if spec is None:
+            raise _bad(f"Unknown field for {entity.name}: {field}")
+        if op not in spec.ops:
+            raise _bad(f"Operator {op} is not allowed for {entity.name}.{field}")
+        binds.append((f"f{i}", spec, op))
+        where.append(_predicate(spec.column, op, f"f{i}"))
+
+    for field, _dir in sort:
+        spec = entity.fields.get(field)
+        if spec is None or not spec.sortable:
+            raise _bad(f"Cannot sort {entity.name} by {field}")
+    if len({f for f, _ in sort}) != len(sort):
+        raise _bad("Duplicate sort field")
+
+    # id - последний ключ (уникальность порядка для курсора), в направлении последнего ключа
+    full_sort = tuple(sort) + ((entity.id_field, sort[-1][1]),)
+    columns = [entity.fields[f].column for f, _ in full_sort]
+    dirs = [d for _, d in full_sort]
+    if with_cursor:
+        where.append(_after_cursor(columns, dirs))
+
+    table = entity.model.__table__
+    if fields is None:
+        selected = list(table.c)
+    else:
+        # сначала поля профиля (их отдаёт сериализатор профиля), в хвосте - нужные курсору
+        selected = [table.c[f] for f in fields] + [table.c[f] for f, _ in full_sort if f not in fields]
+    q = (
+        select(*selected)
+        .where(*where)
+        .order_by(*(c.desc() if d == "desc" else c.asc() for c, d in zip(columns, dirs)))
+        .limit(bindparam("limit"))
+    )
+    return QueryPlan(entity, q, tuple(binds), full_sort)
+
+
+class QueryPlanCache:
+    """LRU: shape -> compiled QueryPlan. Invalid shapes are not cached (they raise)."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[ShapeKey, QueryPlan] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, entity: EntitySpec, shape: ShapeKey) -> QueryPlan:
+        plan = self._entries.get(shape)
+        if plan is not None:
+            self._entries.move_to_end(shape)
+            self.hits += 1
+            return plan
+        self.misses += 1
+        plan = _compile(entity, shape)
+        self._entries[shape] = plan
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return plan
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+query_plan_cache = QueryPlanCache(QUERY_PLAN_CACHE_SIZE)
+
+
+def _encode_cursor(values: list[Any]) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else str(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(plan: QueryPlan, cursor: str) -> dict[str, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(plan.sort):
+            raise ValueError
+        return {
+            f"cur{i}": plan.entity.fields[field].coerce(v) for i, ((field, _dir), v) in enumerate(zip(plan.sort, values))
+        }
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def _bind_values(plan: QueryPlan, filters: list[QueryFilter]) -> dict[str, Any]:
+    params: dict[str, Any] = {}
+    for (name, spec, op), f in zip(plan.binds, filters):
+        try:
+            if op in _NULL:
+                continue
+            if op == "in":
+                if not isinstance(f.value, list) or not 1 <= len(f.value) <= QUERY_MAX_IN_VALUES:
+                    raise ValueError(f"expected list of 1..{QUERY_MAX_IN_VALUES} values")
+                params[name] = [spec.coerce(v) for v in f.value]
+            elif op == "between":
+                if not isinstance(f.value, list) or len(f.value) != 2:
+                    raise ValueError("expected [from, to]")
+                params[f"{name}_lo"], params[f"{name}_hi"] = (spec.coerce(v) for v in f.value)
+            else:
+                if f.value is None:
+                    raise ValueError("value is required")
+                params[name] = spec.coerce(f.value)
+        except ValueError as e:
+            raise _bad(f"Invalid value for {plan.entity.name}.{f.field} ({f.op}): {e}")
+    return params
+
+
+def prepare(
+    entity_name: str, tenant_id: str, query: QueryIn, fields: tuple[str, ...] | None = None
+) -> tuple[QueryPlan, dict[str, Any]]:
+    """
+    Resolve the (cached) plan for the query shape and bind this request's values.
+    `fields`: columns allowed by the caller's access profile (see app/access_profiles.py).
+    """
+    entity = ENTITIES[entity_name]
+    if fields is not None:
+        # скрытое профилем поле нельзя и фильтровать/сортировать: иначе значение угадывается по выборке
+        hidden = {f.field for f in query.filters} | {s.field for s in query.sort}
+        hidden -= set(fields)
+        if hidden:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Fields not allowed by access profile: {', '.join(sorted(hidden))}",
+            )
+    shape: ShapeKey = (
+        entity.name,
+        tuple((f.field, f.op) for f in query.filters),
+        tuple((s.field, s.dir) for s in query.sort) or DEFAULT_SORT,
+        query.cursor is not None,
+        fields,
+    )
+    plan = query_plan_cache.get(entity, shape)
+
+    params = _bind_values(plan, query.filters)
+    if query.cursor is not None:
+        params.update(_decode_cursor(plan, query.cursor))
+    params["tenant_id"] = tenant_id
+    # +1 строка: есть ли следующая страница
+    params["limit"] = query.limit + 1
+    return plan, params
+
+
+def next_cursor(plan: QueryPlan, rows: list[Any], limit: int) -> str | None:
+    if len(rows) <= limit:
+        return None
+    last = rows[limit - 1]
+    return _encode_cursor([getattr(last, field) for field, _dir in plan.sort])
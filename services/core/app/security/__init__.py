@@ -0,0 +1,355 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import TypeVar
+from uuid import uuid4
+
+from fastapi import HTTPException, Request, status
+from passlib.context import CryptContext
+from passlib.hash import bcrypt as bcrypt_hash
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import pubsub
+from app.db import SessionLocal
+from app.models import Session, User
+from app.security import denylist
+from app.security.jwt_tokens import decode_token, issue_token
+from app.session_cache import AUTH_INVALIDATION_CHANNEL, session_cache, token_key
+from app.settings import settings
+
+T = TypeVar("T")
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    try:
+        return pwd_context.verify(password, password_hash)
+    except Exception:
+        return False
+
+
+def password_needs_rehash(password_hash: str) -> bool:
+    try:
+        return pwd_context.needs_update(password_hash)
+    except Exception:
+        return False
+
+
+# результат калибровки; отдаётся в /metrics/auth
+bcrypt_calibration: dict[str, object] = {}
+
+
+def _measure_verify_ms(rounds: int, samples: int = 2) -> float:
+    h = bcrypt_hash.using(rounds=rounds).hash("calibration")
+    best = math.inf
+    for _ in range(samples):
+        started = time.perf_counter()
+        bcrypt_hash.verify("calibration", h)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def calibrate_bcrypt(target_ms: float, min_rounds: int, max_rounds: int) -> tuple[int, dict[int, float]]:
+    """
+    Pick the bcrypt cost whose verify time on this machine is closest to target_ms.
+    Each extra round doubles the cost, so we walk up from min_rounds and stop
+    as soon as we pass the target.
+    """
+    timings: dict[int, float] = {}
+    rounds = min_rounds
+    while True:
+        timings[rounds] = _measure_verify_ms(rounds)
+        if timings[rounds] >= target_ms or rounds >= max_rounds:
+            break
+        rounds += 1
+    best = min(timings, key=lambda r: abs(math.log(timings[r] / target_ms)))
+    return best, timings
+
+
+def accepted_bcrypt_rounds(rounds: int) -> tuple[int, int]:
+    # bcrypt: cost в [4, 31]
+    tol = max(0, settings.bcrypt_rounds_tolerance)
+    return max(4, rounds - tol), min(31, rounds + tol)
+
+
+def apply_bcrypt_rounds(rounds: int) -> None:
+    # хэши вне [rounds - tol, rounds + tol] считаются off-target -> needs_update() -> rehash на логине.
+    # Допуск нужен, чтобы воркеры с чуть разной калибровкой не перехэшировали друг за другом.
+    min_rounds, max_rounds = accepted_bcrypt_rounds(rounds)
+    pwd_context.update(
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=min_rounds,
+        bcrypt__max_rounds=max_rounds,
+    )
+
+
+class PasswordPool:
+    """
+    Dedicated, size-limited thread pool for bcrypt.
+    bcrypt releases the GIL, so hashing here does not stall the event loop.
+    When workers + queue are all busy we fail fast with 503 instead of piling up.
+    """
+
+    def __init__(self, workers: int, max_queue: int) -> None:
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._inflight = 0
+
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0
+        self.rehashed = 0
+
+    async def run(self, fn: Callable[..., T], *args: object) -> T:
+        # счётчик меняется только из event loop, лок не нужен
+        if self._inflight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication is busy, retry later",
+                headers={"Retry-After": "1"},
+            )
+        self._inflight += 1
+        started = time.perf_counter()
+        try:
+            result = await self.submit(fn, *args)
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self._inflight -= 1
+        # avg_ms - только по успешным прогонам
+        self.completed += 1
+        self.busy_seconds += time.perf_counter() - started
+        return result
+
+    async def submit(self, fn: Callable[..., T], *args: object) -> T:
+        """Run on the pool's threads without admission control or accounting (startup work)."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "inflight": self._inflight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "avg_ms": round(self.busy_seconds * 1000 / self.completed, 2) if self.completed else None,
+        }
+
+
+password_pool = PasswordPool(settings.password_pool_workers, settings.password_pool_max_queue)
+
+
+async def hash_password_async(password: str) -> str:
+    return await password_pool.run(hash_password, password)
+
+
+async def verify_password_async(password: str, password_hash: str) -> bool:
+    return await password_pool.run(verify_password, password, password_hash)
+
+
+async def calibrate_password_hashing() -> None:
+    """Startup step: fix the bcrypt cost for this process (BCRYPT_ROUNDS or calibration)."""
+    started = time.perf_counter()
+    if settings.bcrypt_rounds > 0:
+        rounds, timings = settings.bcrypt_rounds, {}
+        source = "config"
+    else:
+        rounds, timings = await password_pool.submit(
+            calibrate_bcrypt,
+            settings.bcrypt_target_ms,
+            settings.bcrypt_min_rounds,
+            settings.bcrypt_max_rounds,
+        )
+        source = "calibrated"
+    apply_bcrypt_rounds(rounds)
+
+    bcrypt_calibration.clear()
+    bcrypt_calibration.update(
+        {
+            "rounds": rounds,
+            "source": source,
+            "target_ms": settings.bcrypt_target_ms,
+            "accepted_rounds": list(accepted_bcrypt_rounds(rounds)),
+            "verify_ms_by_rounds": {str(r): round(ms, 1) for r, ms in sorted(timings.items())},
+            "calibration_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+    )
+
+
+SESSION_TOKEN_PREFIX = "tok_"
+SESSION_TTL_HOURS = 12
+
+
+def new_token() -> str:
+    return f"{SESSION_TOKEN_PREFIX}{uuid4().hex}"
+
+
+def now_utc() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass(frozen=True)
+class AuthUser:
+    # detached snapshot of the authenticated user; safe to share between requests
+    user_id: str
+    tenant_id: str
+    email: str
+    role: str
+    access_profile_id: str | None = None
+
+
+def bearer_token(request: Request) -> str:
+    auth = request.headers.get("Authorization", "")
+    if not auth.startswith("Bearer "):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing bearer token")
+    return auth.removeprefix("Bearer ").strip()
+
+
+def is_jwt(token: str) -> bool:
+    # в jwt-режиме старые tok_ сессии продолжают работать до истечения;
+    # в session-режиме JWT не принимаем вообще
+    return settings.auth_mode == "jwt" and not token.startswith(SESSION_TOKEN_PREFIX)
+
+
+def _decode_jwt(token: str) -> dict:
+    try:
+        claims = decode_token(token)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    if not claims.get("tenant_id") or not claims.get("sub") or not claims.get("jti"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    return claims
+
+
+def _require_jwt_user(token: str) -> tuple[str, AuthUser]:
+    # fast path: подпись + exp проверяются локально, отзыв - по in-process denylist
+    claims = _decode_jwt(token)
+    issued_at = claims["iat_ms"] / 1000 if "iat_ms" in claims else float(claims.get("iat", 0))
+    if denylist.is_revoked(claims["jti"], claims["sub"], issued_at):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+    user = AuthUser(
+        user_id=claims["sub"],
+        tenant_id=claims["tenant_id"],
+        email=claims.get("email", ""),
+        role=claims.get("role", ""),
+        access_profile_id=claims.get("apid"),
+    )
+    return user.tenant_id, user
+
+
+async def require_bearer_user(db: AsyncSession, request: Request) -> tuple[str, AuthUser]:
+    token = bearer_token(request)
+    if is_jwt(token):
+        return _require_jwt_user(token)
+
+    key = token_key(token)
+
+    cached = session_cache.get(key)
+    if cached is not None:
+        return cached.tenant_id, cached
+
+    q = select(Session, User).join(User, User.user_id == Session.user_id).where(Session.token == token)
+    if db.info.get("replica"):
+        # сессии всегда читаем с primary: lag реплики не должен "воскрешать" отозванный токен
+        async with SessionLocal() as primary:
+            row = (await primary.execute(q)).first()
+    else:
+        row = (await db.execute(q)).first()
+    if not row:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+    sess, user = row
+    if sess.revoked_at is not None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+    if sess.expires_at <= now_utc():
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User disabled")
+
+    auth_user = AuthUser(
+        user_id=user.user_id,
+        tenant_id=sess.tenant_id,
+        email=user.email,
+        role=user.role,
+        access_profile_id=user.access_profile_id,
+    )
+    session_cache.put(key, user.user_id, auth_user, (sess.expires_at - now_utc()).total_seconds())
+    return sess.tenant_id, auth_user
+
+
+def require_admin(user: AuthUser) -> None:
+    if user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
+
+
+async def invalidate_session(token: str) -> None:
+    # drop from this worker immediately, then fan out to the other workers
+    await pubsub.publish(AUTH_INVALIDATION_CHANNEL, {"key": token_key(token)})
+
+
+async def revoke_jwt(token: str) -> None:
+    claims = _decode_jwt(token)
+    await denylist.revoke_jti(claims["jti"], float(claims["exp"]))
+
+
+async def invalidate_user_sessions(user_id: str) -> None:
+    await pubsub.publish(AUTH_INVALIDATION_CHANNEL, {"user_id": user_id})
+    await denylist.revoke_user(user_id)
+
+
+async def deactivate_user(db: AsyncSession, tenant_id: str, user_id: str) -> bool:
+    """Disable the user and drop their cached sessions / revoke their JWTs. False = no such user in the tenant."""
+    result = await db.execute(
+        update(User).where(User.tenant_id == tenant_id, User.user_id == user_id).values(is_active=False)
+    )
+    if result.rowcount == 0:
+        return False
+    await db.commit()
+    await invalidate_user_sessions(user_id)
+    return True
+
+
+async def create_session(db: AsyncSession, tenant_id: str, user: User, request: Request, ttl_hours: int = SESSION_TTL_HOURS) -> str:
+    token = new_token()
+    ip = request.client.host if request.client else ""
+    ua = request.headers.get("User-Agent", "")
+
+    sess = Session(
+        token=token,
+        tenant_id=tenant_id,
+        user_id=user.user_id,
+        expires_at=now_utc() + timedelta(hours=ttl_hours),
+        ip=ip,
+        user_agent=ua,
+    )
+    db.add(sess)
+    await db.commit()
+    return token
+
+
+def create_jwt(tenant_id: str, user: User) -> str:
+    return issue_token(
+        tenant_id=tenant_id,
+        user_id=user.user_id,
+        email=user.email,
+        role=user.role,
+        access_profile_id=user.access_profile_id,
+    )
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any
+
+from .. import pubsub
+from ..settings import settings
+
+log = logging.getLogger(__name__)
+
+# JWT revocation denylist.
+# Redis держит компактный список (ключ на jti / на user, TTL = остаток жизни токена),
+# каждый воркер держит in-process копию, поэтому проверка токена не ходит ни в БД, ни в Redis.
+
+JWT_REVOKE_CHANNEL = "nextcrm:jwt:revoke"
+_KEY_PREFIX = "nextcrm:jwt:deny:"
+
+# jti -> exp (epoch seconds)
+_revoked_jti: dict[str, float] = {}
+# user_id -> cutoff (epoch seconds, float): токены, выданные не позже cutoff, отозваны
+# (logout everywhere / deactivation); время выдачи - claim iat_ms, у старых токенов - iat
+_user_cutoff: dict[str, float] = {}
+
+
+def is_revoked(jti: str, user_id: str, issued_at: float) -> bool:
+    if jti in _revoked_jti:
+        return True
+    cutoff = _user_cutoff.get(user_id)
+    return cutoff is not None and issued_at <= cutoff
+
+
+def _purge(now: float) -> None:
+    for jti in [k for k, exp in _revoked_jti.items() if exp <= now]:
+        del _revoked_jti[jti]
+    horizon = now - settings.jwt_ttl_seconds
+    for user_id in [k for k, cutoff in _user_cutoff.items() if cutoff <= horizon]:
+        del _user_cutoff[user_id]
+
+
+def _apply(message: dict[str, Any]) -> None:
+    now = time.time()
+    if message.get("jti"):
+        _revoked_jti[message["jti"]] = float(message["exp"])
+    if message.get("user_id"):
+        cutoff = float(message["cutoff"])
+        _user_cutoff[message["user_id"]] = max(cutoff, _user_cutoff.get(message["user_id"], 0.0))
+    _purge(now)
+
+
+async def revoke_jti(jti: str, exp: float) -> None:
+    ttl = int(exp - time.time()) + 1
+    if ttl <= 0:
+        return
+    try:
+        await pubsub.get_redis().set(f"{_KEY_PREFIX}jti:{jti}", str(exp), ex=ttl)
+    except Exception:
+        log.warning("denylist: redis write failed for jti")
+    await pubsub.publish(JWT_REVOKE_CHANNEL, {"jti": jti, "exp": exp})
+
+
+async def revoke_user(user_id: str) -> None:
+    cutoff = time.time()
+    try:
+        await pubsub.get_redis().set(
+            f"{_KEY_PREFIX}user:{user_id}", str(cutoff), ex=int(settings.jwt_ttl_seconds) + 1
+        )
+    except Exception:
+        log.warning("denylist: redis write failed for user")
+    await pubsub.publish(JWT_REVOKE_CHANNEL, {"user_id": user_id, "cutoff": cutoff})
+
+
+async def load() -> None:
+    """Warm the in-process copy from Redis (startup / after a pub/sub reconnect)."""
+    r = pubsub.get_redis()
+    try:
+        async for key in r.scan_iter(match=f"{_KEY_PREFIX}*", count=1000):
+            value = await r.get(key)
+            if value is None:
+                continue
+            kind, _, ident = key.removeprefix(_KEY_PREFIX).partition(":")
+            if kind == "jti":
+                _apply({"jti": ident, "exp": value})
+            elif kind == "user":
+                _apply({"user_id": ident, "cutoff": value})
+    except Exception:
+        log.warning("denylist: initial load from redis failed")
+
+
+# ссылки на фоновые load(): без них event loop держит задачу слабо и GC может её собрать
+_pending: set[asyncio.Task] = set()
+
+
+def _reload() -> None:
+    # сообщения, пропущенные во время дисконнекта, подтягиваем из Redis;
+    # локальную копию не чистим - отзыв никогда не должен "откатываться"
+    task = asyncio.get_running_loop().create_task(load())
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+pubsub.subscribe(JWT_REVOKE_CHANNEL, _apply, reset=_reload)
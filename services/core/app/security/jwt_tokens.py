@@ -2,23 +2,33 @@ from __future__ import annotations
 
 import time
 from typing import Any
+from uuid import uuid4
 
-import jwt
+from jose import jwt
 
 from ..settings import settings
 
 
-def issue_token(*, tenant_id: str, user_id: str, email: str) -> str:
-    now = int(time.time())
+def issue_token(*, tenant_id: str, user_id: str, email: str, role: str, access_profile_id: str | None = None) -> str:
+    issued_ms = time.time_ns() // 1_000_000
+    now = issued_ms // 1000
     payload: dict[str, Any] = {
         "iss": settings.jwt_issuer,
         "aud": settings.jwt_audience,
         "iat": now,
+        # iat - целые секунды; для сравнения с cutoff отзыва нужна точность в мс
+        # (иначе повторный логин в ту же секунду, что и revoke_user, считается отозванным)
+        "iat_ms": issued_ms,
         "exp": now + int(settings.jwt_ttl_seconds),
+        "jti": uuid4().hex,
         "tenant_id": tenant_id,
         "sub": user_id,
         "email": email,
+        "role": role,
     }
+    if access_profile_id:
+        # профиль полей едет в токене: fast path не ходит в БД за users.access_profile_id
+        payload["apid"] = access_profile_id
     return jwt.encode(payload, settings.jwt_secret, algorithm="HS256")
 
 
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Generic, TypeVar
+
+from app import pubsub
+from app.settings import settings
+
+AUTH_INVALIDATION_CHANNEL = "nextcrm:auth:invalidate"
+
+V = TypeVar("V")
+
+
+def token_key(token: str) -> str:
+    # в кэше и на pub/sub канале держим только хэш токена, не сам токен
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class SessionCache(Generic[V]):
+    """
+    Bounded TTL/LRU cache of validated sessions, keyed by token hash.
+    Per-process: cross-worker drops go through the pub/sub channel.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # key -> (deadline (monotonic), user_id, value)
+        self._entries: OrderedDict[str, tuple[float, str, V]] = OrderedDict()
+        self._by_user: dict[str, set[str]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> V | None:
+        item = self._entries.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        deadline, _user_id, value = item
+        if deadline <= time.monotonic():
+            self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, user_id: str, value: V, ttl_seconds: float) -> None:
+        # ttl_seconds = время до expires_at сессии; кэш никогда не переживает сессию
+        ttl = min(float(self.ttl_seconds), ttl_seconds)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        self._drop(key)
+        self._entries[key] = (time.monotonic() + ttl, user_id, value)
+        self._by_user.setdefault(user_id, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def drop_key(self, key: str) -> None:
+        if self._drop(key):
+            self.invalidations += 1
+
+    def drop_user(self, user_id: str) -> None:
+        for key in list(self._by_user.get(user_id, ())):
+            self.drop_key(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_user.clear()
+
+    def _drop(self, key: str) -> bool:
+        item = self._entries.pop(key, None)
+        if item is None:
+            return False
+        keys = self._by_user.get(item[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[item[1]]
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+session_cache: SessionCache[Any] = SessionCache(
+    max_entries=settings.auth_cache_max_entries,
+    ttl_seconds=settings.auth_cache_ttl_seconds,
+)
+
+
+def _on_invalidate(message: dict[str, Any]) -> None:
+    if message.get("key"):
+        session_cache.drop_key(message["key"])
+    if message.get("user_id"):
+        session_cache.drop_user(message["user_id"])
+
+
+pubsub.subscribe(AUTH_INVALIDATION_CHANNEL, _on_invalidate, reset=session_cache.clear)
@@ -21,11 +21,62 @@ class Settings:
     pg_user: str
     pg_password: str
 
+    # optional streaming replica for read-only handlers ("" -> reads stay on primary)
+    pg_replica_host: str
+    pg_replica_port: int
+    # after a write by a token, its reads stick to the primary for this many seconds
+    read_your_writes_seconds: float
+
+    # async engine pool (per uvicorn worker): max conns = pool_size + max_overflow
+    db_pool_size: int
+    db_max_overflow: int
+    db_pool_timeout: float
+    db_pool_recycle: int
+    # "pre_ping": SELECT 1 on every checkout; "optimistic": rely on recycle + disconnect invalidation
+    db_pool_ping: str
+
+    redis_url: str
+
+    # "session": opaque tok_ tokens checked against the sessions table
+    # "jwt": short-lived signed JWT verified locally (+ revocation denylist)
+    auth_mode: str
+    jwt_secret: str
+    jwt_issuer: str
+    jwt_audience: str
+    jwt_ttl_seconds: int
+
+    # In-process cache of validated bearer sessions (per uvicorn worker)
+    auth_cache_ttl_seconds: int
+    auth_cache_max_entries: int
+
+    # bcrypt runs off the event loop in a dedicated pool; beyond workers+queue -> 503
+    password_pool_workers: int
+    password_pool_max_queue: int
+
+    # bcrypt cost: 0 -> calibrate at startup to hit bcrypt_target_ms per verify
+    bcrypt_rounds: int
+    bcrypt_target_ms: int
+    bcrypt_min_rounds: int
+    bcrypt_max_rounds: int
+    bcrypt_rounds_tolerance: int
+
+    # GET /search: statement_timeout for the search query; past it -> empty result with timed_out
+    search_budget_ms: int
+
+    # list endpoints: serialize row tuples with orjson instead of response_model validation (same JSON/OpenAPI)
+    fast_json_lists: bool
+
     @property
     def database_url(self) -> str:
         # SQLAlchemy async DSN
         return f"postgresql+asyncpg://{self.pg_user}:{self.pg_password}@{self.pg_host}:{self.pg_port}/{self.pg_db}"
 
+    @property
+    def replica_database_url(self) -> str | None:
+        if not self.pg_replica_host:
+            return None
+        return f"postgresql+asyncpg://{self.pg_user}:{self.pg_password}@{self.pg_replica_host}:{self.pg_replica_port}/{self.pg_db}"
+
 
 def get_settings() -> Settings:
     # Prefer APP_ENV, fallback to ENV (fix drift)
@@ -40,6 +91,46 @@ def get_settings() -> Settings:
     pg_user = _env("POSTGRES_USER", "nextcrm")
     pg_password = _env("POSTGRES_PASSWORD", "nextcrm")
 
+    pg_replica_host = _env("POSTGRES_REPLICA_HOST", "")
+    pg_replica_port = int(_env("POSTGRES_REPLICA_PORT", str(pg_port)))
+    read_your_writes_seconds = float(_env("READ_YOUR_WRITES_SECONDS", "5"))
+
+    db_pool_size = int(_env("DB_POOL_SIZE", "10"))
+    db_max_overflow = int(_env("DB_MAX_OVERFLOW", "10"))
+    db_pool_timeout = float(_env("DB_POOL_TIMEOUT", "30"))
+    db_pool_recycle = int(_env("DB_POOL_RECYCLE", "1800"))
+    db_pool_ping = _env("DB_POOL_PING", "pre_ping").lower()
+    if db_pool_ping not in ("pre_ping", "optimistic"):
+        raise RuntimeError(f"DB_POOL_PING must be 'pre_ping' or 'optimistic', got {db_pool_ping!r}")
+
+    redis_url = _env("REDIS_URL", "redis://redis:6379/0")
+
+    auth_mode = _env("AUTH_MODE", "session").lower()
+    if auth_mode not in ("session", "jwt"):
+        raise RuntimeError(f"AUTH_MODE must be 'session' or 'jwt', got {auth_mode!r}")
+    jwt_secret = _env("JWT_SECRET", "dev-insecure-jwt-secret" if env == "dev" else "")
+    if auth_mode == "jwt" and not jwt_secret:
+        raise RuntimeError("JWT_SECRET is required when AUTH_MODE=jwt")
+    jwt_issuer = _env("JWT_ISSUER", "nextcrm-core")
+    jwt_audience = _env("JWT_AUDIENCE", "nextcrm-api")
+    jwt_ttl_seconds = int(_env("JWT_TTL_SECONDS", "900"))
+
+    auth_cache_ttl_seconds = int(_env("AUTH_CACHE_TTL_SECONDS", "30"))
+    auth_cache_max_entries = int(_env("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+    password_pool_workers = int(_env("PASSWORD_POOL_WORKERS", "2"))
+    password_pool_max_queue = int(_env("PASSWORD_POOL_MAX_QUEUE", "16"))
+
+    bcrypt_rounds = int(_env("BCRYPT_ROUNDS", "0"))
+    bcrypt_target_ms = int(_env("BCRYPT_TARGET_MS", "250"))
+    bcrypt_min_rounds = int(_env("BCRYPT_MIN_ROUNDS", "10"))
+    bcrypt_max_rounds = int(_env("BCRYPT_MAX_ROUNDS", "15"))
+    bcrypt_rounds_tolerance = int(_env("BCRYPT_ROUNDS_TOLERANCE", "1"))
+
+    search_budget_ms = int(_env("SEARCH_BUDGET_MS", "150"))
+
+    fast_json_lists = _env("FAST_JSON_LISTS", "0").lower() in ("1", "true", "yes", "on")
+
     return Settings(
         env=env,
         log_mode=log_mode,
@@ -49,6 +140,31 @@ def get_settings() -> Settings:
         pg_db=pg_db,
         pg_user=pg_user,
         pg_password=pg_password,
+        pg_replica_host=pg_replica_host,
+        pg_replica_port=pg_replica_port,
+        read_your_writes_seconds=read_your_writes_seconds,
+        db_pool_size=db_pool_size,
+        db_max_overflow=db_max_overflow,
+        db_pool_timeout=db_pool_timeout,
+        db_pool_recycle=db_pool_recycle,
+        db_pool_ping=db_pool_ping,
+        redis_url=redis_url,
+        auth_mode=auth_mode,
+        jwt_secret=jwt_secret,
+        jwt_issuer=jwt_issuer,
+        jwt_audience=jwt_audience,
+        jwt_ttl_seconds=jwt_ttl_seconds,
+        auth_cache_ttl_seconds=auth_cache_ttl_seconds,
+        auth_cache_max_entries=auth_cache_max_entries,
+        password_pool_workers=password_pool_workers,
+        password_pool_max_queue=password_pool_max_queue,
+        bcrypt_rounds=bcrypt_rounds,
+        bcrypt_target_ms=bcrypt_target_ms,
+        bcrypt_min_rounds=bcrypt_min_rounds,
+        bcrypt_max_rounds=bcrypt_max_rounds,
+        bcrypt_rounds_tolerance=bcrypt_rounds_tolerance,
+        search_budget_ms=search_budget_ms,
+        fast_json_lists=fast_json_lists,
     )
 
 
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import StageStat
+
+# Инкрементальные агрегаты по стадиям: stage_stats (tenant, pipeline, stage, currency) -> count, sum.
+# Каждая запись в deals применяет дельты в ТОЙ ЖЕ транзакции; runner (stage_stats_reconcile)
+# пересчитывает тенанта целиком и чинит дрейф.
+#
+# Shared advisory lock hashtextextended('stage_stats:' || tenant_id, 0) держится до commit;
+# reconcile берёт тот же ключ эксклюзивно, поэтому он не видит "сделку без дельты"
+# и не затирает дельты, закоммиченные после его снапшота.
+
+_CENT = Decimal("0.01")
+
+StatKey = tuple[str, str, str]  # pipeline_id, stage_id, currency
+
+
+class StageStatDeltas:
+    def __init__(self) -> None:
+        self._d: dict[StatKey, list] = defaultdict(lambda: [0, Decimal(0)])
+
+    def add(self, pipeline_id: str, stage_id: str, currency: str, amount: Decimal | None, sign: int = 1) -> None:
+        acc = self._d[(pipeline_id, stage_id, currency)]
+        acc[0] += sign
+        if amount is not None:
+            # как numeric(12,2) в deals.amount: сумма дельт = сумма сохранённых значений
+            acc[1] += sign * amount.quantize(_CENT, rounding=ROUND_HALF_UP)
+
+    def move(
+        self,
+        old: tuple[str, str, str, Decimal | None],
+        new: tuple[str, str, str, Decimal | None],
+    ) -> None:
+        """old/new: (pipeline_id, stage_id, currency, amount) of one deal before/after a change."""
+        if old == new:
+            return
+        self.add(*old, sign=-1)
+        self.add(*new)
+
+    def items(self) -> list[tuple[StatKey, int, Decimal]]:
+        # фиксированный порядок ключей: две транзакции не возьмут строки stage_stats крест-накрест
+        return [(k, c, a) for k, (c, a) in sorted(self._d.items()) if c or a]
+
+
+async def apply_deltas(db: AsyncSession, tenant_id: str, deltas: StageStatDeltas) -> None:
+    """Upsert deltas into stage_stats. Call inside the transaction that changed the deals, before commit."""
+    items = deltas.items()
+    if not items:
+        return
+
+    await db.execute(select(func.pg_advisory_xact_lock_shared(func.hashtextextended("stage_stats:" + tenant_id, 0))))
+
+    stmt = pg_insert(StageStat).values(
+        [
+            {
+                "tenant_id": tenant_id,
+                "pipeline_id": pipeline_id,
+                "stage_id": stage_id,
+                "currency": currency,
+                "deal_count": count,
+                "amount_sum": amount,
+            }
+            for (pipeline_id, stage_id, currency), count, amount in items
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[StageStat.tenant_id, StageStat.pipeline_id, StageStat.stage_id, StageStat.currency],
+        set_={
+            "deal_count": StageStat.deal_count + stmt.excluded.deal_count,
+            "amount_sum": StageStat.amount_sum + stmt.excluded.amount_sum,
+            "updated_at": func.now(),
+        },
+    )
+    await db.execute(stmt)
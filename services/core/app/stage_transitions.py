@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlalchemy import DateTime, String, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# deal_stage_transitions: append-only история смен стадий.
+# Пишется в той же транзакции, что и смена stage_id; rollup в funnel_daily делает runner.
+
+
+class Transition(NamedTuple):
+    deal_id: str
+    pipeline_id: str
+    from_stage_id: str | None  # None = сделка создана
+    to_stage_id: str
+    deal_created_at: datetime
+
+
+# seconds_in_from_stage: от предыдущего перехода сделки (или её создания) до now();
+# предыдущий переход - один index lookup по ix_dst_tenant_deal
+_INSERT_SQL = text(
+    """
+    INSERT INTO deal_stage_transitions
+        (tenant_id, deal_id, pipeline_id, from_stage_id, to_stage_id, transitioned_at, seconds_in_from_stage)
+    SELECT
+        :tenant_id, v.deal_id, v.pipeline_id, v.from_stage_id, v.to_stage_id, now(),
+        CASE WHEN v.from_stage_id IS NULL THEN NULL ELSE extract(epoch FROM now() - coalesce(
+            (SELECT max(x.transitioned_at) FROM deal_stage_transitions x
+             WHERE x.tenant_id = :tenant_id AND x.deal_id = v.deal_id),
+            v.created_at
+        )) END
+    FROM unnest(:deal_ids, :pipeline_ids, :from_stage_ids, :to_stage_ids, :created_ats)
+        AS v(deal_id, pipeline_id, from_stage_id, to_stage_id, created_at)
+    """
+).bindparams(
+    bindparam("deal_ids", type_=ARRAY(String)),
+    bindparam("pipeline_ids", type_=ARRAY(String)),
+    bindparam("from_stage_ids", type_=ARRAY(String)),
+    bindparam("to_stage_ids", type_=ARRAY(String)),
+    bindparam("created_ats", type_=ARRAY(DateTime(timezone=True))),
+)
+
+
+async def record_transitions(db: AsyncSession, tenant_id: str, transitions: list[Transition]) -> None:
+    """One INSERT for any number of transitions. Call before commit of the stage change."""
+    if not transitions:
+        return
+    await db.execute(
+        _INSERT_SQL,
+        {
+            "tenant_id": tenant_id,
+            "deal_ids": [t.deal_id for t in transitions],
+            "pipeline_ids": [t.pipeline_id for t in transitions],
+            "from_stage_ids": [t.from_stage_id for t in transitions],
+            "to_stage_ids": [t.to_stage_id for t in transitions],
+            "created_ats": [t.deal_created_at for t in transitions],
+        },
+    )
@@ -0,0 +1,22 @@
+import os
+
+import psycopg
+
+PG_HOST = os.getenv("POSTGRES_HOST", "postgres")
+PG_PORT = int(os.getenv("POSTGRES_PORT", "5432"))
+PG_DB = os.getenv("POSTGRES_DB", "nextcrm")
+PG_USER = os.getenv("POSTGRES_USER", "nextcrm")
+PG_PASSWORD = os.getenv("POSTGRES_PASSWORD", "nextcrm")
+
+
+def connect() -> psycopg.Connection:
+    # autocommit: каждая пачка джобы - своя короткая транзакция
+    return psycopg.connect(
+        host=PG_HOST,
+        port=PG_PORT,
+        dbname=PG_DB,
+        user=PG_USER,
+        password=PG_PASSWORD,
+        autocommit=True,
+    )
+# END_FILE
@@ -0,0 +1,72 @@
+import psycopg
+
+# dedup_scan: кластеры дублей контактов/компаний по blocking-ключам, без попарных сравнений.
+# Один GROUP BY на тенанта (hash agg по ix_*_tenant_id), результат - upsert в duplicate_candidates.
+#   contact/email  - lower(trim(email))
+#   contact/phone  - только цифры, >= 7
+#   company/domain - lower, без схемы, www., пути и завершающей точки
+
+MIN_PHONE_DIGITS = 7
+
+_CLUSTERS_SQL = """
+CREATE TEMP TABLE dedup_clusters ON COMMIT DROP AS
+WITH keys AS (
+    SELECT 'contact' AS entity, 'email' AS key_type, lower(btrim(email)) AS block_key, contact_id AS record_id
+    FROM contacts
+    WHERE tenant_id = %(tenant_id)s AND btrim(coalesce(email, '')) <> ''
+    UNION ALL
+    SELECT 'contact', 'phone', regexp_replace(phone, '[^0-9]', '', 'g'), contact_id
+    FROM contacts
+    WHERE tenant_id = %(tenant_id)s AND length(regexp_replace(coalesce(phone, ''), '[^0-9]', '', 'g')) >= %(min_phone)s
+    UNION ALL
+    SELECT 'company', 'domain',
+           regexp_replace(regexp_replace(lower(btrim(domain)), '^[a-z][a-z0-9+.-]*://', ''), '^www\\.|[/?#:].*$|\\.$', '', 'g'),
+           company_id
+    FROM companies
+    WHERE tenant_id = %(tenant_id)s AND btrim(coalesce(domain, '')) <> ''
+)
+SELECT entity, key_type, block_key, array_agg(record_id ORDER BY record_id) AS record_ids
+FROM keys
+WHERE block_key <> ''
+GROUP BY entity, key_type, block_key
+HAVING count(*) > 1
+"""
+
+# dismissed остаётся dismissed, пока состав кластера не поменялся
+_UPSERT_SQL = """
+INSERT INTO duplicate_candidates (tenant_id, entity, key_type, block_key, record_ids, size)
+SELECT %(tenant_id)s, entity, key_type, block_key, record_ids, cardinality(record_ids)
+FROM dedup_clusters
+ON CONFLICT (tenant_id, entity, key_type, block_key) DO UPDATE
+SET record_ids = excluded.record_ids,
+    size = excluded.size,
+    status = 'open',
+    detected_at = now(),
+    resolved_at = NULL
+WHERE duplicate_candidates.record_ids IS DISTINCT FROM excluded.record_ids
+   OR duplicate_candidates.status IN ('merged', 'gone')
+"""
+
+_GONE_SQL = """
+UPDATE duplicate_candidates dc
+SET status = 'gone', resolved_at = now()
+WHERE dc.tenant_id = %(tenant_id)s
+  AND dc.status IN ('open', 'dismissed')
+  AND NOT EXISTS (
+      SELECT 1 FROM dedup_clusters c
+      WHERE c.entity = dc.entity AND c.key_type = dc.key_type AND c.block_key = dc.block_key
+  )
+"""
+
+
+def dedup_scan(conn: psycopg.Connection) -> dict:
+    tenants = [r[0] for r in conn.execute("SELECT tenant_id FROM tenants ORDER BY tenant_id").fetchall()]
+    clusters = upserted = gone = 0
+    for tenant_id in tenants:
+        params = {"tenant_id": tenant_id, "min_phone": MIN_PHONE_DIGITS}
+        # транзакция на тенанта: temp table живёт до commit, локов на contacts/companies не берём
+        with conn.transaction():
+            clusters += conn.execute(_CLUSTERS_SQL, params).rowcount
+            upserted += conn.execute(_UPSERT_SQL, params).rowcount
+            gone += conn.execute(_GONE_SQL, params).rowcount
+    return {"tenants": len(tenants), "clusters": clusters, "upserted": upserted, "gone": gone}
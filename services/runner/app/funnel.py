@@ -0,0 +1,68 @@
+import psycopg
+
+# funnel_rollup: deal_stage_transitions -> funnel_daily (tenant, pipeline, UTC day, stage).
+# Инкрементально: берём переходы с txid в [last_xid, xmin текущего снапшота) - все они уже
+# закоммичены (или откачены), более поздние попадут в следующий прогон. Затронутые
+# (tenant, pipeline, day) пересчитываем целиком из transitions, остальные дни не трогаем.
+
+_TOUCHED_SQL = """
+CREATE TEMP TABLE funnel_touched ON COMMIT DROP AS
+SELECT DISTINCT tenant_id, pipeline_id, (transitioned_at AT TIME ZONE 'UTC')::date AS day
+FROM deal_stage_transitions
+WHERE txid >= %(lo)s::xid8 AND txid < %(hi)s::xid8
+"""
+
+_CLEAR_SQL = """
+DELETE FROM funnel_daily f
+USING funnel_touched t
+WHERE f.tenant_id = t.tenant_id AND f.pipeline_id = t.pipeline_id AND f.day = t.day
+"""
+
+# entered/won/lost - по to_stage_id, exited и время в стадии - по from_stage_id
+_ROLLUP_SQL = """
+WITH tr AS (
+    SELECT x.tenant_id, x.pipeline_id, t.day, x.from_stage_id, x.to_stage_id, x.seconds_in_from_stage
+    FROM funnel_touched t
+    JOIN deal_stage_transitions x
+      ON x.tenant_id = t.tenant_id
+     AND x.pipeline_id = t.pipeline_id
+     AND x.transitioned_at >= t.day::timestamp AT TIME ZONE 'UTC'
+     AND x.transitioned_at < (t.day + 1)::timestamp AT TIME ZONE 'UTC'
+),
+events AS (
+    SELECT tenant_id, pipeline_id, day, to_stage_id AS stage_id, 1 AS entered, 0 AS exited, NULL::float8 AS secs
+    FROM tr
+    UNION ALL
+    SELECT tenant_id, pipeline_id, day, from_stage_id, 0, 1, seconds_in_from_stage
+    FROM tr
+    WHERE from_stage_id IS NOT NULL
+)
+INSERT INTO funnel_daily (tenant_id, pipeline_id, day, stage_id, entered, exited, won, lost, median_seconds_in_stage)
+SELECT
+    e.tenant_id, e.pipeline_id, e.day, e.stage_id,
+    sum(e.entered),
+    sum(e.exited),
+    coalesce(sum(e.entered) FILTER (WHERE s.is_won), 0),
+    coalesce(sum(e.entered) FILTER (WHERE s.is_lost), 0),
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY e.secs)
+FROM events e
+LEFT JOIN stages s ON s.stage_id = e.stage_id
+GROUP BY e.tenant_id, e.pipeline_id, e.day, e.stage_id
+"""
+
+
+def funnel_rollup(conn: psycopg.Connection) -> dict:
+    with conn.transaction():
+        # FOR UPDATE: два runner'а не катят rollup одновременно
+        (lo,) = conn.execute("SELECT last_xid::text FROM funnel_rollup_state WHERE id = 1 FOR UPDATE").fetchone()
+        (hi,) = conn.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text").fetchone()
+
+        conn.execute(_TOUCHED_SQL, {"lo": lo, "hi": hi})
+        (touched,) = conn.execute("SELECT count(*) FROM funnel_touched").fetchone()
+        if touched:
+            conn.execute(_CLEAR_SQL)
+            rows = conn.execute(_ROLLUP_SQL).rowcount
+        else:
+            rows = 0
+        conn.execute("UPDATE funnel_rollup_state SET last_xid = %(hi)s::xid8 WHERE id = 1", {"hi": hi})
+    return {"touched_days": touched, "rows": rows}
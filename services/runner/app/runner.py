@@ -1,12 +1,30 @@
 import os
+import sys
 import time
 import json
 import redis
 
+from . import db
+from .dedup import dedup_scan
+from .funnel import funnel_rollup
+from .sessions_reaper import maintain_session_partitions, reap_sessions
+from .stage_stats import reconcile_stage_stats
+
 SERVICE = os.getenv("SERVICE_NAME", "runner")
 ENV = os.getenv("ENV", "dev")
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
 
+TICK_SECONDS = 10
+
+# (name, interval seconds, job(conn) -> result)
+JOBS = [
+    ("sessions_reap", int(os.getenv("SESSIONS_REAPER_INTERVAL", "60")), reap_sessions),
+    ("sessions_partitions", int(os.getenv("SESSIONS_PARTITIONS_INTERVAL", "3600")), maintain_session_partitions),
+    ("funnel_rollup", int(os.getenv("FUNNEL_ROLLUP_INTERVAL", "300")), funnel_rollup),
+    ("dedup_scan", int(os.getenv("DEDUP_SCAN_INTERVAL", "3600")), dedup_scan),
+    ("stage_stats_reconcile", int(os.getenv("STAGE_STATS_RECONCILE_INTERVAL", "900")), reconcile_stage_stats),
+]
+
 
 def log(event: str, **fields):
     payload = {
@@ -21,17 +39,61 @@ def log(event: str, **fields):
     print(json.dumps(payload, ensure_ascii=False), flush=True)
 
 
+def run_job(conn, name: str, job) -> bool:
+    started = time.perf_counter()
+    try:
+        result = job(conn)
+        log("job_done", job=name, result=result, ms=round((time.perf_counter() - started) * 1000, 1))
+        return True
+    except Exception as e:
+        log("job_error", job=name, error=str(e))
+        return False
+
+
+def run_due_jobs(last_run: dict[str, float]) -> None:
+    now = time.monotonic()
+    due = [j for j in JOBS if now - last_run.get(j[0], float("-inf")) >= j[1]]
+    if not due:
+        return
+
+    with db.connect() as conn:
+        for name, _interval, job in due:
+            run_job(conn, name, job)
+            last_run[name] = now
+
+
+def run_once(names: list[str]) -> int:
+    # `python -m app dedup_scan ...`: разовый прогон заданных job без планировщика (тесты, ручной запуск)
+    jobs = {name: job for name, _interval, job in JOBS}
+    unknown = [n for n in names if n not in jobs]
+    if unknown:
+        log("runner_error", error=f"unknown jobs: {', '.join(unknown)}", known=sorted(jobs))
+        return 2
+
+    with db.connect() as conn:
+        ok = [run_job(conn, name, jobs[name]) for name in names]
+    return 0 if all(ok) else 1
+
+
 def main():
+    if len(sys.argv) > 1:
+        sys.exit(run_once(sys.argv[1:]))
+
     r = redis.Redis.from_url(REDIS_URL, decode_responses=True)
     log("runner_start", redis_url=REDIS_URL)
 
+    last_run: dict[str, float] = {}
     while True:
         try:
             r.ping()
             log("runner_tick")
         except Exception as e:
             log("runner_error", error=str(e))
-        time.sleep(10)
+        try:
+            run_due_jobs(last_run)
+        except Exception as e:
+            log("runner_error", error=str(e))
+        time.sleep(TICK_SECONDS)
 
 
 if __name__ == "__main__":
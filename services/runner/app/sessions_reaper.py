@@ -0,0 +1,114 @@
+import os
+from datetime import date, datetime, timedelta, timezone
+
+import psycopg
+
+# Sessions housekeeping:
+# - reap_sessions: удаляет expired/revoked сессии маленькими пачками (короткие транзакции, без долгих локов)
+# - maintain_session_partitions: создаёт дневные партиции наперёд и дропает полностью истёкшие целиком
+
+BATCH_SIZE = int(os.getenv("SESSIONS_REAPER_BATCH", "1000"))
+MAX_BATCHES = int(os.getenv("SESSIONS_REAPER_MAX_BATCHES", "50"))
+GRACE_SECONDS = int(os.getenv("SESSIONS_REAPER_GRACE_SECONDS", "3600"))
+DAYS_AHEAD = int(os.getenv("SESSIONS_PARTITION_DAYS_AHEAD", "14"))
+
+PARTITION_PREFIX = "sessions_p"
+
+_REAP_SQL = """
+WITH doomed AS (
+    SELECT token, expires_at
+    FROM sessions
+    WHERE expires_at < now() - make_interval(secs => %(grace)s)
+       OR revoked_at < now() - make_interval(secs => %(grace)s)
+    LIMIT %(batch)s
+)
+DELETE FROM sessions s
+USING doomed d
+WHERE s.token = d.token AND s.expires_at = d.expires_at
+"""
+
+
+def reap_sessions(conn: psycopg.Connection) -> int:
+    total = 0
+    for _ in range(MAX_BATCHES):
+        cur = conn.execute(_REAP_SQL, {"grace": GRACE_SECONDS, "batch": BATCH_SIZE})
+        total += cur.rowcount
+        if cur.rowcount < BATCH_SIZE:
+            break
+    return total
+
+
+def partition_name(day: date) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def _existing_partitions(conn: psycopg.Connection) -> list[str]:
+    rows = conn.execute(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = 'sessions'
+        """
+    ).fetchall()
+    return [r[0] for r in rows]
+
+
+def _bound(day: date) -> str:
+    # границы - полночь UTC явным литералом timestamptz: без offset'а Postgres взял бы TimeZone сервера
+    return f"{day.isoformat()} 00:00:00+00"
+
+
+def _create_partition(conn: psycopg.Connection, day: date) -> None:
+    """
+    New daily partition. Rows of that day already sitting in sessions_default would make
+    CREATE ... PARTITION OF fail, so the table is built standalone, the rows are moved out of
+    the default partition, then it is attached - all in one transaction.
+    """
+    name = partition_name(day)
+    lo, hi = _bound(day), _bound(day + timedelta(days=1))
+    with conn.transaction():
+        conn.execute(f"CREATE TABLE {name} (LIKE sessions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        conn.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM sessions_default
+                WHERE expires_at >= %(lo)s AND expires_at < %(hi)s
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """,
+            {"lo": lo, "hi": hi},
+        )
+        conn.execute(f"ALTER TABLE sessions ATTACH PARTITION {name} FOR VALUES FROM ('{lo}') TO ('{hi}')")
+
+
+def maintain_session_partitions(conn: psycopg.Connection) -> dict:
+    now = datetime.now(timezone.utc)
+    today = now.date()
+    existing = set(_existing_partitions(conn))
+
+    created = []
+    for i in range(DAYS_AHEAD + 1):
+        day = today + timedelta(days=i)
+        name = partition_name(day)
+        if name in existing:
+            continue
+        _create_partition(conn, day)
+        created.append(name)
+
+    # партиция за день D содержит сессии с expires_at < D+1; дропаем, когда все они истекли + grace
+    horizon = now - timedelta(seconds=GRACE_SECONDS)
+    dropped = []
+    for name in sorted(existing):
+        suffix = name.removeprefix(PARTITION_PREFIX)
+        if not name.startswith(PARTITION_PREFIX) or not suffix.isdigit():
+            continue
+        day = datetime.strptime(suffix, "%Y%m%d").replace(tzinfo=timezone.utc)
+        if day + timedelta(days=1) <= horizon:
+            conn.execute(f"DROP TABLE IF EXISTS {name}")
+            dropped.append(name)
+
+    return {"created": created, "dropped": dropped}
+# END_FILE
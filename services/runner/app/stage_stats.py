@@ -0,0 +1,60 @@
+import os
+
+import psycopg
+
+# stage_stats reconcile: пересчитывает агрегаты тенанта из deals и чинит дрейф дельт.
+# Эксклюзивный advisory lock на тенанта (тот же ключ, что shared-lock в core app/stage_stats.py):
+# ждём in-flight транзакций с дельтами, новые ждут нас - снапшот statement'а согласован с таблицей.
+
+LOCK_TIMEOUT = os.getenv("STAGE_STATS_LOCK_TIMEOUT", "5s")
+
+_RECONCILE_SQL = """
+WITH actual AS (
+    SELECT pipeline_id, stage_id, currency, count(*) AS deal_count, coalesce(sum(amount), 0) AS amount_sum
+    FROM deals
+    WHERE tenant_id = %(tenant_id)s
+    GROUP BY pipeline_id, stage_id, currency
+),
+fixed AS (
+    INSERT INTO stage_stats (tenant_id, pipeline_id, stage_id, currency, deal_count, amount_sum)
+    SELECT %(tenant_id)s, pipeline_id, stage_id, currency, deal_count, amount_sum FROM actual
+    ON CONFLICT (tenant_id, pipeline_id, stage_id, currency) DO UPDATE
+    SET deal_count = excluded.deal_count, amount_sum = excluded.amount_sum, updated_at = now()
+    WHERE stage_stats.deal_count <> excluded.deal_count OR stage_stats.amount_sum <> excluded.amount_sum
+    RETURNING 1
+),
+dropped AS (
+    DELETE FROM stage_stats ss
+    WHERE ss.tenant_id = %(tenant_id)s
+      AND NOT EXISTS (
+          SELECT 1 FROM actual a
+          WHERE a.pipeline_id = ss.pipeline_id AND a.stage_id = ss.stage_id AND a.currency = ss.currency
+      )
+    RETURNING ss.deal_count
+)
+SELECT
+    (SELECT count(*) FROM fixed),
+    (SELECT count(*) FROM dropped WHERE deal_count <> 0)
+"""
+
+
+def reconcile_stage_stats(conn: psycopg.Connection) -> dict:
+    tenants = [r[0] for r in conn.execute("SELECT tenant_id FROM tenants ORDER BY tenant_id").fetchall()]
+    fixed = dropped = skipped = 0
+    for tenant_id in tenants:
+        try:
+            with conn.transaction():
+                conn.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+                conn.execute(
+                    "SELECT pg_advisory_xact_lock(hashtextextended('stage_stats:' || %(tenant_id)s, 0))",
+                    {"tenant_id": tenant_id},
+                )
+                f, d = conn.execute(_RECONCILE_SQL, {"tenant_id": tenant_id}).fetchone()
+        except psycopg.errors.LockNotAvailable:
+            # тенант под нагрузкой - попробуем в следующий прогон
+            skipped += 1
+            continue
+        fixed += f
+        dropped += d
+    # fixed включает строки, созданные впервые; dropped - только ненулевые "призраки"
+    return {"tenants": len(tenants), "fixed": fixed, "dropped": dropped, "skipped": skipped}
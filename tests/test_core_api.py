@@ -1,6 +1,11 @@
+import contextlib
+import json
 import os
+import shlex
+import subprocess
 import time
 
+import pytest
 import requests
 
 BASE = os.environ.get("BASE", "http://localhost:8088")
@@ -63,3 +68,650 @@ def test_bootstrap_login_whoami_and_logout():
         f"{BASE}/api/auth/whoami", headers={"Authorization": f"Bearer {tok}"}, timeout=3
     )
     assert r5.status_code in (401, 403)
+
+
+def _auth_headers():
+    requests.post(f"{BASE}/api/bootstrap", timeout=5)
+    r = requests.post(
+        f"{BASE}/api/auth/login",
+        json={"tenant": "demo", "email": "admin@demo.local", "password": "admin123"},
+        timeout=5,
+    )
+    assert r.status_code == 200, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+def test_deactivated_user_cached_session_rejected():
+    h = _auth_headers()
+    r = requests.post(
+        f"{BASE}/api/auth/login",
+        json={"tenant": "demo", "email": "user@demo.local", "password": "user123"},
+        timeout=5,
+    )
+    assert r.status_code == 200, r.text
+    member_id = r.json()["user_id"]
+    hm = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    try:
+        # второй запрос - из session cache
+        for _ in range(2):
+            assert requests.get(f"{BASE}/api/auth/whoami", headers=hm, timeout=3).status_code == 200
+
+        r = requests.put(f"{BASE}/api/users/{member_id}/active", json={"is_active": False}, headers=h, timeout=5)
+        assert r.status_code == 200, r.text
+        assert requests.get(f"{BASE}/api/auth/whoami", headers=hm, timeout=3).status_code in (401, 403)
+
+        r = requests.put(f"{BASE}/api/users/{member_id}/active", json={"is_active": False}, headers=hm, timeout=5)
+        assert r.status_code in (401, 403)
+    finally:
+        r = requests.put(f"{BASE}/api/users/{member_id}/active", json={"is_active": True}, headers=h, timeout=5)
+        assert r.status_code == 200, r.text
+
+    admin_id = requests.get(f"{BASE}/api/auth/whoami", headers=h, timeout=3).json()["user_id"]
+    r = requests.put(f"{BASE}/api/users/{admin_id}/active", json={"is_active": False}, headers=h, timeout=5)
+    assert r.status_code == 409
+
+
+def test_jwt_logout_and_deactivate_cutoff():
+    # режим авторизации глобальный: тест для стенда, поднятого с AUTH_MODE=jwt
+    h = _auth_headers()
+    if h["Authorization"].startswith("Bearer tok_"):
+        pytest.skip("core runs AUTH_MODE=session; start the stack with AUTH_MODE=jwt")
+
+    # logout кладёт jti в denylist - тот же JWT больше не принимается
+    assert requests.get(f"{BASE}/api/auth/whoami", headers=h, timeout=3).status_code == 200
+    assert requests.post(f"{BASE}/api/auth/logout", headers=h, timeout=3).status_code == 200
+    assert requests.get(f"{BASE}/api/auth/whoami", headers=h, timeout=3).status_code == 401
+
+    h = _auth_headers()
+    member = {"tenant": "demo", "email": "user@demo.local", "password": "user123"}
+    r = requests.post(f"{BASE}/api/auth/login", json=member, timeout=5)
+    assert r.status_code == 200, r.text
+    member_id = r.json()["user_id"]
+    hm = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    assert requests.get(f"{BASE}/api/auth/whoami", headers=hm, timeout=3).status_code == 200
+    try:
+        r = requests.put(f"{BASE}/api/users/{member_id}/active", json={"is_active": False}, headers=h, timeout=5)
+        assert r.status_code == 200, r.text
+        assert requests.get(f"{BASE}/api/auth/whoami", headers=hm, timeout=3).status_code == 401
+    finally:
+        r = requests.put(f"{BASE}/api/users/{member_id}/active", json={"is_active": True}, headers=h, timeout=5)
+        assert r.status_code == 200, r.text
+
+    # cutoff остаётся: JWT, выданный до деактивации, не оживает; новый логин сразу работает
+    assert requests.get(f"{BASE}/api/auth/whoami", headers=hm, timeout=3).status_code == 401
+    r = requests.post(f"{BASE}/api/auth/login", json=member, timeout=5)
+    assert r.status_code == 200, r.text
+    hm = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    assert requests.get(f"{BASE}/api/auth/whoami", headers=hm, timeout=3).status_code == 200
+
+
+def test_companies_cursor_pagination():
+    h = _auth_headers()
+    for i in range(3):
+        r = requests.post(f"{BASE}/api/companies", json={"name": f"Page Co {i}"}, headers=h, timeout=5)
+        assert r.status_code in (200, 201), r.text
+
+    seen = []
+    cursor = None
+    for _ in range(3):
+        params = {"limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+        r = requests.get(f"{BASE}/api/companies", params=params, headers=h, timeout=5)
+        assert r.status_code == 200, r.text
+        assert len(r.json()) == 1
+        seen.append(r.json()[0]["company_id"])
+        cursor = r.headers.get("X-Next-Cursor")
+        assert cursor
+    assert len(set(seen)) == 3
+
+    r = requests.get(f"{BASE}/api/companies", params={"cursor": "not-a-cursor"}, headers=h, timeout=5)
+    assert r.status_code == 400
+
+    r = requests.get(f"{BASE}/api/deals", params={"cursor": cursor, "offset": 5}, headers=h, timeout=5)
+    assert r.status_code == 422
+
+
+def test_contacts_batch_upsert():
+    h = _auth_headers()
+    ext = f"ext-{time.time_ns()}"
+    r = requests.post(f"{BASE}/api/companies:batch", json={"items": [{"external_id": ext, "name": "Batch Co"}]}, headers=h, timeout=10)
+    assert r.status_code == 200, r.text
+    company_id = r.json()["items"][0]["id"]
+
+    items = [
+        {"external_id": f"{ext}-1", "name": "Ann", "company_id": company_id},
+        {"external_id": f"{ext}-2", "name": "Bob", "company_id": "co_missing"},
+        {"external_id": f"{ext}-1", "name": "Ann again"},
+        {"name": "No external id"},
+    ]
+    r = requests.post(f"{BASE}/api/contacts:batch", json={"items": items}, headers=h, timeout=10)
+    assert r.status_code == 200, r.text
+    j = r.json()
+    assert [it["status"] for it in j["items"]] == ["created", "error", "error", "created"]
+    assert (j["created"], j["updated"], j["failed"]) == (2, 0, 2)
+
+    r = requests.post(
+        f"{BASE}/api/contacts:batch",
+        json={"items": [{"external_id": f"{ext}-1", "name": "Ann renamed"}]},
+        headers=h,
+        timeout=10,
+    )
+    assert r.status_code == 200, r.text
+    item = r.json()["items"][0]
+    assert item["status"] == "updated"
+    c = requests.get(f"{BASE}/api/contacts/{item['id']}", headers=h, timeout=5).json()
+    assert c["name"] == "Ann renamed" and c["company_id"] == company_id
+
+
+def test_batch_overlong_item_fails_alone():
+    h = _auth_headers()
+    ext = f"ext-long-{time.time_ns()}"
+    items = [
+        {"external_id": f"{ext}-1", "name": "Fine Co"},
+        {"external_id": f"{ext}-2", "name": "x" * 201},
+        {"external_id": "", "name": "Empty ext"},
+        {"name": "Also fine", "domain": "fine.example"},
+    ]
+    r = requests.post(f"{BASE}/api/companies:batch", json={"items": items}, headers=h, timeout=10)
+    assert r.status_code == 200, r.text
+    j = r.json()
+    assert [it["status"] for it in j["items"]] == ["created", "error", "error", "created"]
+    assert "name" in j["items"][1]["error"]
+
+    r = requests.post(
+        f"{BASE}/api/contacts:batch",
+        json={"items": [{"name": "Ok"}, {"name": "Long phone", "phone": "1" * 51}]},
+        headers=h,
+        timeout=10,
+    )
+    assert r.status_code == 200, r.text
+    assert [it["status"] for it in r.json()["items"]] == ["created", "error"]
+
+
+def test_companies_export_ndjson_and_csv():
+    h = _auth_headers()
+    r = requests.post(f"{BASE}/api/companies", json={"name": "Export Co"}, headers=h, timeout=5)
+    assert r.status_code in (200, 201), r.text
+    company_id = r.json()["company_id"]
+
+    with requests.get(f"{BASE}/api/companies:export", headers=h, stream=True, timeout=30) as r:
+        assert r.status_code == 200, r.text
+        assert r.headers["Content-Type"].startswith("application/x-ndjson")
+        ids = {json.loads(line)["company_id"] for line in r.iter_lines() if line}
+    assert company_id in ids
+
+    r = requests.get(f"{BASE}/api/companies:export", params={"format": "csv"}, headers=h, timeout=30)
+    assert r.status_code == 200, r.text
+    header = r.text.splitlines()[0].split(",")
+    assert "company_id" in header and "created_at" in header
+
+
+def _pipeline_with_stages(h, n=2):
+    r = requests.post(f"{BASE}/api/pipelines", json={"name": f"P {time.time_ns()}"}, headers=h, timeout=5)
+    assert r.status_code == 201, r.text
+    pipeline_id = r.json()["pipeline_id"]
+    stage_ids = []
+    for i in range(n):
+        r = requests.post(
+            f"{BASE}/api/stages",
+            json={"pipeline_id": pipeline_id, "name": f"S{i}", "sort_order": i},
+            headers=h,
+            timeout=5,
+        )
+        assert r.status_code == 201, r.text
+        stage_ids.append(r.json()["stage_id"])
+    return pipeline_id, stage_ids
+
+
+def test_deals_move_stage_bulk():
+    h = _auth_headers()
+    pipeline_id, (s1, s2) = _pipeline_with_stages(h)
+    _other_pipeline, (other_stage,) = _pipeline_with_stages(h, 1)
+
+    deal_ids = []
+    for i in range(3):
+        r = requests.post(
+            f"{BASE}/api/deals",
+            json={"title": f"Move {i}", "pipeline_id": pipeline_id, "stage_id": s1},
+            headers=h,
+            timeout=5,
+        )
+        assert r.status_code == 201, r.text
+        deal_ids.append(r.json()["deal_id"])
+
+    r = requests.post(
+        f"{BASE}/api/deals:move-stage",
+        json={"deal_ids": deal_ids[:2] + ["d_missing"], "stage_id": s2},
+        headers=h,
+        timeout=10,
+    )
+    assert r.status_code == 200, r.text
+    j = r.json()
+    assert (j["moved"], j["failed"]) == (2, 1)
+    assert j["items"][2]["error"] == "Deal not found"
+
+    r = requests.post(
+        f"{BASE}/api/deals:move-stage",
+        json={"deal_ids": [deal_ids[0], deal_ids[2]], "stage_id": other_stage},
+        headers=h,
+        timeout=10,
+    )
+    assert r.status_code == 200, r.text
+    assert [it["status"] for it in r.json()["items"]] == ["error", "error"]
+
+    d = requests.get(f"{BASE}/api/deals/{deal_ids[0]}", headers=h, timeout=5).json()
+    assert d["stage_id"] == s2
+
+
+def test_pipeline_board():
+    h = _auth_headers()
+    pipeline_id, (s1, s2) = _pipeline_with_stages(h)
+    for i, (amount, currency) in enumerate([("10.00", "USD"), ("5.50", "USD"), ("7.00", "EUR")]):
+        r = requests.post(
+            f"{BASE}/api/deals",
+            json={"title": f"Board {i}", "amount": amount, "currency": currency, "pipeline_id": pipeline_id, "stage_id": s1},
+            headers=h,
+            timeout=5,
+        )
+        assert r.status_code == 201, r.text
+
+    r = requests.get(f"{BASE}/api/pipelines/{pipeline_id}/board", params={"per_stage": 2}, headers=h, timeout=5)
+    assert r.status_code == 200, r.text
+    first, second = r.json()["stages"]
+    assert (first["stage_id"], second["stage_id"]) == (s1, s2)
+    assert first["count"] == 3 and len(first["deals"]) == 2 and first["next_cursor"]
+    assert {t["currency"]: t["amount"] for t in first["totals"]} == {"EUR": "7.00", "USD": "15.50"}
+    assert second["count"] == 0 and second["deals"] == [] and second["next_cursor"] is None
+
+    r = requests.get(
+        f"{BASE}/api/deals", params={"stage_id": s1, "cursor": first["next_cursor"]}, headers=h, timeout=5
+    )
+    assert r.status_code == 200 and len(r.json()) == 1
+
+    # stage_stats follows stage/amount changes
+    moved = first["deals"][0]
+    r = requests.patch(f"{BASE}/api/deals/{moved['deal_id']}", json={"stage_id": s2, "amount": "1.00"}, headers=h, timeout=5)
+    assert r.status_code == 200, r.text
+    first, second = requests.get(f"{BASE}/api/pipelines/{pipeline_id}/board", headers=h, timeout=5).json()["stages"]
+    assert first["count"] == 2 and second["count"] == 1
+    assert second["totals"] == [{"currency": moved["currency"], "count": 1, "amount": "1.00"}]
+
+    # stage_id NOT NULL: явный null - 422, сделка не меняется
+    r = requests.patch(f"{BASE}/api/deals/{moved['deal_id']}", json={"stage_id": None}, headers=h, timeout=5)
+    assert r.status_code == 422, r.text
+    assert requests.get(f"{BASE}/api/deals/{moved['deal_id']}", headers=h, timeout=5).json()["stage_id"] == s2
+
+
+def test_pipeline_funnel_shape():
+    h = _auth_headers()
+    pipeline_id, (s1, s2) = _pipeline_with_stages(h)
+    r = requests.get(f"{BASE}/api/pipelines/{pipeline_id}/funnel", headers=h, timeout=5)
+    assert r.status_code == 200, r.text
+    j = r.json()
+    assert [s["stage_id"] for s in j["stages"]] == [s1, s2]
+    assert {"entered", "exited", "median_seconds_in_stage"} <= set(j["stages"][0])
+
+    r = requests.get(
+        f"{BASE}/api/pipelines/{pipeline_id}/funnel",
+        params={"date_from": "2026-02-01", "date_to": "2026-01-01"},
+        headers=h,
+        timeout=5,
+    )
+    assert r.status_code == 422
+
+
+def test_search_contacts_and_companies():
+    h = _auth_headers()
+    tag = f"zq{time.time_ns() % 10**8}"
+    r = requests.post(f"{BASE}/api/companies", json={"name": f"Acme {tag}", "domain": f"{tag}.example"}, headers=h, timeout=5)
+    assert r.status_code in (200, 201), r.text
+    r = requests.post(
+        f"{BASE}/api/contacts",
+        json={"name": f"Jane {tag}", "email": f"jane@{tag}.example", "phone": "+1 (555) 010-7788"},
+        headers=h,
+        timeout=5,
+    )
+    assert r.status_code in (200, 201), r.text
+    contact_id = r.json()["contact_id"]
+
+    r = requests.get(f"{BASE}/api/search", params={"q": tag.upper()}, headers=h, timeout=5)
+    assert r.status_code == 200, r.text
+    assert {hit["type"] for hit in r.json()["results"]} == {"contact", "company"}
+
+    r = requests.get(f"{BASE}/api/search", params={"q": "5550107788", "types": "contact"}, headers=h, timeout=5)
+    assert r.status_code == 200, r.text
+    assert contact_id in [hit["id"] for hit in r.json()["results"]]
+
+    r = requests.get(f"{BASE}/api/search", params={"q": "ab"}, headers=h, timeout=5)
+    assert r.status_code == 422
+
+
+def test_deals_query_dsl():
+    h = _auth_headers()
+    pipeline_id, (s1, s2) = _pipeline_with_stages(h)
+    for i, (amount, stage_id) in enumerate([("10.00", s1), ("20.00", s1), ("30.00", s2)]):
+        r = requests.post(
+            f"{BASE}/api/deals",
+            json={"title": f"Q {i}", "amount": amount, "pipeline_id": pipeline_id, "stage_id": stage_id},
+            headers=h,
+            timeout=5,
+        )
+        assert r.status_code == 201, r.text
+
+    body = {
+        "filters": [
+            {"field": "pipeline_id", "value": pipeline_id},
+            {"field": "amount", "op": "between", "value": ["15", "30"]},
+        ],
+        "sort": [{"field": "title", "dir": "asc"}],
+        "limit": 1,
+    }
+    r = requests.post(f"{BASE}/api/deals:query", json=body, headers=h, timeout=5)
+    assert r.status_code == 200, r.text
+    assert [d["title"] for d in r.json()] == ["Q 1"]
+
+    r = requests.post(
+        f"{BASE}/api/deals:query", json={**body, "cursor": r.headers["X-Next-Cursor"]}, headers=h, timeout=5
+    )
+    assert r.status_code == 200, r.text
+    assert [d["title"] for d in r.json()] == ["Q 2"] and "X-Next-Cursor" not in r.headers
+
+    r = requests.post(
+        f"{BASE}/api/deals:query",
+        json={"filters": [{"field": "stage_id", "op": "in", "value": [s1, s2]}, {"field": "pipeline_id", "value": pipeline_id}]},
+        headers=h,
+        timeout=5,
+    )
+    assert r.status_code == 200 and len(r.json()) == 3
+
+    r = requests.post(f"{BASE}/api/deals:query", json={"filters": [{"field": "tenant_id", "value": "x"}]}, headers=h, timeout=5)
+    assert r.status_code == 422
+
+
+def test_access_profile_shapes_deal_fields():
+    h = _auth_headers()
+    pipeline_id, (s1,) = _pipeline_with_stages(h, 1)
+    r = requests.post(
+        f"{BASE}/api/deals",
+        json={"title": "Restricted", "amount": "9.99", "pipeline_id": pipeline_id, "stage_id": s1},
+        headers=h,
+        timeout=5,
+    )
+    assert r.status_code == 201, r.text
+    deal_id = r.json()["deal_id"]
+
+    r = requests.post(
+        f"{BASE}/api/access-profiles",
+        json={"name": f"titles-only {time.time_ns()}", "fields": {"deal": ["title"]}},
+        headers=h,
+        timeout=5,
+    )
+    assert r.status_code == 201, r.text
+    profile_id = r.json()["profile_id"]
+    assert r.json()["fields"] == {"deal": ["deal_id", "title"]}
+
+    user_id = requests.get(f"{BASE}/api/auth/whoami", headers=h, timeout=5).json()["user_id"]
+    r = requests.put(f"{BASE}/api/users/{user_id}/access-profile", json={"access_profile_id": profile_id}, headers=h, timeout=5)
+    assert r.status_code == 200, r.text
+    h2 = _auth_headers()
+    try:
+        r = requests.get(f"{BASE}/api/deals/{deal_id}", headers=h2, timeout=5)
+        assert r.status_code == 200, r.text
+        assert r.json() == {"deal_id": deal_id, "title": "Restricted"}
+
+        r = requests.get(f"{BASE}/api/deals", params={"pipeline_id": pipeline_id}, headers=h2, timeout=5)
+        assert r.status_code == 200 and set(r.json()[0]) == {"deal_id", "title"}
+    finally:
+        r = requests.put(f"{BASE}/api/users/{user_id}/access-profile", json={"access_profile_id": None}, headers=h2, timeout=5)
+        assert r.status_code == 200, r.text
+
+    h3 = _auth_headers()
+    assert "amount" in requests.get(f"{BASE}/api/deals/{deal_id}", headers=h3, timeout=5).json()
+    assert requests.delete(f"{BASE}/api/access-profiles/{profile_id}", headers=h3, timeout=5).status_code == 204
+
+
+def test_sparse_fieldsets():
+    h = _auth_headers()
+    pipeline_id, (s1,) = _pipeline_with_stages(h, 1)
+    r = requests.post(
+        f"{BASE}/api/deals",
+        json={"title": "Sparse", "amount": "3.50", "pipeline_id": pipeline_id, "stage_id": s1},
+        headers=h,
+        timeout=5,
+    )
+    assert r.status_code == 201, r.text
+    deal_id = r.json()["deal_id"]
+
+    r = requests.get(f"{BASE}/api/deals/{deal_id}", params={"fields": "title,amount"}, headers=h, timeout=5)
+    assert r.status_code == 200, r.text
+    assert r.json() == {"deal_id": deal_id, "title": "Sparse", "amount": "3.50"}
+
+    r = requests.get(
+        f"{BASE}/api/deals", params={"pipeline_id": pipeline_id, "fields": "stage_id"}, headers=h, timeout=5
+    )
+    assert r.status_code == 200 and r.json() == [{"deal_id": deal_id, "stage_id": s1}]
+
+    r = requests.get(f"{BASE}/api/stages", params={"pipeline_id": pipeline_id, "fields": "name"}, headers=h, timeout=5)
+    assert r.status_code == 200 and r.json() == [{"stage_id": s1, "name": "S0"}]
+
+    r = requests.get(f"{BASE}/api/deals", params={"fields": "title,nope"}, headers=h, timeout=5)
+    assert r.status_code == 422
+
+
+def test_conditional_get_and_patch():
+    h = _auth_headers()
+    pipeline_id, (s1,) = _pipeline_with_stages(h, 1)
+    r = requests.post(
+        f"{BASE}/api/deals",
+        json={"title": "Etag", "pipeline_id": pipeline_id, "stage_id": s1},
+        headers=h,
+        timeout=5,
+    )
+    assert r.status_code == 201, r.text
+    deal_id = r.json()["deal_id"]
+
+    r = requests.get(f"{BASE}/api/deals/{deal_id}", headers=h, timeout=5)
+    assert r.status_code == 200 and r.headers.get("ETag"), r.text
+    etag = r.headers["ETag"]
+    r = requests.get(f"{BASE}/api/deals/{deal_id}", headers={**h, "If-None-Match": etag}, timeout=5)
+    assert r.status_code == 304 and r.headers["ETag"] == etag and not r.content
+
+    params = {"pipeline_id": pipeline_id}
+    r = requests.get(f"{BASE}/api/deals", params=params, headers=h, timeout=5)
+    assert r.status_code == 200 and r.headers.get("ETag"), r.text
+    list_etag = r.headers["ETag"]
+    r = requests.get(f"{BASE}/api/deals", params=params, headers={**h, "If-None-Match": list_etag}, timeout=5)
+    assert r.status_code == 304
+
+    r = requests.patch(
+        f"{BASE}/api/deals/{deal_id}", json={"title": "Etag 2"}, headers={**h, "If-Match": etag}, timeout=5
+    )
+    assert r.status_code == 200, r.text
+    new_etag = r.headers["ETag"]
+    assert new_etag != etag
+
+    # устаревшая версия: lost update не проходит
+    r = requests.patch(
+        f"{BASE}/api/deals/{deal_id}", json={"title": "Etag 3"}, headers={**h, "If-Match": etag}, timeout=5
+    )
+    assert r.status_code == 412
+
+    r = requests.get(f"{BASE}/api/deals/{deal_id}", headers={**h, "If-None-Match": etag}, timeout=5)
+    assert r.status_code == 200 and r.json()["title"] == "Etag 2" and r.headers["ETag"] == new_etag
+    r = requests.get(f"{BASE}/api/deals", params=params, headers={**h, "If-None-Match": list_etag}, timeout=5)
+    assert r.status_code == 200 and r.headers["ETag"] != list_etag
+
+
+def test_access_profile_change_invalidates_etags():
+    h = _auth_headers()
+    pipeline_id, (s1,) = _pipeline_with_stages(h, 1)
+    r = requests.post(
+        f"{BASE}/api/deals",
+        json={"title": "Profiled", "amount": "1.00", "pipeline_id": pipeline_id, "stage_id": s1},
+        headers=h,
+        timeout=5,
+    )
+    assert r.status_code == 201, r.text
+    deal_id = r.json()["deal_id"]
+
+    name = f"etag-profile {time.time_ns()}"
+    r = requests.post(f"{BASE}/api/access-profiles", json={"name": name, "fields": {"deal": ["title"]}}, headers=h, timeout=5)
+    assert r.status_code == 201, r.text
+    profile_id = r.json()["profile_id"]
+
+    user_id = requests.get(f"{BASE}/api/auth/whoami", headers=h, timeout=5).json()["user_id"]
+    r = requests.put(f"{BASE}/api/users/{user_id}/access-profile", json={"access_profile_id": profile_id}, headers=h, timeout=5)
+    assert r.status_code == 200, r.text
+    h2 = _auth_headers()
+    try:
+        params = {"pipeline_id": pipeline_id}
+        r = requests.get(f"{BASE}/api/deals/{deal_id}", headers=h2, timeout=5)
+        assert r.status_code == 200 and set(r.json()) == {"deal_id", "title"}
+        etag = r.headers["ETag"]
+        r = requests.get(f"{BASE}/api/deals", params=params, headers=h2, timeout=5)
+        list_etag = r.headers["ETag"]
+
+        # профиль расширили: старые ETag не должны давать 304 на прежнюю форму
+        r = requests.put(
+            f"{BASE}/api/access-profiles/{profile_id}",
+            json={"name": name, "fields": {"deal": ["title", "amount"]}},
+            headers=h2,
+            timeout=5,
+        )
+        assert r.status_code == 200, r.text
+
+        r = requests.get(f"{BASE}/api/deals/{deal_id}", headers={**h2, "If-None-Match": etag}, timeout=5)
+        assert r.status_code == 200 and set(r.json()) == {"deal_id", "title", "amount"}
+        assert r.headers["ETag"] != etag
+        r = requests.get(f"{BASE}/api/deals", params=params, headers={**h2, "If-None-Match": list_etag}, timeout=5)
+        assert r.status_code == 200 and set(r.json()[0]) == {"deal_id", "title", "amount"}
+    finally:
+        r = requests.put(f"{BASE}/api/users/{user_id}/access-profile", json={"access_profile_id": None}, headers=h2, timeout=5)
+        assert r.status_code == 200, r.text
+
+    h3 = _auth_headers()
+    assert requests.delete(f"{BASE}/api/access-profiles/{profile_id}", headers=h3, timeout=5).status_code == 204
+
+
+# разовый прогон job runner'а, не дожидаясь его расписания
+RUNNER_ONCE = shlex.split(os.environ.get("RUNNER_ONCE", "docker compose exec -T runner python -m app"))
+
+
+def _run_job(name):
+    p = subprocess.run([*RUNNER_ONCE, name], capture_output=True, text=True, timeout=120)
+    assert p.returncode == 0, p.stdout + p.stderr
+
+
+def _find_duplicate(h, entity, block_key):
+    r = requests.get(f"{BASE}/api/duplicates", params={"entity": entity, "limit": 500}, headers=h, timeout=5)
+    assert r.status_code == 200, r.text
+    return next(c for c in r.json() if c["block_key"] == block_key)
+
+
+def test_merge_duplicate_contacts():
+    h = _auth_headers()
+    email = f"dup-{time.time_ns()}@example.test"
+    ids = []
+    for name in ("Dup A", "Dup B"):
+        r = requests.post(f"{BASE}/api/contacts", json={"name": name, "email": email}, headers=h, timeout=5)
+        assert r.status_code in (200, 201), r.text
+        ids.append(r.json()["contact_id"])
+    survivor, loser = ids
+
+    pipeline_id, (s1,) = _pipeline_with_stages(h, 1)
+    r = requests.post(
+        f"{BASE}/api/deals",
+        json={"title": "On loser", "pipeline_id": pipeline_id, "stage_id": s1, "contact_id": loser},
+        headers=h,
+        timeout=5,
+    )
+    assert r.status_code == 201, r.text
+    deal_id = r.json()["deal_id"]
+
+    _run_job("dedup_scan")
+    cand = _find_duplicate(h, "contact", email)
+    assert set(cand["record_ids"]) == {survivor, loser}
+    url = f"{BASE}/api/duplicates/{cand['candidate_id']}/merge"
+
+    # id вне кластера тенанта (в т.ч. чужого тенанта) отклоняется до любых записей
+    r = requests.post(url, json={"survivor_id": "c_other_tenant"}, headers=h, timeout=5)
+    assert r.status_code == 400, r.text
+    r = requests.post(url, json={"survivor_id": survivor, "merge_ids": [loser, "c_other_tenant"]}, headers=h, timeout=5)
+    assert r.status_code == 400, r.text
+    assert requests.get(f"{BASE}/api/contacts/{loser}", headers=h, timeout=5).status_code == 200
+
+    r = requests.post(url, json={"survivor_id": survivor}, headers=h, timeout=10)
+    assert r.status_code == 200, r.text
+    j = r.json()
+    assert j["merged_ids"] == [loser] and j["deals_repointed"] == 1
+
+    assert requests.get(f"{BASE}/api/deals/{deal_id}", headers=h, timeout=5).json()["contact_id"] == survivor
+    assert requests.get(f"{BASE}/api/contacts/{loser}", headers=h, timeout=5).status_code == 404
+    assert requests.get(f"{BASE}/api/contacts/{survivor}", headers=h, timeout=5).status_code == 200
+
+    # кандидат закрыт: повторное слияние - 409
+    assert requests.post(url, json={"survivor_id": survivor}, headers=h, timeout=5).status_code == 409
+
+
+# второй экземпляр core с переопределённым env (тот же Postgres/Redis), напрямую, без gateway
+CORE_RUN = shlex.split(os.environ.get("CORE_RUN", "docker compose run -d --no-deps"))
+
+
+@contextlib.contextmanager
+def _core_with(env, port):
+    name = f"nextcrm-core-test-{port}"
+    cmd = [*CORE_RUN, "--name", name, "-p", f"{port}:8000"]
+    for k, v in env.items():
+        cmd += ["-e", f"{k}={v}"]
+    cmd += ["core", "uvicorn", "app.main:app", "--host", "0.0.0.0", "--port", "8000", "--no-access-log"]
+    p = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+    assert p.returncode == 0, p.stdout + p.stderr
+    try:
+        base = f"http://localhost:{port}"
+        end = time.time() + 60
+        while True:
+            try:
+                if requests.get(f"{base}/health", timeout=2).status_code == 200:
+                    break
+            except requests.ConnectionError:
+                pass
+            assert time.time() < end, f"{name} did not become healthy"
+            time.sleep(1)
+        yield base
+    finally:
+        subprocess.run(["docker", "rm", "-f", name], capture_output=True, timeout=60)
+
+
+def test_fast_json_lists_byte_identical():
+    h = _auth_headers()
+    tag = time.time_ns()
+    r = requests.post(
+        f"{BASE}/api/companies", json={"name": f"Ёлка «{tag}»", "domain": f"{tag}.example.test"}, headers=h, timeout=5
+    )
+    assert r.status_code in (200, 201), r.text
+    company_id = r.json()["company_id"]
+    r = requests.post(f"{BASE}/api/contacts", json={"name": f"Zoë {tag}", "company_id": company_id}, headers=h, timeout=5)
+    assert r.status_code in (200, 201), r.text
+    pipeline_id, (s1,) = _pipeline_with_stages(h, 1)
+    for amount in ("1234.50", None, "0.07"):
+        r = requests.post(
+            f"{BASE}/api/deals",
+            json={"title": f"Сделка {amount}", "amount": amount, "pipeline_id": pipeline_id, "stage_id": s1},
+            headers=h,
+            timeout=5,
+        )
+        assert r.status_code == 201, r.text
+
+    # одни и те же страницы из core с FAST_JSON_LISTS=0 и =1: тела совпадают байт в байт
+    pages = [("/deals", {"pipeline_id": pipeline_id}), ("/contacts", {"limit": 50}), ("/companies", {"limit": 50})]
+    bodies = {}
+    for flag, port in (("0", 18010), ("1", 18011)):
+        with _core_with({"FAST_JSON_LISTS": flag}, port) as base:
+            for path, params in pages:
+                r = requests.get(f"{base}{path}", params=params, headers=h, timeout=10)
+                assert r.status_code == 200, r.text
+                bodies[flag, path] = r.content
+    for path, _ in pages:
+        assert bodies["1", path] == bodies["0", path], path
+    assert len(json.loads(bodies["1", "/deals"])) == 3